@@ -32,40 +32,45 @@ sample_drivers = [
     }
 ]
 
-def add_sample_driver(driver_data):
-    """Add a single driver using the middleware API"""
+def add_sample_drivers(drivers):
+    """Add all drivers with a single bulk call through the middleware API"""
     try:
-        print(f"Adding driver: {driver_data['name']}...")
+        print(f"Adding {len(drivers)} driver(s)...")
         
         response = requests.post(
-            f"{MIDDLEWARE_BASE_URL}/api/wms/drivers/signup",
-            json=driver_data,
+            f"{MIDDLEWARE_BASE_URL}/api/wms/drivers/bulk",
+            json={"drivers": drivers},
             headers={"Content-Type": "application/json"}
         )
         
-        if response.status_code == 200:
-            driver = response.json()
-            print(f"✅ Successfully added driver!")
-            print(f"   Driver ID: {driver['driver_id']}")
-            print(f"   Name: {driver['name']}")
-            print(f"   Email: {driver['email']}")
-            print(f"   Phone: {driver['phone']}")
-            print(f"   License: {driver['license_number']}")
-            print()
-            return driver
-        else:
-            print(f"❌ Failed to add driver: {response.status_code}")
+        if response.status_code != 200:
+            print(f"❌ Failed to add drivers: {response.status_code}")
             print(f"   Error: {response.text}")
             print()
-            return None
+            return []
+        
+        added = []
+        for driver_data, result in zip(drivers, response.json()["results"]):
+            if result["status"] == "created":
+                print(f"✅ Successfully added driver!")
+                print(f"   Driver ID: {result['driver_id']}")
+                print(f"   Name: {driver_data['name']}")
+                print(f"   Email: {driver_data['email']}")
+                print(f"   Phone: {driver_data['phone']}")
+                print(f"   License: {driver_data['license_number']}")
+                added.append({"driver_id": result["driver_id"], **driver_data})
+            else:
+                print(f"❌ Failed to add driver {driver_data['name']}: {result.get('reason')}")
+            print()
+        return added
             
     except requests.exceptions.ConnectionError:
         print("❌ Could not connect to Middleware service")
         print("   Make sure services are running")
-        return None
+        return []
     except Exception as e:
         print(f"❌ Error: {e}")
-        return None
+        return []
 
 def list_all_drivers():
     """List all drivers in the system"""
@@ -105,11 +110,7 @@ if __name__ == "__main__":
     print("🔄 Adding sample drivers...")
     print()
     
-    added_drivers = []
-    for driver_data in sample_drivers:
-        result = add_sample_driver(driver_data)
-        if result:
-            added_drivers.append(result)
+    added_drivers = add_sample_drivers(sample_drivers)
     
     # Show results
     print("=" * 45)
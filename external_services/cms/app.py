@@ -1,11 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from db_conf import Base, engine
+from db_conf import Base, engine, install_table_versions
 from routes import soapRoutes as soap_clients
 from routes import simpleRoutes as simple_clients
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+install_table_versions()
 
 app = FastAPI()
 
@@ -1,3 +1,4 @@
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 import models, schemas
 
@@ -51,3 +52,7 @@ def update_order_status(db: Session, order_id: int, status: schemas.Delivery_Sta
         db.commit()
         db.refresh(order)
     return order
+
+def get_table_version(db: Session, table: str) -> int:
+    return db.execute(text("SELECT version FROM table_versions WHERE name = :name"),
+                      {"name": table}).scalar() or 0
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -17,4 +17,50 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+# ---------------------- Table Versions ----------------------
+# Each versioned table has a counter in table_versions that triggers bump on
+# every insert, update and delete, so read endpoints can build an ETag from
+# one primary-key lookup instead of re-reading the rows. Tables in
+# ROW_VERSIONED_TABLES also get a per-row `version` column that the same
+# triggers set to the table counter on every write, so a single-row
+# resource has a validator that other rows' writes do not change.
+VERSIONED_TABLES = ("clients", "orders")
+ROW_VERSIONED_TABLES = ("orders",)
+
+def _version_trigger(table: str, op: str) -> str:
+    bump = f"UPDATE table_versions SET version = version + 1 WHERE name = '{table}';"
+    condition = ""
+    if table in ROW_VERSIONED_TABLES and op != "DELETE":
+        bump += (f" UPDATE {table} SET version = (SELECT version FROM table_versions WHERE name = '{table}')"
+                 f" WHERE id = NEW.id;")
+        if op == "UPDATE":
+            # the row-version write above is itself an update; don't count it again
+            condition = " WHEN NEW.version IS OLD.version"
+    return f"""
+        CREATE TRIGGER trg_{table}_version_{op.lower()} AFTER {op} ON {table}{condition}
+        BEGIN
+            {bump}
+        END
+    """
+
+def install_table_versions():
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS table_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """))
+        for table in VERSIONED_TABLES:
+            conn.execute(text("INSERT OR IGNORE INTO table_versions (name, version) VALUES (:name, 0)"),
+                         {"name": table})
+            if table in ROW_VERSIONED_TABLES:
+                columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+                if "version" not in columns:
+                    # databases created before the column was added to the model
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+            for op in ("INSERT", "UPDATE", "DELETE"):
+                # recreated on every start so databases with older trigger bodies pick up changes
+                conn.execute(text(f"DROP TRIGGER IF EXISTS trg_{table}_version_{op.lower()}"))
+                conn.execute(text(_version_trigger(table, op)))
@@ -20,3 +20,5 @@ class Order(Base):
     status = Column(SqlEnum(Delivery_Status), nullable=False)
     weight = Column(Integer)
     location = Column(String, nullable=True)
+    # set by the table-version triggers in db_conf on every write
+    version = Column(Integer, nullable=False, default=0, server_default="0")
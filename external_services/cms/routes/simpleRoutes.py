@@ -1,9 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 import crud, schemas, db_conf
 
 router = APIRouter(prefix="/clients", tags=["Clients"])
 
+def conditional(request: Request, response: Response, etag: str):
+    """
+    Returns a 304 response if the client already has this ETag, otherwise
+    sets the header and returns None.
+    """
+    header = request.headers.get("if-none-match", "")
+    if header.strip() == "*" or etag in (tag.strip() for tag in header.split(",")):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+def check_etag(request: Request, response: Response, db: Session, table: str):
+    """Weak ETag from the table's version counter (see conditional)."""
+    return conditional(request, response, f'W/"{table}-{crud.get_table_version(db, table)}"')
+
 @router.post("/", response_model=schemas.ClientResponse)
 def create_user(client: schemas.ClientCreate, db: Session = Depends(db_conf.get_db)):
     db_client = crud.get_client_by_name(db, client.name)
@@ -12,7 +27,10 @@ def create_user(client: schemas.ClientCreate, db: Session = Depends(db_conf.get_
     return crud.create_client(db, client)
 
 @router.get("/", response_model=list[schemas.ClientResponse])
-def read_clients(db: Session = Depends(db_conf.get_db)):
+def read_clients(request: Request, response: Response, db: Session = Depends(db_conf.get_db)):
+    not_modified = check_etag(request, response, db, "clients")
+    if not_modified:
+        return not_modified
     return crud.get_clients(db)
 
 @router.post("/login", response_model=schemas.ClientResponse)
@@ -35,14 +53,21 @@ def create_order(order: schemas.OrderCreate, db: Session = Depends(db_conf.get_d
     return db_order
 
 @order_router.get("/", response_model=list[schemas.OrderResponse])
-def get_orders(client_id: int = None, db: Session = Depends(db_conf.get_db)):
+def get_orders(request: Request, response: Response, client_id: int = None, db: Session = Depends(db_conf.get_db)):
+    not_modified = check_etag(request, response, db, "orders")
+    if not_modified:
+        return not_modified
     return crud.get_orders(db, client_id)
 
 @order_router.get("/{order_id}", response_model=schemas.OrderResponse)
-def get_order(order_id: int, db: Session = Depends(db_conf.get_db)):
+def get_order(order_id: int, request: Request, response: Response, db: Session = Depends(db_conf.get_db)):
     db_order = crud.get_order_by_id(db, order_id)
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
+    # the row's own version, so writes to other orders keep this ETag valid
+    not_modified = conditional(request, response, f'W/"order-{order_id}-{db_order.version}"')
+    if not_modified:
+        return not_modified
     return db_order
 
 @order_router.put("/{order_id}/status", response_model=schemas.OrderResponse)
@@ -1,29 +1,35 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+from contextlib import asynccontextmanager
 import sqlite3
 import datetime
+import os
 
-app = FastAPI(title="ROS - Route Optimisation System")
+import migrations
+import routing
+import track_log
 
 DB_NAME = "ros.db"
 
-# ---------------------- Database Setup ----------------------
-def init_db():
+# ---------------------- Lifespan ----------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bring the schema up to date on startup (see migrations.py), not at import."""
     conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS delivery_locations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id TEXT,
-            latitude REAL,
-            longitude REAL,
-            timestamp TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    try:
+        before, after = migrations.migrate(conn)
+        if before != after:
+            print(f"ROS schema migrated from version {before} to {after}")
+        if tracks is not None:
+            tracks.open(conn)
+    finally:
+        conn.close()
+    yield
+    if tracks is not None:
+        tracks.close()
 
-init_db()
+app = FastAPI(title="ROS - Route Optimisation System", lifespan=lifespan)
 
 # ---------------------- Models ----------------------
 class LocationUpdate(BaseModel):
@@ -31,39 +37,203 @@ class LocationUpdate(BaseModel):
     latitude: float
     longitude: float
 
+class LocationPoint(BaseModel):
+    order_id: str
+    latitude: float
+    longitude: float
+    # when the device recorded the point; defaults to the time it is received
+    timestamp: Optional[datetime.datetime] = None
+
+class LocationBatch(BaseModel):
+    points: List[LocationPoint]
+
 class LocationResponse(BaseModel):
     order_id: str
     latitude: float
     longitude: float
     timestamp: str
 
+# ---------------------- Track Storage ----------------------
+# "sqlite" keeps every ping as a delivery_locations row; "log" appends them to
+# the binary segment files of track_log.py instead (latest positions and the
+# HTTP API are the same either way)
+TRACK_STORE = os.environ.get("ROS_TRACK_STORE", "sqlite")
+tracks = track_log.TrackLog(os.environ.get("ROS_TRACK_DIR", "tracks")) if TRACK_STORE == "log" else None
+
+# what the delivery_locations trigger does for rows that go to the log
+UPSERT_LATEST = """
+    INSERT INTO latest_location (order_id, latitude, longitude, timestamp) VALUES (?, ?, ?, ?)
+    ON CONFLICT (order_id) DO UPDATE SET
+        latitude = excluded.latitude,
+        longitude = excluded.longitude,
+        timestamp = excluded.timestamp
+    WHERE excluded.timestamp >= latest_location.timestamp
+"""
+
+def store_points(rows: list):
+    """Store (order_id, latitude, longitude, timestamp) rows in one transaction."""
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        if tracks is None:
+            cur.executemany(
+                "INSERT INTO delivery_locations (order_id, latitude, longitude, timestamp) VALUES (?, ?, ?, ?)",
+                rows
+            )
+        else:
+            tracks.append(cur, rows)
+            cur.executemany(UPSERT_LATEST, rows)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
 # ---------------------- Endpoints ----------------------
 
 @app.post("/location/update/", response_model=LocationResponse)
 def update_location(loc: LocationUpdate):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    timestamp = datetime.datetime.utcnow().isoformat()
-    cur.execute(
-        "INSERT INTO delivery_locations (order_id, latitude, longitude, timestamp) VALUES (?, ?, ?, ?)",
-        (loc.order_id, loc.latitude, loc.longitude, timestamp)
-    )
-    conn.commit()
-    conn.close()
+    # fixed width, so text order is time order (isoformat() drops zero microseconds)
+    timestamp = datetime.datetime.utcnow().isoformat(timespec="microseconds")
+    store_points([(loc.order_id, loc.latitude, loc.longitude, timestamp)])
     return LocationResponse(order_id=loc.order_id, latitude=loc.latitude, longitude=loc.longitude, timestamp=timestamp)
 
+MAX_BATCH_POINTS = 10000
+# how far ahead of the server clock a device timestamp may be; anything later
+# would pin latest_location (which only moves forward in time) to a bogus point
+MAX_CLOCK_SKEW = datetime.timedelta(minutes=5)
+
+def _naive_utc(ts: datetime.datetime) -> datetime.datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return ts
+
+def _stored_timestamp(ts: Optional[datetime.datetime], received: str) -> str:
+    """Same fixed-width naive-UTC ISO form update_location writes."""
+    if ts is None:
+        return received
+    return _naive_utc(ts).isoformat(timespec="microseconds")
+
+def _invalid_reason(p: LocationPoint, latest_allowed: datetime.datetime) -> Optional[str]:
+    if not p.order_id:
+        return "missing order_id"
+    if not -90 <= p.latitude <= 90 or not -180 <= p.longitude <= 180:
+        return "coordinates out of range"
+    if p.timestamp is not None and _naive_utc(p.timestamp) > latest_allowed:
+        return "timestamp in the future"
+    return None
+
+@app.post("/location/batch")
+def update_locations_batch(batch: LocationBatch):
+    """
+    Store many pings (from one or many orders) in a single transaction.
+
+    The whole batch is validated first and rejected as a unit if any point
+    is out of range or stamped more than MAX_CLOCK_SKEW ahead of the server
+    clock; the rows then go in with one executemany and one commit, and
+    each order's latest position only moves forward in time (points may
+    arrive out of order).
+    """
+    if len(batch.points) > MAX_BATCH_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_POINTS} points per request")
+
+    now = datetime.datetime.utcnow()
+    latest_allowed = now + MAX_CLOCK_SKEW
+    invalid = []
+    for i, p in enumerate(batch.points):
+        reason = _invalid_reason(p, latest_allowed)
+        if reason:
+            invalid.append({"index": i, "order_id": p.order_id, "reason": reason})
+    if invalid:
+        raise HTTPException(status_code=400, detail={"message": "Invalid points", "invalid": invalid})
+
+    received = now.isoformat(timespec="microseconds")
+    rows = [(p.order_id, p.latitude, p.longitude, _stored_timestamp(p.timestamp, received)) for p in batch.points]
+    store_points(rows)
+    return {"accepted": len(rows), "orders": len({r[0] for r in rows})}
+
 @app.get("/location/{order_id}", response_model=LocationResponse)
 def get_location(order_id: str):
+    # latest_location is maintained by a trigger on delivery_locations
     conn = sqlite3.connect(DB_NAME)
     cur = conn.cursor()
-    cur.execute("""
-        SELECT latitude, longitude, timestamp 
-        FROM delivery_locations 
-        WHERE order_id=? 
-        ORDER BY timestamp DESC LIMIT 1
-    """, (order_id,))
+    cur.execute("SELECT latitude, longitude, timestamp FROM latest_location WHERE order_id=?", (order_id,))
     row = cur.fetchone()
     conn.close()
     if not row:
         raise HTTPException(status_code=404, detail="Location not found")
     return LocationResponse(order_id=order_id, latitude=row[0], longitude=row[1], timestamp=row[2])
+
+@app.get("/location/{order_id}/history", response_model=List[LocationResponse])
+def get_location_history(order_id: str, since: Optional[str] = None, limit: int = Query(500, ge=1, le=10000)):
+    """Track points for an order in time order, optionally only those after `since` (ISO timestamp)."""
+    conn = sqlite3.connect(DB_NAME)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT latitude, longitude, timestamp
+        FROM delivery_locations
+        WHERE order_id=? AND timestamp > ?
+        ORDER BY timestamp LIMIT ?
+    """, (order_id, since or "", limit))
+    rows = cur.fetchall()
+    if tracks is not None:
+        # points stored before the log was enabled stay in delivery_locations
+        logged = [(lat, lon, ts) for ts, lat, lon in tracks.history(cur, order_id) if ts > (since or "")]
+        rows = sorted(rows + logged, key=lambda r: r[2])[:limit]
+    conn.close()
+    return [LocationResponse(order_id=order_id, latitude=r[0], longitude=r[1], timestamp=r[2]) for r in rows]
+
+# ---------------------- Route Optimisation ----------------------
+class Point(BaseModel):
+    latitude: float
+    longitude: float
+
+class Stop(BaseModel):
+    id: str
+    latitude: float
+    longitude: float
+
+class RouteRequest(BaseModel):
+    # unknown fields (e.g. order_ids) get a 422 instead of being silently ignored
+    model_config = ConfigDict(extra="forbid")
+
+    depot: Point
+    # delivery stops with their destination coordinates; use the order id as the stop id
+    stops: List[Stop]
+    # one route per driver; empty means a single unassigned route
+    drivers: List[str] = []
+    time_budget_ms: int = 2000
+
+MAX_ROUTE_STOPS = 10000
+MAX_TIME_BUDGET_MS = 30000
+
+@app.post("/routes/optimise")
+def optimise_routes(request: RouteRequest):
+    """
+    Visiting order per driver for a depot plus stops (see routing.py):
+    sectors around the depot, nearest-neighbour tours, then 2-opt/Or-opt
+    until converged or time_budget_ms is spent. Every route starts and ends
+    at the depot; distances are great-circle km.
+
+    Stops must carry their delivery coordinates. ROS only knows where an
+    order's driver last reported from (latest_location), not where the
+    order is going, so order ids alone cannot be routed.
+    """
+    if not 0 <= request.time_budget_ms <= MAX_TIME_BUDGET_MS:
+        raise HTTPException(status_code=400, detail=f"time_budget_ms must be between 0 and {MAX_TIME_BUDGET_MS}")
+    if len(request.stops) > MAX_ROUTE_STOPS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ROUTE_STOPS} stops per request")
+
+    stops = [(s.id, s.latitude, s.longitude) for s in request.stops]
+    if not stops:
+        raise HTTPException(status_code=400, detail="No stops to route")
+
+    result = routing.optimise((request.depot.latitude, request.depot.longitude), stops,
+                              drivers=max(1, len(request.drivers)),
+                              time_budget=request.time_budget_ms / 1000)
+    for route, driver_id in zip(result["routes"], request.drivers or [None]):
+        route["driver_id"] = driver_id
+    result["engine"] = routing.ENGINE
+    return result
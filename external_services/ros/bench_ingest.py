@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+ROS GPS Ingestion Benchmark
+Runs the ROS app in-process on a throwaway database and measures how many
+location points per second it stores, first with one POST /location/update/
+per point and then with POST /location/batch at several batch sizes.
+
+    python bench_ingest.py --points 5000 --orders 200 --batch-sizes 50 500 5000
+
+Needs httpx (for FastAPI's TestClient).
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+
+
+def make_points(count: int, orders: int) -> list[dict]:
+    rng = random.Random(7)
+    return [{"order_id": f"ORD-{rng.randrange(orders):05d}",
+             "latitude": 6.9 + rng.uniform(-0.2, 0.2),
+             "longitude": 79.8 + rng.uniform(-0.2, 0.2)} for _ in range(count)]
+
+
+def single(client: TestClient, points: list[dict]) -> float:
+    started = time.perf_counter()
+    for p in points:
+        client.post("/location/update/", json=p).raise_for_status()
+    return time.perf_counter() - started
+
+
+def batched(client: TestClient, points: list[dict], size: int) -> float:
+    started = time.perf_counter()
+    for i in range(0, len(points), size):
+        client.post("/location/batch", json={"points": points[i:i + size]}).raise_for_status()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ROS location ingestion")
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[50, 500, 5000])
+    args = parser.parse_args()
+
+    # app.DB_NAME is relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="ros-bench-"))
+    import app
+
+    points = make_points(args.points, args.orders)
+    with TestClient(app.app) as client:
+        elapsed = single(client, points)
+        print(f"one point per request   {args.points / elapsed:10,.0f} points/s")
+        for size in args.batch_sizes:
+            elapsed = batched(client, points, size)
+            print(f"batch of {size:<6d}         {args.points / elapsed:10,.0f} points/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Route Optimisation Benchmark
+Runs routing.optimise() on random stops spread over a city-sized area at
+50, 500 and 5000 stops (by default) and reports, per size and driver count,
+the nearest-neighbour construction length, the length after 2-opt/Or-opt,
+the improvement, the time taken and whether local search converged within
+the budget.
+
+    python bench_routes.py --sizes 50 500 5000 --drivers 1 8 --budget 10
+
+Uses NumPy for the distance matrix when it is installed.
+"""
+
+import argparse
+import random
+
+import routing
+
+DEPOT = (6.9271, 79.8612)
+SPREAD = 0.25  # degrees either side of the depot, ~28 km
+
+
+def make_stops(count: int, seed: int) -> list[tuple]:
+    rng = random.Random(seed)
+    return [(f"S{i}", DEPOT[0] + rng.uniform(-SPREAD, SPREAD), DEPOT[1] + rng.uniform(-SPREAD, SPREAD))
+            for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ROS route optimiser")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--drivers", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--budget", type=float, default=10.0, help="time budget in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"distance engine: {routing.ENGINE}, budget {args.budget:g}s")
+    print(f"{'stops':>6s}{'drivers':>8s}{'nn km':>11s}{'final km':>11s}{'gain':>7s}{'ms':>9s}  converged")
+    for size in args.sizes:
+        stops = make_stops(size, args.seed)
+        for drivers in args.drivers:
+            if drivers > size:
+                continue
+            result = routing.optimise(DEPOT, stops, drivers, args.budget)
+            gain = 1 - result["distance_km"] / result["construction_km"] if result["construction_km"] else 0.0
+            print(f"{size:6d}{drivers:8d}{result['construction_km']:11.1f}{result['distance_km']:11.1f}"
+                  f"{gain:7.1%}{result['elapsed_ms']:9.0f}  {result['converged']}")
+
+
+if __name__ == "__main__":
+    main()
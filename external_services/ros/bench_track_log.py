@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+ROS Track Storage Benchmark
+Writes the same synthetic GPS tracks into a throwaway database twice, once
+as delivery_locations rows (the default store) and once through the binary
+track log (ROS_TRACK_STORE=log), then reports disk bytes per point, the
+time for a full time-range scan and for per-order history reads.
+
+    python bench_track_log.py --points 500000 --orders 2000
+
+The SQLite figure includes the (order_id, timestamp) index and the
+latest_location table; the log figure includes its segment files plus the
+whole ros.db holding its index.
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import migrations
+import track_log
+
+INSERT = "INSERT INTO delivery_locations (order_id, latitude, longitude, timestamp) VALUES (?, ?, ?, ?)"
+
+
+def make_points(count: int, orders: int) -> list[tuple]:
+    """Interleaved pings, five seconds apart per order, like a live fleet."""
+    rng = random.Random(11)
+    start = datetime.datetime(2025, 1, 1)
+    return [(f"ORD-{i % orders:06d}", 6.9 + rng.uniform(-0.3, 0.3), 79.8 + rng.uniform(-0.3, 0.3),
+             (start + datetime.timedelta(seconds=5 * (i // orders), milliseconds=i % orders))
+             .isoformat(timespec="microseconds"))
+            for i in range(count)]
+
+
+def write(conn, points: list[tuple], batch: int, store):
+    cur = conn.cursor()
+    started = time.perf_counter()
+    for i in range(0, len(points), batch):
+        cur.execute("BEGIN IMMEDIATE")
+        store(cur, points[i:i + batch])
+        conn.commit()
+    return time.perf_counter() - started
+
+
+def size_of(*paths) -> int:
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            total += sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def timed(fn) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SQLite rows with the binary track log")
+    parser.add_argument("--points", type=int, default=500000)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=5000, help="points per write transaction")
+    parser.add_argument("--lookups", type=int, default=200, help="per-order history reads")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="ros-tracks-"))
+    points = make_points(args.points, args.orders)
+    sample = random.Random(3).sample(sorted({p[0] for p in points}), min(args.lookups, args.orders))
+    since = "2025-01-01T00:00:00.000000"
+
+    rows_db = sqlite3.connect("rows.db")
+    migrations.migrate(rows_db)
+    write_rows = write(rows_db, points, args.batch, lambda cur, chunk: cur.executemany(INSERT, chunk))
+    rows_db.execute("VACUUM")
+
+    log_db = sqlite3.connect("log.db")
+    migrations.migrate(log_db)
+    log = track_log.TrackLog("tracks")
+    log.open(log_db)
+    write_log = write(log_db, points, args.batch, log.append)
+    log_db.execute("VACUUM")
+
+    scan_rows, n_rows = timed(lambda: sum(1 for _ in rows_db.execute(
+        "SELECT order_id, timestamp, latitude, longitude FROM delivery_locations WHERE timestamp >= ?", (since,))))
+    scan_log, n_log = timed(lambda: sum(1 for _ in log.scan(log_db.cursor(), since_us=track_log.to_us(since))))
+    history_rows, _ = timed(lambda: [rows_db.execute(
+        "SELECT latitude, longitude, timestamp FROM delivery_locations WHERE order_id = ? ORDER BY timestamp",
+        (order_id,)).fetchall() for order_id in sample])
+    history_log, _ = timed(lambda: [log.history(log_db.cursor(), order_id) for order_id in sample])
+    assert n_rows == n_log == args.points
+
+    print(f"{args.points:,} points, {args.orders:,} orders")
+    print(f"{'':14s}{'bytes/point':>12s}{'write pts/s':>14s}{'scan pts/s':>14s}{'history ms':>12s}")
+    for name, size, wrote, scanned, history in (
+        ("sqlite rows", size_of("rows.db"), write_rows, scan_rows, history_rows),
+        ("track log", size_of("log.db", "tracks"), write_log, scan_log, history_log),
+    ):
+        print(f"{name:14s}{size / args.points:12.1f}{args.points / wrote:14,.0f}"
+              f"{args.points / scanned:14,.0f}{history / len(sample) * 1000:12.2f}")
+    log.close()
+
+
+if __name__ == "__main__":
+    main()
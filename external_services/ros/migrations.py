@@ -0,0 +1,98 @@
+"""
+Versioned schema migrations for the ROS database.
+
+Same scheme as the WMS (wms/migrations.py): the version is kept in
+`PRAGMA user_version`, and on startup every step newer than it runs in
+order, each bumping the version when done. Steps change the schema in
+place (ADD COLUMN, CREATE ... IF NOT EXISTS) and are idempotent, so
+databases created before versioning (version 0) adopt it safely.
+
+Adding a schema change means appending a function to MIGRATIONS.
+"""
+
+import sqlite3
+
+import track_log
+
+
+def _delivery_locations(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS delivery_locations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT,
+            latitude REAL,
+            longitude REAL,
+            timestamp TEXT
+        )
+    """)
+    conn.commit()
+
+
+def _track_index(conn):
+    # per-order track history in time order; timestamps are ISO-8601 text,
+    # which sorts chronologically
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_delivery_locations_order_ts "
+                 "ON delivery_locations (order_id, timestamp)")
+    conn.commit()
+
+
+def _latest_location(conn):
+    """
+    One row per order holding its newest ping, kept current by a trigger on
+    delivery_locations, so GET /location/{order_id} is a primary-key lookup
+    however long the track gets. A late (older) ping never overwrites a
+    newer position.
+    """
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS latest_location (
+            order_id TEXT PRIMARY KEY,
+            latitude REAL,
+            longitude REAL,
+            timestamp TEXT
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS trg_delivery_locations_latest
+        AFTER INSERT ON delivery_locations
+        BEGIN
+            INSERT INTO latest_location (order_id, latitude, longitude, timestamp)
+            VALUES (NEW.order_id, NEW.latitude, NEW.longitude, NEW.timestamp)
+            ON CONFLICT (order_id) DO UPDATE SET
+                latitude = excluded.latitude,
+                longitude = excluded.longitude,
+                timestamp = excluded.timestamp
+            WHERE excluded.timestamp >= latest_location.timestamp;
+        END;
+
+        -- bare columns next to MAX() come from the row holding the maximum
+        INSERT OR REPLACE INTO latest_location (order_id, latitude, longitude, timestamp)
+        SELECT order_id, latitude, longitude, MAX(timestamp)
+        FROM delivery_locations GROUP BY order_id;
+    """)
+
+
+MIGRATIONS = [
+    _delivery_locations,
+    _track_index,
+    _latest_location,
+    # index tables of the optional binary track log
+    track_log.install,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> tuple[int, int]:
+    """Apply pending steps; returns (version before, version after)."""
+    start = current_version(conn)
+    if start > SCHEMA_VERSION:
+        raise RuntimeError(f"ros.db is at schema version {start}, newer than this code ({SCHEMA_VERSION})")
+    for version, step in enumerate(MIGRATIONS[start:], start=start + 1):
+        step(conn)
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute(f"PRAGMA user_version = {version}")
+    return start, SCHEMA_VERSION
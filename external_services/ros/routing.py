@@ -0,0 +1,352 @@
+"""
+Route optimisation for ROS.
+
+optimise() takes a depot and a set of stops and returns, per driver, a
+closed tour depot -> stops -> depot:
+
+1. Split: stops are sorted by bearing from the depot and cut into equally
+   sized sectors, one per driver, starting at the widest angular gap so a
+   sector does not straddle a cluster.
+2. Construction: nearest neighbour from the depot.
+3. Improvement: 2-opt and Or-opt (moving runs of 1-3 stops, either way
+   round), with candidate moves restricted to each stop's NEIGHBOURS
+   nearest stops, until no move helps or the time budget is spent.
+
+Distances are great-circle (haversine) kilometres. With NumPy installed,
+routes of up to MATRIX_LIMIT stops get a precomputed, vectorised distance
+matrix; otherwise (and for bigger routes) distances are computed on
+demand, which local search needs far fewer of than a full matrix holds and
+keeps memory linear. Neighbour lists come from a uniform grid, so nothing
+else is quadratic.
+"""
+
+import math
+import time
+from collections import defaultdict, deque
+
+try:
+    import numpy as np
+except ImportError:  # optional; distances are then computed on demand
+    np = None
+
+ENGINE = "numpy" if np is not None else "python"
+
+EARTH_RADIUS_KM = 6371.0088
+MATRIX_LIMIT = 1200
+NEIGHBOURS = 10
+OR_OPT_MAX = 3
+EPS = 1e-9
+
+
+# ---------------------- Distances ----------------------
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_matrix(lats: list[float], lons: list[float]) -> list[list[float]]:
+    """All-pairs distances in km, as nested lists (fast scalar lookups)."""
+    if np is not None:
+        lat = np.radians(np.asarray(lats, dtype=np.float64))
+        lon = np.radians(np.asarray(lons, dtype=np.float64))
+        a = (np.sin((lat[:, None] - lat[None, :]) / 2) ** 2
+             + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin((lon[:, None] - lon[None, :]) / 2) ** 2)
+        return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))).tolist()
+    return [[haversine_km(la, lo, lb, lob) for lb, lob in zip(lats, lons)] for la, lo in zip(lats, lons)]
+
+
+def _distance_fn(lats: list[float], lons: list[float]):
+    if np is not None and len(lats) <= MATRIX_LIMIT:
+        matrix = haversine_matrix(lats, lons)
+        return lambda i, j: matrix[i][j]
+    rlat = [math.radians(x) for x in lats]
+    rlon = [math.radians(x) for x in lons]
+    cos = [math.cos(x) for x in rlat]
+    sin, asin, sqrt = math.sin, math.asin, math.sqrt
+
+    def dist(i, j):
+        a = sin((rlat[j] - rlat[i]) / 2) ** 2 + cos[i] * cos[j] * sin((rlon[j] - rlon[i]) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+    return dist
+
+
+class _Grid:
+    """
+    Uniform grid over an equirectangular projection of the points (km),
+    accurate enough to pick candidates at city and regional scale. Points
+    can be removed, so it also answers "nearest point not yet visited".
+    """
+
+    def __init__(self, lats: list[float], lons: list[float]):
+        n = len(lats)
+        scale = math.pi / 180 * EARTH_RADIUS_KM
+        kx = scale * math.cos(math.radians(sum(lats) / n))
+        self.xs = [lon * kx for lon in lons]
+        self.ys = [lat * scale for lat in lats]
+        min_x, min_y = min(self.xs), min(self.ys)
+        self.side = max(1, int(math.sqrt(n / 2)))
+        self.cell = max(max(self.xs) - min_x, max(self.ys) - min_y, 1e-9) / self.side
+        self.keys = [(int((x - min_x) / self.cell), int((y - min_y) / self.cell)) for x, y in zip(self.xs, self.ys)]
+        self.buckets = defaultdict(set)
+        for i, key in enumerate(self.keys):
+            self.buckets[key].add(i)
+
+    def remove(self, i: int):
+        self.buckets[self.keys[i]].discard(i)
+
+    def nearest(self, i: int, k: int) -> list[int]:
+        """Up to k points still in the grid nearest to point i (excluding i), nearest first."""
+        cx, cy = self.keys[i]
+        xs, ys, x, y = self.xs, self.ys, self.xs[i], self.ys[i]
+        found = []
+        ring = 0
+        while True:
+            for dx in range(-ring, ring + 1):
+                # only the cells on this ring's border
+                step = 1 if abs(dx) == ring else 2 * ring
+                for dy in range(-ring, ring + 1, step or 1):
+                    for j in self.buckets.get((cx + dx, cy + dy), ()):
+                        if j != i:
+                            found.append(((xs[j] - x) ** 2 + (ys[j] - y) ** 2, j))
+            # anything beyond this ring is at least ring * cell away
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= (ring * self.cell) ** 2:
+                    break
+            if ring > self.side:
+                found.sort()
+                break
+            ring += 1
+        return [j for _, j in found[:k]]
+
+
+def nearest_neighbours(lats: list[float], lons: list[float], k: int = NEIGHBOURS) -> list[list[int]]:
+    """Each point's k nearest others, nearest first."""
+    grid = _Grid(lats, lons)
+    return [grid.nearest(i, k) for i in range(len(lats))]
+
+
+# ---------------------- Split ----------------------
+def split_by_bearing(depot: tuple, points: list[tuple], parts: int) -> list[list[int]]:
+    """Indices of `points` (lat, lon) cut into `parts` sectors around the depot."""
+    n = len(points)
+    if parts <= 1 or n == 0:
+        return [list(range(n))] + [[] for _ in range(max(0, parts - 1))]
+    lat0, lon0 = depot
+    kx = math.cos(math.radians(lat0))
+    bearing = [math.atan2(lat - lat0, (lon - lon0) * kx) for lat, lon in points]
+    order = sorted(range(n), key=bearing.__getitem__)
+    gaps = [(bearing[order[(i + 1) % n]] - bearing[order[i]]) % (2 * math.pi) for i in range(n)]
+    start = (max(range(n), key=gaps.__getitem__) + 1) % n
+    order = order[start:] + order[:start]
+    return [order[p * n // parts:(p + 1) * n // parts] for p in range(parts)]
+
+
+# ---------------------- Tour Construction ----------------------
+def _nearest_neighbour_tour(lats: list[float], lons: list[float], dist, neighbours) -> list[int]:
+    n = len(lats)
+    unvisited = set(range(1, n))
+    grid = None
+    tour = [0]
+    current = 0
+    while unvisited:
+        best = None
+        best_d = math.inf
+        for j in neighbours[current]:
+            if j in unvisited:
+                d = dist(current, j)
+                if d < best_d:
+                    best, best_d = j, d
+        if best is None:
+            # every candidate is used up; ask a grid holding only unvisited points
+            if grid is None:
+                grid = _Grid(lats, lons)
+                for j in tour:
+                    grid.remove(j)
+            best = grid.nearest(current, 1)[0]
+        unvisited.remove(best)
+        if grid is not None:
+            grid.remove(best)
+        tour.append(best)
+        current = best
+    return tour
+
+
+def tour_length(tour: list[int], dist) -> float:
+    return sum(dist(tour[i - 1], tour[i]) for i in range(len(tour)))
+
+
+# ---------------------- Local Search ----------------------
+def _reverse(tour: list[int], pos: list[int], i: int, j: int):
+    """Reverse the cyclic stretch of positions i..j (or, equivalently, the rest)."""
+    n = len(tour)
+    length = (j - i) % n + 1
+    if 2 * length > n:
+        i, j = (j + 1) % n, (i - 1) % n
+        length = n - length
+    for _ in range(length // 2):
+        a, b = tour[i], tour[j]
+        tour[i], pos[b] = b, i
+        tour[j], pos[a] = a, j
+        i = (i + 1) % n
+        j = (j - 1) % n
+
+
+def _move_segment(tour: list[int], pos: list[int], i: int, j: int, k: int, flip: bool):
+    """Move positions i..j (no wrap) to just after position k (outside i..j)."""
+    segment = tour[i:j + 1]
+    if flip:
+        segment.reverse()
+    if k > j:
+        tour[i:k + 1] = tour[j + 1:k + 1] + segment
+        lo, hi = i, k
+    else:
+        tour[k + 1:j + 1] = segment + tour[k + 1:i]
+        lo, hi = k + 1, j
+    for idx in range(lo, hi + 1):
+        pos[tour[idx]] = idx
+
+
+def _improve(tour: list[int], dist, neighbours, deadline: float) -> bool:
+    """2-opt + Or-opt in place; returns True if it ran to a local optimum."""
+    n = len(tour)
+    pos = [0] * n
+    for idx, node in enumerate(tour):
+        pos[node] = idx
+    queue = deque(tour)
+    queued = [True] * n
+
+    def wake(*nodes):
+        for node in nodes:
+            if not queued[node]:
+                queued[node] = True
+                queue.append(node)
+
+    while queue:
+        if time.perf_counter() > deadline:
+            return False
+        a = queue.popleft()
+        queued[a] = False
+        i = pos[a]
+        improved = False
+
+        # 2-opt, replacing a's edge to its successor, then to its predecessor
+        b = tour[(i + 1) % n]
+        d_ab = dist(a, b)
+        for c in neighbours[a]:
+            gain = d_ab - dist(a, c)
+            if c == b or gain <= EPS:
+                continue
+            j = pos[c]
+            d = tour[(j + 1) % n]
+            if d == a:
+                continue
+            if gain + dist(c, d) - dist(b, d) > EPS:
+                _reverse(tour, pos, (i + 1) % n, j)
+                wake(a, b, c, d)
+                improved = True
+                break
+        if improved:
+            continue
+        p = tour[i - 1]
+        d_pa = dist(p, a)
+        for c in neighbours[a]:
+            gain = d_pa - dist(a, c)
+            if c == p or gain <= EPS:
+                continue
+            j = pos[c]
+            cp = tour[j - 1]
+            if cp == a:
+                continue
+            if gain + dist(cp, c) - dist(p, cp) > EPS:
+                _reverse(tour, pos, j, (i - 1) % n)
+                wake(a, p, c, cp)
+                improved = True
+                break
+        if improved:
+            continue
+
+        # Or-opt: move the run starting at a elsewhere, either way round
+        for length in range(1, OR_OPT_MAX + 1):
+            j = i + length - 1
+            if j >= n or length >= n - 2:
+                break
+            e = tour[j]
+            p = tour[i - 1]
+            nx = tour[(j + 1) % n]
+            removed = dist(p, a) + dist(e, nx) - dist(p, nx)
+            if removed <= EPS:
+                continue
+            best = None
+            for c in neighbours[a] + neighbours[e]:
+                k = pos[c]
+                if i <= k <= j or c == p:
+                    continue
+                cn = tour[(k + 1) % n]
+                base = dist(c, cn)
+                forward = dist(c, a) + dist(e, cn) - base
+                backward = dist(c, e) + dist(a, cn) - base
+                added, flip = (forward, False) if forward <= backward else (backward, True)
+                if removed - added > EPS and (best is None or added < best[0]):
+                    best = (added, k, flip, c, cn)
+            if best is not None:
+                _, k, flip, c, cn = best
+                _move_segment(tour, pos, i, j, k, flip)
+                wake(a, e, p, nx, c, cn)
+                improved = True
+                break
+    return True
+
+
+def solve_tour(lats: list[float], lons: list[float], deadline: float) -> dict:
+    """Tour over points 0..n-1 starting and ending at point 0."""
+    n = len(lats)
+    if n <= 3:
+        # with the depot and at most two stops every order is optimal
+        dist = _distance_fn(lats, lons)
+        tour = list(range(n))
+        length = tour_length(tour, dist) if n > 1 else 0.0
+        return {"tour": tour, "construction_km": length, "distance_km": length, "converged": True}
+    dist = _distance_fn(lats, lons)
+    neighbours = nearest_neighbours(lats, lons)
+    tour = _nearest_neighbour_tour(lats, lons, dist, neighbours)
+    constructed = tour_length(tour, dist)
+    converged = _improve(tour, dist, neighbours, deadline)
+    start = tour.index(0)
+    tour = tour[start:] + tour[:start]
+    return {"tour": tour, "construction_km": constructed, "distance_km": tour_length(tour, dist),
+            "converged": converged}
+
+
+def optimise(depot: tuple, stops: list[tuple], drivers: int = 1, time_budget: float = 2.0) -> dict:
+    """
+    depot is (latitude, longitude), stops are (id, latitude, longitude).
+    Returns {"routes": [{"stops": [ids], "distance_km"}], "distance_km",
+    "construction_km", "converged", "elapsed_ms"}, one route per driver.
+    """
+    started = time.perf_counter()
+    sectors = split_by_bearing(depot, [(lat, lon) for _, lat, lon in stops], max(1, drivers))
+    routes = []
+    construction = 0.0
+    converged = True
+    remaining = len(stops)
+    for sector in sectors:
+        # unspent time from earlier (easier) routes rolls over to later ones
+        left = time_budget - (time.perf_counter() - started)
+        deadline = time.perf_counter() + max(0.0, left) * len(sector) / max(1, remaining)
+        remaining -= len(sector)
+        lats = [depot[0]] + [stops[s][1] for s in sector]
+        lons = [depot[1]] + [stops[s][2] for s in sector]
+        solved = solve_tour(lats, lons, deadline)
+        construction += solved["construction_km"]
+        converged = converged and solved["converged"]
+        routes.append({"stops": [stops[sector[node - 1]][0] for node in solved["tour"][1:]],
+                       "distance_km": round(solved["distance_km"], 3)})
+    return {
+        "routes": routes,
+        "distance_km": round(sum(r["distance_km"] for r in routes), 3),
+        "construction_km": round(construction, 3),
+        "converged": converged,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,45 @@
+"""
+Shared fixtures for the ROS tests.
+
+Run from external_services/ros:
+
+    python -m pytest tests -q
+
+Every test gets a fresh ros.db in its own temporary directory (the app
+opens it relative to the working directory).
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def conn(workdir):
+    """A migrated ros.db without the app around it."""
+    import migrations
+
+    connection = sqlite3.connect("ros.db")
+    migrations.migrate(connection)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def client(workdir):
+    from fastapi.testclient import TestClient
+
+    import app
+
+    with TestClient(app.app) as c:
+        yield c
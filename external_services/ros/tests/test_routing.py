@@ -0,0 +1,62 @@
+"""Route optimiser (routing.py) and POST /routes/optimise."""
+
+import math
+import random
+
+import routing
+
+DEPOT = (6.9271, 79.8612)
+
+
+def circle(count, radius=0.05):
+    return [(f"S{i}", DEPOT[0] + radius * math.sin(2 * math.pi * i / count),
+             DEPOT[1] + radius * math.cos(2 * math.pi * i / count)) for i in range(count)]
+
+
+def scattered(count, seed=1):
+    rng = random.Random(seed)
+    return [(f"S{i}", DEPOT[0] + rng.uniform(-0.2, 0.2), DEPOT[1] + rng.uniform(-0.2, 0.2))
+            for i in range(count)]
+
+
+def test_haversine_known_distance():
+    # one degree of latitude is ~111.2 km
+    assert abs(routing.haversine_km(0, 0, 1, 0) - 111.195) < 0.01
+    assert routing.haversine_km(*DEPOT, *DEPOT) == 0
+
+
+def test_every_stop_is_routed_exactly_once():
+    stops = scattered(300)
+    result = routing.optimise(DEPOT, stops, drivers=4, time_budget=5)
+    assert len(result["routes"]) == 4
+    visited = [s for route in result["routes"] for s in route["stops"]]
+    assert sorted(visited) == sorted(s[0] for s in stops)
+    assert result["distance_km"] <= result["construction_km"] + 1e-6
+
+
+def test_local_search_untangles_a_circle():
+    stops = circle(24)
+    shuffled = random.Random(3).sample(stops, len(stops))
+    route = routing.optimise(DEPOT, shuffled, drivers=1, time_budget=5)["routes"][0]["stops"]
+    positions = [int(s[1:]) for s in route]
+    # the optimal tour walks round the circle: every step goes to a neighbour
+    steps = {(b - a) % 24 for a, b in zip(positions, positions[1:])}
+    assert steps in ({1}, {23})
+
+
+def test_reported_length_matches_the_tour():
+    stops = scattered(40, seed=7)
+    route = routing.optimise(DEPOT, stops, time_budget=5)["routes"][0]
+    points = [DEPOT] + [(lat, lon) for sid in route["stops"] for s, lat, lon in stops if s == sid] + [DEPOT]
+    length = sum(routing.haversine_km(*a, *b) for a, b in zip(points, points[1:]))
+    assert abs(length - route["distance_km"]) < 1e-3
+
+
+def test_endpoint_requires_coordinates(client):
+    depot = {"latitude": DEPOT[0], "longitude": DEPOT[1]}
+    assert client.post("/routes/optimise", json={"depot": depot, "order_ids": ["O1"]}).status_code == 422
+    assert client.post("/routes/optimise", json={"depot": depot, "stops": []}).status_code == 400
+    stops = [{"id": s, "latitude": lat, "longitude": lon} for s, lat, lon in scattered(10)]
+    response = client.post("/routes/optimise", json={"depot": depot, "stops": stops, "drivers": ["D1", "D2"]})
+    assert response.status_code == 200
+    assert [r["driver_id"] for r in response.json()["routes"]] == ["D1", "D2"]
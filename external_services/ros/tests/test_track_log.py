@@ -0,0 +1,91 @@
+"""Binary track log segments (track_log.py) and the location endpoints."""
+
+import datetime
+import os
+
+import track_log
+
+
+def points(order_id, count, start="2025-01-01T00:00:00.000001"):
+    first = datetime.datetime.fromisoformat(start)
+    return [(order_id, 6.9 + i / 1000, 79.8 + i / 1000,
+             (first + datetime.timedelta(seconds=i)).isoformat(timespec="microseconds")) for i in range(count)]
+
+
+def append(conn, log, rows):
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    log.append(cur, rows)
+    conn.commit()
+
+
+def test_microsecond_timestamps_round_trip():
+    ts = "2025-06-01T12:34:56.789123"
+    assert track_log.from_us(track_log.to_us(ts)) == ts
+
+
+def test_history_follows_each_orders_chain_across_segments(conn, workdir):
+    log = track_log.TrackLog(str(workdir / "tracks"), segment_records=4, fsync=False)
+    log.open(conn)
+    a, b = points("A", 7), points("B", 5)
+    # interleave the two orders so their chains cross segment boundaries
+    append(conn, log, [p for pair in zip(a, b) for p in pair] + a[5:])
+    assert sorted(os.listdir(workdir / "tracks")) == ["seg-000000.log", "seg-000001.log", "seg-000002.log"]
+    history = log.history(conn.cursor(), "A")
+    assert [ts for ts, _, _ in history] == [p[3] for p in a]
+    # float32 keeps ~1 m of precision
+    assert all(abs(lat - p[1]) < 1e-5 and abs(lon - p[2]) < 1e-5 for (_, lat, lon), p in zip(history, a))
+    assert [ts for ts, _, _ in log.history(conn.cursor(), "B")] == [p[3] for p in b]
+    assert log.history(conn.cursor(), "C") == []
+    log.close()
+
+
+def test_scan_filters_by_time_and_skips_segments(conn, workdir):
+    log = track_log.TrackLog(str(workdir / "tracks"), segment_records=4, fsync=False)
+    log.open(conn)
+    append(conn, log, points("A", 12))
+    since = track_log.to_us(points("A", 12)[8][3])
+    assert [ts for _, ts, _, _ in log.scan(conn.cursor(), since_us=since)] == \
+        [track_log.to_us(p[3]) for p in points("A", 12)[8:]]
+    log.close()
+
+
+def test_open_trims_bytes_of_an_uncommitted_append(conn, workdir):
+    log = track_log.TrackLog(str(workdir / "tracks"), fsync=False)
+    log.open(conn)
+    append(conn, log, points("A", 3))
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    log.append(cur, points("A", 2, start="2025-02-01T00:00:00"))
+    conn.rollback()
+    segment = workdir / "tracks" / "seg-000000.log"
+    assert segment.stat().st_size == 5 * track_log.RECORD.size
+    log.close()
+
+    reopened = track_log.TrackLog(str(workdir / "tracks"), fsync=False)
+    reopened.open(conn)
+    assert segment.stat().st_size == 3 * track_log.RECORD.size
+    assert len(reopened.history(conn.cursor(), "A")) == 3
+    reopened.close()
+
+
+def test_latest_location_only_moves_forward(client):
+    newer, older = "2025-01-01T00:00:10.000000", "2025-01-01T00:00:05.000000"
+    body = {"points": [{"order_id": "O1", "latitude": 1, "longitude": 2, "timestamp": newer},
+                       {"order_id": "O1", "latitude": 3, "longitude": 4, "timestamp": older}]}
+    assert client.post("/location/batch", json=body).status_code == 200
+    latest = client.get("/location/O1").json()
+    assert (latest["latitude"], latest["timestamp"]) == (1, newer)
+    assert [p["timestamp"] for p in client.get("/location/O1/history").json()] == [older, newer]
+
+
+def test_batch_rejects_bad_points_as_a_unit(client):
+    future = (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)).isoformat()
+    body = {"points": [{"order_id": "O1", "latitude": 1, "longitude": 2},
+                       {"order_id": "O1", "latitude": 99, "longitude": 2},
+                       {"order_id": "O1", "latitude": 1, "longitude": 2, "timestamp": future}]}
+    response = client.post("/location/batch", json=body)
+    assert response.status_code == 400
+    assert [(e["index"], e["reason"]) for e in response.json()["detail"]["invalid"]] == \
+        [(1, "coordinates out of range"), (2, "timestamp in the future")]
+    assert client.get("/location/O1").status_code == 404
@@ -0,0 +1,223 @@
+"""
+Append-only binary storage for ROS location tracks.
+
+An optional alternative to keeping every ping as a `delivery_locations`
+row (enable with ROS_TRACK_STORE=log). Each ping is a fixed 28-byte
+record:
+
+    ts_us      int64    epoch microseconds (UTC), the full precision the API stores
+    latitude   float32  ~1 m resolution, finer than GPS error
+    longitude  float32
+    order_idx  uint32   small integer standing for the order id
+    prev       int64    record number of the order's previous ping, -1 if none
+
+Records are appended to fixed-size segment files (tracks/seg-000000.log,
+...) and read back through read-only memory maps. Record numbers are
+global: record n lives in segment n // SEGMENT_RECORDS. The `prev` field
+chains each order's pings newest to oldest, so the per-order index is one
+row per order (its newest record and point count) rather than one entry
+per ping.
+
+The index lives in ros.db next to the rest of the schema:
+
+    track_log_orders    order_id -> order_idx, head record, points
+    track_log_segments  segment  -> committed records, min/max ts_us
+
+append() writes the records (and fsyncs them) before updating the index
+inside the caller's transaction, so the index only ever points at data
+that is on disk. Bytes past a segment's committed count are leftovers of
+a rolled-back or crashed append; they are overwritten by the next append
+and trimmed by open(). Writers must run inside BEGIN IMMEDIATE, which is
+what serializes them.
+"""
+
+import datetime
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+
+RECORD = struct.Struct("<qffIq")
+SEGMENT_RECORDS = 1 << 20  # 28 MiB per segment
+SQL_IN_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS track_log_orders (
+    order_id TEXT PRIMARY KEY,
+    order_idx INTEGER NOT NULL UNIQUE,
+    head INTEGER NOT NULL,
+    points INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS track_log_segments (
+    segment INTEGER PRIMARY KEY,
+    records INTEGER NOT NULL,
+    min_ts INTEGER,
+    max_ts INTEGER
+);
+"""
+
+
+def install(conn: sqlite3.Connection):
+    conn.executescript(SCHEMA)
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def to_us(timestamp: str) -> int:
+    """
+    Naive-UTC ISO timestamp (as stored by the API) -> epoch microseconds.
+    Lossless, so history and latest_location agree on every timestamp.
+    """
+    return (datetime.datetime.fromisoformat(timestamp) - _EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def from_us(ts_us: int) -> str:
+    return (_EPOCH + datetime.timedelta(microseconds=ts_us)).isoformat(timespec="microseconds")
+
+
+class TrackLog:
+    def __init__(self, directory: str, segment_records: int = SEGMENT_RECORDS, fsync: bool = True):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.fsync = fsync
+        self._maps: dict[int, mmap.mmap] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"seg-{segment:06d}.log")
+
+    def open(self, conn: sqlite3.Connection):
+        """Create the directory and trim uncommitted bytes off the segment files."""
+        os.makedirs(self.directory, exist_ok=True)
+        committed = dict(conn.execute("SELECT segment, records FROM track_log_segments").fetchall())
+        for name in os.listdir(self.directory):
+            if name.startswith("seg-") and name.endswith(".log"):
+                segment = int(name[4:-4])
+                size = committed.get(segment, 0) * RECORD.size
+                if os.path.getsize(self._path(segment)) > size:
+                    with open(self._path(segment), "r+b") as f:
+                        f.truncate(size)
+
+    def close(self):
+        with self._lock:
+            for m in self._maps.values():
+                m.close()
+            self._maps.clear()
+
+    # -------------------- writing --------------------
+    def append(self, cur: sqlite3.Cursor, points: list[tuple]) -> int:
+        """
+        Append (order_id, latitude, longitude, iso_timestamp) points and
+        update the index through `cur`, which must be inside a write
+        transaction the caller commits. Returns the number of records.
+        """
+        if not points:
+            return 0
+        order_ids = list(dict.fromkeys(p[0] for p in points))
+        orders = {}
+        for i in range(0, len(order_ids), SQL_IN_CHUNK):
+            chunk = order_ids[i:i + SQL_IN_CHUNK]
+            cur.execute(f"SELECT order_id, order_idx, head, points FROM track_log_orders "
+                        f"WHERE order_id IN ({','.join('?' * len(chunk))})", chunk)
+            orders.update((r[0], list(r[1:])) for r in cur.fetchall())
+        next_idx = cur.execute("SELECT COALESCE(MAX(order_idx) + 1, 0) FROM track_log_orders").fetchone()[0]
+        row = cur.execute("SELECT segment, records FROM track_log_segments ORDER BY segment DESC LIMIT 1").fetchone()
+        position = row[0] * self.segment_records + row[1] if row else 0
+
+        # segment -> [first slot, records bytes, min_ts, max_ts]
+        pending: dict[int, list] = {}
+        for order_id, latitude, longitude, timestamp in points:
+            entry = orders.get(order_id)
+            if entry is None:
+                entry = orders[order_id] = [next_idx, -1, 0]
+                next_idx += 1
+            ts_us = to_us(timestamp)
+            segment, slot = divmod(position, self.segment_records)
+            chunk = pending.get(segment)
+            if chunk is None:
+                chunk = pending[segment] = [slot, bytearray(), ts_us, ts_us]
+            chunk[1] += RECORD.pack(ts_us, latitude, longitude, entry[0], entry[1])
+            chunk[2] = min(chunk[2], ts_us)
+            chunk[3] = max(chunk[3], ts_us)
+            entry[1] = position
+            entry[2] += 1
+            position += 1
+
+        os.makedirs(self.directory, exist_ok=True)
+        for segment, (slot, data, _, _) in pending.items():
+            fd = os.open(self._path(segment), os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+            try:
+                os.lseek(fd, slot * RECORD.size, os.SEEK_SET)
+                os.write(fd, data)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+        cur.executemany("""
+            INSERT INTO track_log_segments (segment, records, min_ts, max_ts) VALUES (?, ?, ?, ?)
+            ON CONFLICT (segment) DO UPDATE SET
+                records = excluded.records,
+                min_ts = MIN(min_ts, excluded.min_ts),
+                max_ts = MAX(max_ts, excluded.max_ts)
+        """, [(segment, slot + len(data) // RECORD.size, lo, hi)
+              for segment, (slot, data, lo, hi) in pending.items()])
+        cur.executemany("""
+            INSERT INTO track_log_orders (order_id, order_idx, head, points) VALUES (?, ?, ?, ?)
+            ON CONFLICT (order_id) DO UPDATE SET head = excluded.head, points = excluded.points
+        """, [(order_id, *orders[order_id]) for order_id in order_ids])
+        return len(points)
+
+    # -------------------- reading --------------------
+    def _map(self, segment: int, needed: int) -> mmap.mmap:
+        """Map of `segment` covering at least `needed` bytes (remapped as the tail grows)."""
+        with self._lock:
+            m = self._maps.get(segment)
+            if m is None or len(m) < needed:
+                # a replaced map is left to the GC: a running scan may still hold a view of it
+                with open(self._path(segment), "rb") as f:
+                    m = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return m
+
+    def _record(self, number: int) -> tuple:
+        segment, slot = divmod(number, self.segment_records)
+        offset = slot * RECORD.size
+        return RECORD.unpack_from(self._map(segment, offset + RECORD.size), offset)
+
+    def history(self, cur: sqlite3.Cursor, order_id: str) -> list[tuple]:
+        """All (iso_timestamp, latitude, longitude) points of an order, oldest first."""
+        row = cur.execute("SELECT head FROM track_log_orders WHERE order_id = ?", (order_id,)).fetchone()
+        points = []
+        number = row[0] if row else -1
+        while number >= 0:
+            ts_us, latitude, longitude, _, number = self._record(number)
+            points.append((ts_us, latitude, longitude))
+        points.sort()
+        # 6 decimals (~0.1 m) is all the float32 fields hold; drops the widening noise
+        return [(from_us(ts), round(lat, 6), round(lon, 6)) for ts, lat, lon in points]
+
+    def scan(self, cur: sqlite3.Cursor, since_us: int | None = None, until_us: int | None = None):
+        """
+        Yield (order_id, ts_us, latitude, longitude) for every record in the
+        time range, segment by segment; segments entirely outside the range
+        are skipped without being read.
+        """
+        names = dict(cur.execute("SELECT order_idx, order_id FROM track_log_orders").fetchall())
+        segments = cur.execute("SELECT segment, records, min_ts, max_ts FROM track_log_segments "
+                               "ORDER BY segment").fetchall()
+        low = since_us if since_us is not None else -(1 << 63)
+        high = until_us if until_us is not None else (1 << 63) - 1
+        for segment, records, min_ts, max_ts in segments:
+            if records == 0 or max_ts < low or min_ts > high:
+                continue
+            size = records * RECORD.size
+            view = memoryview(self._map(segment, size))[:size]
+            try:
+                for ts_us, latitude, longitude, order_idx, _ in RECORD.iter_unpack(view):
+                    if low <= ts_us <= high:
+                        yield names.get(order_idx), ts_us, latitude, longitude
+            finally:
+                view.release()
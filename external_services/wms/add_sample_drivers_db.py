@@ -4,11 +4,9 @@ Direct Database Driver Addition
 Add sample drivers directly to the WMS SQLite database
 """
 
-import sqlite3
-import uuid
-from datetime import datetime
-
-DB_NAME = "wms.db"
+import db_conf
+import driver_import
+import migrations
 
 def add_sample_drivers():
     """Add sample drivers directly to the database"""
@@ -40,60 +38,33 @@ def add_sample_drivers():
     print()
     
     # Connect to database
-    conn = sqlite3.connect(DB_NAME)
+    conn = db_conf.get_connection()
     cur = conn.cursor()
     
-    # Ensure the drivers table exists with the correct schema
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS drivers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            driver_id TEXT UNIQUE,
-            name TEXT,
-            email TEXT UNIQUE,
-            phone TEXT,
-            license_number TEXT,
-            available INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    # Ensure the schema is current (creates the tables on a fresh database),
+    # under the service's lock so a service starting up cannot migrate concurrently
+    with migrations.schema_lock(db_conf.DB_NAME):
+        migrations.migrate(conn)
     
+    results = driver_import.import_drivers(conn, sample_drivers)
     added_drivers = []
     
-    for driver_data in sample_drivers:
-        # Generate unique driver ID
-        driver_id = f"DRV{uuid.uuid4().hex[:8].upper()}"
-        
-        try:
-            cur.execute("""
-                INSERT INTO drivers (driver_id, name, email, phone, license_number, available) 
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (driver_id, driver_data["name"], driver_data["email"], 
-                  driver_data["phone"], driver_data["license_number"], 1))
-            
+    for driver_data, result in zip(sample_drivers, results):
+        if result["status"] == "created":
             print(f"✅ Added driver: {driver_data['name']}")
-            print(f"   Driver ID: {driver_id}")
+            print(f"   Driver ID: {result['driver_id']}")
             print(f"   Email: {driver_data['email']}")
             print(f"   Phone: {driver_data['phone']}")
             print(f"   License: {driver_data['license_number']}")
             print()
             
-            added_drivers.append({
-                "driver_id": driver_id,
-                "name": driver_data["name"],
-                "email": driver_data["email"],
-                "phone": driver_data["phone"],
-                "license_number": driver_data["license_number"]
-            })
-            
-        except sqlite3.IntegrityError as e:
-            if "email" in str(e):
-                print(f"⚠️  Driver {driver_data['name']} already exists (email: {driver_data['email']})")
-            else:
-                print(f"⚠️  Failed to add driver {driver_data['name']}: {e}")
+            added_drivers.append({"driver_id": result["driver_id"], **driver_data})
+        elif result["status"] == "conflict":
+            print(f"⚠️  Driver {driver_data['name']} already exists (email: {driver_data['email']})")
+            print()
+        else:
+            print(f"⚠️  Failed to add driver {driver_data['name']}: {result['reason']}")
             print()
-    
-    # Commit changes
-    conn.commit()
     
     # Show all drivers in database
     print("📋 All Drivers in Database:")
@@ -109,7 +80,7 @@ def add_sample_drivers():
         print(f"   Available: {'Yes' if driver[5] else 'No'}")
         print()
     
-    conn.close()
+    db_conf.close_connection()
     
     print("=" * 45)
     if added_drivers:
@@ -1,62 +1,70 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
+import asyncio
+import base64
+import csv
+import json
+import os
 import sqlite3
-import socket
-import threading
 
-app = FastAPI(title="SwiftLogistics WMS")
+import archive
+import availability
+import change_feed
+import change_log
+import db_conf
+import db_executor
+import dispatch
+import event_broker
+import driver_import
+import events
+import fast_json
+import migrations
+import order_state
+import order_stats
+import write_queue
 
-DB_NAME = "wms.db"
+# ---------------------- Deployment Mode ----------------------
+# WMS_MULTIPROCESS=1 is required when running several workers/processes on
+# one wms.db (e.g. `uvicorn app:app --workers 4`). Nothing process-local is
+# then trusted for correctness: driver availability is read from the
+# database (availability.SharedAvailability) and the live feed is fed from
+# the event broker, so every worker's clients see every worker's changes.
+# Schema migrations are serialised across processes in both modes.
+MULTIPROCESS = os.environ.get("WMS_MULTIPROCESS", "0") == "1"
 
-# ---------------------- Database Setup ----------------------
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    
-    # orders table - for warehouse management
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id TEXT UNIQUE,
-            client_name TEXT,
-            pickup_location TEXT,
-            delivery_location TEXT,
-            package_info TEXT,
-            status TEXT DEFAULT 'pending',
-            driver_id TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            borrowed_at TIMESTAMP,
-            assigned_at TIMESTAMP
-        )
-    """)
-    
-    # deliveries table
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS deliveries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id TEXT UNIQUE,
-            delivery_status TEXT,
-            address TEXT,
-            driver_id TEXT
-        )
-    """)
-    # drivers table
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS drivers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            driver_id TEXT UNIQUE,
-            name TEXT,
-            email TEXT UNIQUE,
-            phone TEXT,
-            license_number TEXT,
-            available INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-init_db()
+# ---------------------- Lifespan ----------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Everything that touches disk or the network happens here rather than at
+    import: schema migrations (migrations.py), loading the availability
+    index, and starting the event publisher and group-commit writer.
+    """
+    with migrations.schema_lock(db_conf.DB_NAME), db_conf.dedicated_connection() as conn:
+        before, after = migrations.migrate(conn)
+        if before != after:
+            print(f"WMS schema migrated from version {before} to {after}")
+        availability_index.rebuild(conn)
+    publisher.start()
+    if writer is not None:
+        writer.start()
+    relay = asyncio.create_task(relay_broker_events()) if MULTIPROCESS else None
+    yield
+    if relay is not None:
+        relay.cancel()
+    if writer is not None:
+        writer.stop()
+    publisher.stop()
+    db_executor.shutdown()
+
+app = FastAPI(title="SwiftLogistics WMS", lifespan=lifespan)
+# handlers are async; their DB work runs on the read/write pools in db_executor.py
+
+# write-through cache of available drivers, see availability.py; filled at startup
+availability_index = availability.SharedAvailability() if MULTIPROCESS else availability.AvailabilityIndex()
 
 # ---------------------- Models ----------------------
 class DeliveryRequest(BaseModel):
@@ -72,12 +80,15 @@ class DeliveryResponse(BaseModel):
 class DriverCreate(BaseModel):
     driver_id: str
     name: str
+    # vehicle capacity in order-weight units; None keeps the database default
+    capacity: int | None = None
 
 class DriverSignup(BaseModel):
     name: str
     email: str
     phone: str
     license_number: str
+    capacity: int | None = None
 
 class DriverResponse(BaseModel):
     driver_id: str
@@ -86,6 +97,7 @@ class DriverResponse(BaseModel):
     phone: str
     license_number: str
     available: bool
+    capacity: int
 
 class OrderCreate(BaseModel):
     order_id: str
@@ -93,6 +105,7 @@ class OrderCreate(BaseModel):
     pickup_location: str
     delivery_location: str
     package_info: str = "Standard Package"
+    weight: int = 1
 
 class OrderResponse(BaseModel):
     id: int
@@ -107,443 +120,1003 @@ class OrderResponse(BaseModel):
     created_at: str
     borrowed_at: str | None = None
     assigned_at: str | None = None
+    weight: int = 1
+    load_id: int | None = None
 
 class DriverAssignRequest(BaseModel):
     driver_id: str
 
-# ---------------------- TCP/IP Client ----------------------
+class DriverCapacityUpdate(BaseModel):
+    capacity: int
+
+class TransitionItem(BaseModel):
+    action: str
+    order_id: str
+    driver_id: str | None = None
+
+class TransitionBatchRequest(BaseModel):
+    transitions: list[TransitionItem]
+
+class BulkOrderCreate(BaseModel):
+    orders: list[OrderCreate]
+
+class LoadDispatchRequest(BaseModel):
+    max_loads: int | None = Field(None, ge=0)
+    max_orders_per_load: int = dispatch.MAX_LOAD_ORDERS
+    # optional [latitude, longitude] hints; located orders are grouped by grid cell
+    order_positions: dict[str, tuple[float, float]] = {}
+    dry_run: bool = False
+
+class DispatchRequest(BaseModel):
+    policy: str = "fifo"
+    max_pairs: int | None = Field(None, ge=0)
+    # optional [latitude, longitude] hints used by the nearest_driver policy
+    order_positions: dict[str, tuple[float, float]] = {}
+    driver_positions: dict[str, tuple[float, float]] = {}
+
+# ---------------------- Event Publishing ----------------------
 TCP_HOST = "127.0.0.1"
 TCP_PORT = 9000
 
-def tcp_client():
-    """Keep a TCP connection open to the protocol server."""
-    global tcp_socket
-    tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    try:
-        tcp_socket.connect((TCP_HOST, TCP_PORT))
-        print("Connected to TCP protocol server.")
-        while True:
-            data = tcp_socket.recv(1024)
-            if not data:
-                break
-            print("Received from protocol server:", data.decode())
-    except Exception as e:
-        print("TCP client error:", e)
-
-threading.Thread(target=tcp_client, daemon=True).start()
-
-def send_tcp_update(message: str):
-    try:
-        tcp_socket.sendall(message.encode())
-    except Exception as e:
-        print("Failed to send TCP update:", e)
+publisher = events.EventPublisher(TCP_HOST, TCP_PORT)
+
+# push feed for browser clients, see change_feed.py and GET /events/stream
+feed = change_feed.ChangeFeed()
+
+def committed_version() -> int:
+    """The database change sequence (X-Change-Seq) as of the caller's last commit."""
+    return change_log.current_seq(db_conf.get_connection().cursor())
+
+def publish_change(topic: str, event_type: str, message: str, version: int | None = None, **data):
+    """
+    Announce a committed change: queued for the protocol server (never
+    blocks the request) and pushed to live-feed clients. In multi-process
+    mode the feed gets it back from the broker instead, like every other
+    worker's changes.
+
+    Called after the commit, so the event's `version` (the change sequence
+    read now) is at least the row_version the change gave its row: a client
+    holding a snapshot taken at X-Change-Seq S can drop every event with
+    version <= S, whichever worker published it.
+
+    Handlers running on the event loop must pass `version`, read by their
+    worker function after its commit, so no query runs on the loop thread.
+    """
+    data["version"] = committed_version() if version is None else version
+    publisher.publish(message, topic, type=event_type, **data)
+    if not MULTIPROCESS:
+        feed.publish(topic, event_type, **data)
+
+RELAY_RETRY_SECONDS = 2.0
+
+async def relay_broker_events():
+    """
+    Multi-process mode: subscribe to the broker and push every worker's
+    events into this worker's live feed. As soon as the subscription is
+    (re)established, clients are told to resync since events may have been
+    missed in between.
+    """
+    while True:
+        try:
+            async for event in event_broker.subscribe(TCP_HOST, TCP_PORT, on_connect=feed.resync_all):
+                topic = event.pop("topic", "order")
+                event_type = event.pop("type", "event")
+                event.pop("message", None)
+                event.pop("ts", None)
+                feed.publish(topic, event_type, **event)
+        except (OSError, ValueError):
+            pass
+        await asyncio.sleep(RELAY_RETRY_SECONDS)
+
+# ---------------------- Write Path ----------------------
+# optional group commit for single mutations, see write_queue.py
+writer = write_queue.GroupCommitWriter() if write_queue.ENABLED else None
+
+def run_mutation(op):
+    """
+    Apply op(cur) in a write transaction and return its result. With group
+    commit on, it shares a transaction (and commit) with concurrent ones.
+    """
+    if writer is not None:
+        return writer.apply(op)
+    with db_conf.connection() as conn:
+        return write_queue.apply_one(conn, op)
+
+# ---------------------- Streaming Helpers ----------------------
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_CHUNK_SIZE = 500
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def stream_ndjson(sql: str, params, to_dict) -> StreamingResponse:
+    """
+    Stream a query as newline-delimited JSON, one row per line.
+
+    Rows are pulled from the cursor STREAM_CHUNK_SIZE at a time and written
+    out as they arrive, so memory stays bounded and the first byte goes out
+    without waiting for the whole table.
+    """
+    def generate():
+        with db_conf.dedicated_connection() as conn:
+            cur = conn.cursor()
+            cur.row_factory = fast_json.row_factory(to_dict)
+            cur.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(STREAM_CHUNK_SIZE)
+                if not rows:
+                    break
+                yield b"".join(fast_json.dumps(r) + b"\n" for r in rows)
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
+
+# ---------------------- Conditional GET Helpers ----------------------
+def make_etag(kind: str, version: int) -> str:
+    """
+    Weak validator built from the change sequence / row_version, which the
+    change_log triggers bump on every write. Caches key validators by URL,
+    so filters and cursors need not be part of it.
+    """
+    return f'W/"{kind}-{version}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+def driver_row_to_dict(r) -> dict:
+    return {
+        "driver_id": r[0],
+        "name": r[1],
+        "email": r[2] or "",
+        "phone": r[3] or "",
+        "license_number": r[4] or "",
+        "available": bool(r[5]),
+        "capacity": r[6],
+    }
+
+ORDER_FIELDS = ("id", "order_id", "client_name", "pickup_location", "delivery_location",
+                "package_info", "status", "driver_id", "driver_name",
+                "created_at", "borrowed_at", "assigned_at", "weight", "load_id")
+
+def order_row_to_dict(r) -> dict:
+    return dict(zip(ORDER_FIELDS, r))
 
 # ---------------------- Delivery Endpoints ----------------------
 @app.post("/deliveries/", response_model=dict)
+@db_executor.writes
 def create_delivery(req: DeliveryRequest):
     """
     Create an order when placed in CMS.
     Now creates order in pending status for manual warehouse assignment.
     """
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
+    # Create order record in pending status (extract client name from order_id or use default)
+    client_name = f"Client-{req.order_id.split('-')[0] if '-' in req.order_id else req.order_id[:8]}"
 
-    try:
-        # Create order record in pending status (extract client name from order_id or use default)
-        client_name = f"Client-{req.order_id.split('-')[0] if '-' in req.order_id else req.order_id[:8]}"
-        
+    def insert(cur):
         cur.execute("""
             INSERT INTO orders (order_id, client_name, pickup_location, delivery_location, package_info, status)
             VALUES (?, ?, ?, ?, ?, 'pending')
         """, (req.order_id, client_name, "Pickup Location", req.address, "Standard Package"))
-        
-        conn.commit()
-        conn.close()
-
-        # Send update over TCP/IP
-        send_tcp_update(f"New order created: order_id={req.order_id}, status=pending")
 
-        return {"message": "Order created and pending warehouse assignment", "order_id": req.order_id, "status": "pending"}
-        
+    try:
+        run_mutation(insert)
     except sqlite3.IntegrityError:
-        conn.close()
         raise HTTPException(status_code=400, detail="Order already exists")
 
+    # Send update over TCP/IP
+    publish_change("order", "order.created", f"New order created: order_id={req.order_id}, status=pending",
+                   order_id=req.order_id, status="pending")
+
+    return {"message": "Order created and pending warehouse assignment", "order_id": req.order_id, "status": "pending"}
+
 @app.get("/deliveries/{order_id}", response_model=DeliveryResponse)
-def get_delivery(order_id: str):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT order_id, delivery_status, address, driver_id FROM deliveries WHERE order_id=?", (order_id,))
-    row = cur.fetchone()
-    conn.close()
+@db_executor.reads
+def get_delivery(order_id: str, request: Request, response: Response, history: bool = False):
+    """`history=true` also looks in the archive if the delivery is no longer live."""
+    with db_conf.connection() as conn:
+        cur = conn.cursor()
+        # every delivery write also updates its order, so the order's row_version is the validator
+        cur.execute("""
+            SELECT d.order_id, d.delivery_status, d.address, d.driver_id, COALESCE(o.row_version, 0)
+            FROM deliveries d LEFT JOIN orders o ON o.order_id = d.order_id
+            WHERE d.order_id=?
+        """, (order_id,))
+        row = cur.fetchone()
+        kind = "delivery"
+        if not row and history:
+            # archived rows never change, so their id is a stable validator
+            cur.execute("""
+                SELECT order_id, delivery_status, address, driver_id, id FROM deliveries_history
+                WHERE order_id=? ORDER BY id DESC LIMIT 1
+            """, (order_id,))
+            row = cur.fetchone()
+            kind = "delivery-archived"
 
     if not row:
         raise HTTPException(status_code=404, detail="Delivery not found")
 
+    etag = make_etag(kind, row[4])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return DeliveryResponse(order_id=row[0], delivery_status=row[1], address=row[2], driver_id=row[3])
 
 # ---------------------- Driver Endpoints ----------------------
+def check_capacity(capacity: int | None) -> int:
+    """Validated vehicle capacity, or the default when none was given."""
+    if capacity is None:
+        return migrations.DEFAULT_CAPACITY
+    if capacity <= 0:
+        raise HTTPException(status_code=400, detail="capacity must be positive")
+    return capacity
+
 @app.post("/drivers/", response_model=DriverResponse)
+@db_executor.writes
 def create_driver(driver: DriverCreate):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
+    capacity = check_capacity(driver.capacity)
+
+    def insert(cur):
+        cur.execute("INSERT INTO drivers (driver_id, name, available, capacity) VALUES (?, ?, ?, ?)",
+                    (driver.driver_id, driver.name, 1, capacity))
+        # Get the full driver data
+        cur.execute("SELECT driver_id, name, email, phone, license_number, available, capacity FROM drivers WHERE driver_id=?", (driver.driver_id,))
+        return cur.fetchone()
+
     try:
-        cur.execute("INSERT INTO drivers (driver_id, name, available) VALUES (?, ?, ?)",
-                    (driver.driver_id, driver.name, 1))
-        conn.commit()
+        row = run_mutation(insert)
     except sqlite3.IntegrityError:
-        conn.close()
         raise HTTPException(status_code=400, detail="Driver already exists")
-    
-    # Get the full driver data
-    cur.execute("SELECT driver_id, name, email, phone, license_number, available FROM drivers WHERE driver_id=?", (driver.driver_id,))
-    row = cur.fetchone()
-    conn.close()
-    
+
+    availability_index.mark_available(driver.driver_id)
+    publish_change("driver", "driver.created", f"Driver created: {driver.driver_id}",
+                   driver_id=driver.driver_id, available=True)
     return DriverResponse(
         driver_id=row[0], 
         name=row[1], 
         email=row[2] or "", 
         phone=row[3] or "", 
         license_number=row[4] or "", 
-        available=bool(row[5])
+        available=bool(row[5]),
+        capacity=row[6]
     )
 
 @app.post("/drivers/signup", response_model=DriverResponse)
+@db_executor.writes
 def driver_signup(driver: DriverSignup):
     """
     Driver signup endpoint - creates a new driver account with full details
     """
-    import uuid
-    
     # Generate unique driver ID
-    driver_id = f"DRV{uuid.uuid4().hex[:8].upper()}"
-    
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
+    driver_id = driver_import.generate_driver_id()
     
-    try:
+    capacity = check_capacity(driver.capacity)
+
+    def insert(cur):
         cur.execute("""
-            INSERT INTO drivers (driver_id, name, email, phone, license_number, available) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (driver_id, driver.name, driver.email, driver.phone, driver.license_number, 1))
-        conn.commit()
+            INSERT INTO drivers (driver_id, name, email, phone, license_number, available, capacity) 
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (driver_id, driver.name, driver.email, driver.phone, driver.license_number, 1, capacity))
+
+    try:
+        run_mutation(insert)
     except sqlite3.IntegrityError as e:
-        conn.close()
         if "email" in str(e):
             raise HTTPException(status_code=400, detail="Email already registered")
         else:
             raise HTTPException(status_code=400, detail="Driver registration failed")
     
-    conn.close()
-    
+    availability_index.mark_available(driver_id)
+    publish_change("driver", "driver.created", f"Driver signed up: {driver_id}",
+                   driver_id=driver_id, available=True)
     return DriverResponse(
         driver_id=driver_id,
         name=driver.name,
         email=driver.email,
         phone=driver.phone,
         license_number=driver.license_number,
-        available=True
+        available=True,
+        capacity=capacity
     )
 
+MAX_BULK_DRIVERS = 10000
+
+@app.post("/drivers/bulk")
+async def create_drivers_bulk(request: Request):
+    """
+    Onboard many drivers at once.
+
+    Accepts either JSON (a list of signup objects, or {"drivers": [...]})
+    or a CSV upload (Content-Type: text/csv) with a header row of
+    name,email,phone,license_number and optionally capacity (vehicle
+    capacity, default 100). Every row gets a result: created
+    (with its DRV... id), conflict (email taken) or invalid.
+    """
+    if "csv" in request.headers.get("content-type", ""):
+        try:
+            records = driver_import.parse_csv((await request.body()).decode("utf-8-sig"))
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="CSV must be UTF-8 encoded")
+        except csv.Error as e:
+            raise HTTPException(status_code=400, detail=f"Malformed CSV: {e}")
+    else:
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be JSON or CSV")
+        records = payload.get("drivers") if isinstance(payload, dict) else payload
+        if not isinstance(records, list):
+            raise HTTPException(status_code=400, detail="Expected a list of drivers")
+
+    if len(records) > MAX_BULK_DRIVERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_DRIVERS} drivers per request")
+
+    def do_import():
+        with db_conf.connection() as conn:
+            results = driver_import.import_drivers(conn, records)
+            return results, change_log.current_seq(conn.cursor())
+
+    results, version = await db_executor.run_write(do_import)
+    created = [r["driver_id"] for r in results if r["status"] == "created"]
+    for driver_id in created:
+        availability_index.mark_available(driver_id)
+    if created:
+        publish_change("driver", "driver.bulk_created", f"Bulk drivers signed up: {len(created)}",
+                       version=version, driver_ids=created)
+
+    return {
+        "message": f"Created {len(created)} driver(s)",
+        "created": len(created),
+        "conflicts": sum(1 for r in results if r["status"] == "conflict"),
+        "invalid": sum(1 for r in results if r["status"] == "invalid"),
+        "results": results,
+    }
+
 @app.get("/drivers/", response_model=list[DriverResponse])
-def list_drivers():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT driver_id, name, email, phone, license_number, available FROM drivers")
-    rows = cur.fetchall()
-    conn.close()
-    return [DriverResponse(
-        driver_id=r[0], 
-        name=r[1], 
-        email=r[2] or "", 
-        phone=r[3] or "", 
-        license_number=r[4] or "", 
-        available=bool(r[5])
-    ) for r in rows]
+@db_executor.reads
+def list_drivers(request: Request,
+                 since: int | None = Query(None, ge=0),
+                 limit: int = Query(change_log.MAX_PAGE, ge=1, le=change_log.MAX_PAGE)):
+    """
+    List drivers. `since=<seq>` (from the `X-Change-Seq` header) returns
+    only drivers changed after it plus tombstones, like GET /orders.
+    Full lists carry an ETag and honour If-None-Match, also like GET /orders.
+    """
+    if since is not None:
+        with db_conf.connection() as conn:
+            delta = change_log.read_changes(
+                conn, "SELECT driver_id, name, email, phone, license_number, available, capacity, row_version FROM drivers",
+                "row_version", ("driver",), since, limit)
+        return fast_json.FastJSONResponse({
+            "seq": delta["seq"],
+            "has_more": delta["has_more"],
+            "changes": [driver_row_to_dict(r) for r in delta["rows"]],
+            "deleted": delta["deleted"],
+        })
+
+    sql = "SELECT driver_id, name, email, phone, license_number, available, capacity FROM drivers"
+    if wants_ndjson(request):
+        return stream_ndjson(sql, (), driver_row_to_dict)
+
+    with db_conf.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN")
+        seq = change_log.current_seq(cur)
+        etag = make_etag("drivers", seq)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        cur.row_factory = fast_json.row_factory(driver_row_to_dict)
+        cur.execute(sql)
+        rows = cur.fetchall()
+    return fast_json.FastJSONResponse(rows, headers={"X-Change-Seq": str(seq), "ETag": etag})
+
+def fetch_available_drivers(limit: int) -> list[DriverResponse]:
+    """
+    Up to `limit` available drivers in availability-index order.
+
+    The index is written after the commit, so two transitions racing on the
+    same driver can leave it briefly out of step with the table. Only rows
+    the table still shows as available are returned; ids that are not are
+    dropped from the index, and an index that comes up empty is rebuilt
+    once. Dispatch reads the table itself and rebuilds the index when it
+    finds drivers the index was missing.
+    """
+    rebuilt = False
+    while True:
+        driver_ids = availability_index.first(limit)
+        by_id = {}
+        if driver_ids:
+            with db_conf.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(f"SELECT driver_id, name, email, phone, license_number, available, capacity FROM drivers "
+                            f"WHERE driver_id IN ({','.join('?' * len(driver_ids))}) AND available=1", driver_ids)
+                by_id = {r[0]: r for r in cur.fetchall()}
+        stale = [d for d in driver_ids if d not in by_id]
+        if stale:
+            for driver_id in stale:
+                availability_index.mark_unavailable(driver_id)
+            continue
+        if by_id or rebuilt:
+            return [DriverResponse(**driver_row_to_dict(by_id[d])) for d in driver_ids]
+        with db_conf.connection() as conn:
+            availability_index.rebuild(conn)
+        rebuilt = True
+
+# declared before /drivers/{driver_id} so "available" is not taken as an id
+@app.get("/drivers/available", response_model=DriverResponse)
+@db_executor.reads
+def get_available_driver():
+    """The driver who has been available the longest, served from the availability index"""
+    drivers = fetch_available_drivers(1)
+    if not drivers:
+        raise HTTPException(status_code=404, detail="No available drivers")
+    return drivers[0]
+
+@app.get("/drivers/available/list", response_model=list[DriverResponse])
+@db_executor.reads
+def list_available_drivers(limit: int = Query(10, ge=1, le=500)):
+    """Up to `limit` available drivers, longest-available first"""
+    return fetch_available_drivers(limit)
 
 @app.get("/drivers/{driver_id}", response_model=DriverResponse)
-def get_driver(driver_id: str):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT driver_id, name, email, phone, license_number, available FROM drivers WHERE driver_id=?", (driver_id,))
-    row = cur.fetchone()
-    conn.close()
+@db_executor.reads
+def get_driver(driver_id: str, request: Request):
+    with db_conf.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT driver_id, name, email, phone, license_number, available, capacity, row_version FROM drivers WHERE driver_id=?", (driver_id,))
+        row = cur.fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Driver not found")
-    return DriverResponse(
-        driver_id=row[0], 
-        name=row[1], 
-        email=row[2] or "", 
-        phone=row[3] or "", 
-        license_number=row[4] or "", 
-        available=bool(row[5])
-    )
+    etag = make_etag("driver", row[7])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return fast_json.FastJSONResponse(driver_row_to_dict(row), headers={"ETag": etag})
 
 @app.put("/drivers/{driver_id}/availability", response_model=DriverResponse)
+@db_executor.writes
 def update_driver_availability(driver_id: str, availability_update: dict):
     """
     Update driver availability status.
     Used when deliveries are completed to make drivers available again.
     """
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    
-    # Check if driver exists
-    cur.execute("SELECT driver_id, name, email, phone, license_number, available FROM drivers WHERE driver_id=?", (driver_id,))
-    row = cur.fetchone()
-    if not row:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Driver not found")
-    
-    # Update availability
-    new_availability = 1 if availability_update.get('available', False) else 0
-    cur.execute("UPDATE drivers SET available=? WHERE driver_id=?", (new_availability, driver_id))
-    conn.commit()
-    
-    # Get updated driver info
-    cur.execute("SELECT driver_id, name, email, phone, license_number, available FROM drivers WHERE driver_id=?", (driver_id,))
-    updated_row = cur.fetchone()
-    conn.close()
+    with db_conf.connection() as conn:
+        cur = conn.cursor()
+
+        # Check if driver exists
+        cur.execute("SELECT driver_id, name, email, phone, license_number, available, capacity FROM drivers WHERE driver_id=?", (driver_id,))
+        row = cur.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Driver not found")
+
+        # Update availability
+        new_availability = 1 if availability_update.get('available', False) else 0
+        cur.execute("UPDATE drivers SET available=? WHERE driver_id=?", (new_availability, driver_id))
+        conn.commit()
+
+        # Get updated driver info
+        cur.execute("SELECT driver_id, name, email, phone, license_number, available, capacity FROM drivers WHERE driver_id=?", (driver_id,))
+        updated_row = cur.fetchone()
     
+    availability_index.set_available(driver_id, bool(new_availability))
+    publish_change("driver", "driver.availability", f"Driver availability changed: {driver_id}, available={bool(new_availability)}",
+                   driver_id=driver_id, available=bool(new_availability))
     return DriverResponse(
         driver_id=updated_row[0], 
         name=updated_row[1], 
         email=updated_row[2] or "", 
         phone=updated_row[3] or "", 
         license_number=updated_row[4] or "", 
-        available=bool(updated_row[5])
+        available=bool(updated_row[5]),
+        capacity=updated_row[6]
     )
 
-@app.get("/drivers/available", response_model=DriverResponse)
-def get_available_driver():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT driver_id, name, email, phone, license_number, available FROM drivers WHERE available=1 LIMIT 1")
-    row = cur.fetchone()
-    conn.close()
-    if not row:
-        raise HTTPException(status_code=404, detail="No available drivers")
-    return DriverResponse(
-        driver_id=row[0], 
-        name=row[1], 
-        email=row[2] or "", 
-        phone=row[3] or "", 
-        license_number=row[4] or "", 
-        available=bool(row[5])
-    )
+@app.put("/drivers/{driver_id}/capacity")
+@db_executor.writes
+def update_driver_capacity(driver_id: str, update: DriverCapacityUpdate):
+    """Set how much order weight the driver's vehicle carries per load."""
+    capacity = check_capacity(update.capacity)
+
+    def set_capacity(cur):
+        cur.execute("UPDATE drivers SET capacity=? WHERE driver_id=?", (capacity, driver_id))
+        return cur.rowcount
+
+    if run_mutation(set_capacity) == 0:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    publish_change("driver", "driver.capacity", f"Driver capacity changed: {driver_id}, capacity={capacity}",
+                   driver_id=driver_id, capacity=capacity)
+    return {"driver_id": driver_id, "capacity": capacity}
 
 # ---------------------- Warehouse Management Endpoints ----------------------
+def after_transition(action: str, result: dict):
+    """Keep the availability index in step and publish the event for a committed transition."""
+    order_id = result["order_id"]
+    if action == "assign":
+        availability_index.mark_unavailable(result["driver_id"])
+    elif action == "deliver" and result["driver_available"]:
+        availability_index.mark_available(result["driver_id"])
+    elif action == "return" and result["released_driver_id"]:
+        availability_index.mark_available(result["released_driver_id"])
+
+    if action == "borrow":
+        publish_change("order", "order.borrowed", f"Order borrowed: {order_id}",
+                       order_id=order_id, status="borrowed")
+    elif action == "assign":
+        publish_change("order", "order.assigned", f"Driver assigned: order_id={order_id}, driver={result['driver_id']}",
+                       order_id=order_id, status="assigned", driver_id=result["driver_id"])
+    elif action == "return":
+        publish_change("order", "order.returned", f"Order returned: {order_id}",
+                       order_id=order_id, status="pending", driver_id=None)
+    elif action == "deliver":
+        freed = " now available" if result["driver_available"] else " still has orders out"
+        publish_change("order", "order.delivered", f"Order delivered: {order_id}, driver {result['driver_id']}{freed}",
+                       order_id=order_id, status="delivered", driver_id=result["driver_id"],
+                       driver_available=result["driver_available"])
+
+def apply_order_transition(transition: order_state.Transition) -> dict:
+    """Run one state-machine transition, mapping rejections to HTTP errors."""
+    try:
+        result = run_mutation(lambda cur: order_state.apply_on(cur, transition))
+    except order_state.TransitionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    after_transition(transition.action, result)
+    return result
+
+def _encode_cursor(created_at: str, order_pk: int) -> str:
+    raw = json.dumps([created_at, order_pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        created_at, order_pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), int(order_pk)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+ORDERS_DELTA_SELECT = """
+    SELECT o.id, o.order_id, o.client_name, o.pickup_location, o.delivery_location,
+           o.package_info, o.status, o.driver_id, d.name as driver_name,
+           o.created_at, o.borrowed_at, o.assigned_at, o.weight, o.load_id, o.row_version
+    FROM orders o
+    LEFT JOIN drivers d ON o.driver_id = d.driver_id
+"""
+
 @app.get("/orders", response_model=list[OrderResponse])
-def get_all_orders():
-    """Get all orders for warehouse management"""
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
+@db_executor.reads
+def get_all_orders(
+    request: Request,
+    status: str | None = None,
+    driver_id: str | None = None,
+    created_from: str | None = None,
+    created_to: str | None = None,
+    limit: int | None = Query(None, ge=1, le=1000),
+    cursor: str | None = None,
+    since: int | None = Query(None, ge=0),
+    history: bool = False,
+):
+    """
+    Get orders for warehouse management, newest first.
+
+    List responses carry the current change sequence in `X-Change-Seq`.
+    Passing it back as `since` returns only what changed after it:
+    {"seq", "has_more", "changes": [...], "deleted": [...]}, where deleted
+    holds tombstones for removed orders and deliveries. Other filters are
+    ignored in that mode.
+
+    Without `limit` every matching order is returned (what the dashboard
+    expects). With `limit` the result is a page ordered by (created_at, id);
+    pass the `X-Next-Cursor` response header back as `cursor` to get the
+    next one. Each page is a bounded index range scan, so its cost does not
+    depend on how many orders are stored.
+
+    List responses also carry an `ETag` derived from the change sequence;
+    a poll sending it back in `If-None-Match` gets an empty 304 until
+    something changes.
+
+    Send `Accept: application/x-ndjson` to stream the result instead (for
+    exports); filters, cursor and limit apply, but no next cursor is sent.
+
+    `history=true` lists archived (delivered) orders instead of live ones,
+    with the same filters, paging and streaming (see archive.py).
+    """
+    if since is not None:
+        with db_conf.connection() as conn:
+            delta = change_log.read_changes(conn, ORDERS_DELTA_SELECT, "o.row_version",
+                                            ("order", "delivery"), since, limit or change_log.MAX_PAGE)
+        return fast_json.FastJSONResponse({
+            "seq": delta["seq"],
+            "has_more": delta["has_more"],
+            "changes": [order_row_to_dict(r) for r in delta["rows"]],
+            "deleted": delta["deleted"],
+        })
+
+    where = []
+    params = []
+    if status is not None:
+        where.append("o.status = ?")
+        params.append(status)
+    if driver_id is not None:
+        where.append("o.driver_id = ?")
+        params.append(driver_id)
+    if created_from is not None:
+        where.append("o.created_at >= ?")
+        params.append(created_from)
+    if created_to is not None:
+        where.append("o.created_at < ?")
+        params.append(created_to)
+    if cursor is not None:
+        where.append("(o.created_at, o.id) < (?, ?)")
+        params.extend(_decode_cursor(cursor))
+
+    sql = """
         SELECT o.id, o.order_id, o.client_name, o.pickup_location, o.delivery_location,
                o.package_info, o.status, o.driver_id, d.name as driver_name,
-               o.created_at, o.borrowed_at, o.assigned_at
-        FROM orders o
+               o.created_at, o.borrowed_at, o.assigned_at, o.weight, o.load_id
+        FROM {} o
         LEFT JOIN drivers d ON o.driver_id = d.driver_id
-        ORDER BY o.created_at DESC
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    
-    orders = []
-    for row in rows:
-        orders.append(OrderResponse(
-            id=row[0],
-            order_id=row[1],
-            client_name=row[2],
-            pickup_location=row[3],
-            delivery_location=row[4],
-            package_info=row[5],
-            status=row[6],
-            driver_id=row[7],
-            driver_name=row[8],
-            created_at=row[9],
-            borrowed_at=row[10],
-            assigned_at=row[11]
-        ))
-    
-    return orders
+    """.format("orders_history" if history else "orders")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY o.created_at DESC, o.id DESC"
+    if wants_ndjson(request):
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return stream_ndjson(sql, params, order_row_to_dict)
+    if limit is not None:
+        # one extra row tells us whether another page exists
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+
+    with db_conf.connection() as conn:
+        cur = conn.cursor()
+        # one read snapshot for the rows and the sequence they reflect
+        cur.execute("BEGIN")
+        seq = change_log.current_seq(cur)
+        etag = make_etag("orders", seq)
+        if etag_matches(request, etag):
+            # nothing changed since the client's copy: no rows are read
+            return not_modified(etag)
+        cur.row_factory = fast_json.row_factory(order_row_to_dict)
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    headers = {"X-Change-Seq": str(seq), "ETag": etag}
+
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+    # rows are already dicts in OrderResponse shape; encode them in one go
+    return fast_json.FastJSONResponse(rows, headers=headers)
+
+@app.get("/orders/stats")
+@db_executor.reads
+def get_order_stats(days: int = Query(30, ge=1, le=366), driver_id: str | None = None):
+    """
+    Order counts per status, per driver and per day (last `days` days).
+
+    Served from counters the database triggers keep current on every write,
+    so the cost does not grow with the number of orders.
+    """
+    with db_conf.connection() as conn:
+        return order_stats.read_stats(conn, days, driver_id)
+
+@app.post("/orders/stats/reconcile")
+@db_executor.writes
+def reconcile_order_stats():
+    """Rebuild the order counters from the orders table (full scan; for repairs)"""
+    with db_conf.connection() as conn:
+        order_stats.reconcile(conn)
+        return order_stats.read_stats(conn)
+
+@app.post("/orders/archive")
+async def archive_orders(older_than_days: float = Query(30, ge=0),
+                         batch_size: int = Query(archive.DEFAULT_BATCH, ge=1, le=archive.MAX_BATCH)):
+    """
+    Move delivered orders older than `older_than_days` into the history
+    tables. Runs in short batches on its own connection, off the write pool,
+    so live writes interleave with it.
+    """
+    def run():
+        with db_conf.dedicated_connection() as conn:
+            result = archive.archive_delivered(conn, older_than_days, batch_size)
+            return result, change_log.current_seq(conn.cursor())
+
+    result, version = await run_in_threadpool(run)
+    if result["archived"]:
+        publish_change("order", "orders.archived", f"Archived {result['archived']} delivered order(s)",
+                       version=version, count=result["archived"])
+    return result
 
 @app.post("/orders/{order_id}/borrow")
+@db_executor.writes
 def borrow_order(order_id: str):
     """Borrow an order for processing"""
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    
-    # Check if order exists and is pending
-    cur.execute("SELECT status FROM orders WHERE order_id=?", (order_id,))
-    row = cur.fetchone()
-    if not row:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if row[0] != 'pending':
-        conn.close()
-        raise HTTPException(status_code=400, detail="Order is not available for borrowing")
-    
-    # Update order status to borrowed
-    cur.execute("UPDATE orders SET status='borrowed', borrowed_at=CURRENT_TIMESTAMP WHERE order_id=?", (order_id,))
-    conn.commit()
-    conn.close()
-    
-    send_tcp_update(f"Order borrowed: {order_id}")
-    return {"message": "Order borrowed successfully", "order_id": order_id}
+    result = apply_order_transition(order_state.Transition("borrow", order_id))
+    return {"message": "Order borrowed successfully", "order_id": result["order_id"]}
 
 @app.post("/orders/{order_id}/assign")
+@db_executor.writes
 def assign_driver_to_order(order_id: str, request: DriverAssignRequest):
     """Assign a driver to a borrowed order"""
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    
-    # Check if order exists and is borrowed
-    cur.execute("SELECT status FROM orders WHERE order_id=?", (order_id,))
-    row = cur.fetchone()
-    if not row:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if row[0] != 'borrowed':
-        conn.close()
-        raise HTTPException(status_code=400, detail="Order is not borrowed")
-    
-    # Check if driver exists and is available
-    cur.execute("SELECT available FROM drivers WHERE driver_id=?", (request.driver_id,))
-    driver_row = cur.fetchone()
-    if not driver_row:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Driver not found")
-    
-    if not driver_row[0]:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Driver is not available")
-    
-    # Assign driver and update statuses
-    cur.execute("UPDATE orders SET status='assigned', driver_id=?, assigned_at=CURRENT_TIMESTAMP WHERE order_id=?", 
-                (request.driver_id, order_id))
-    cur.execute("UPDATE drivers SET available=0 WHERE driver_id=?", (request.driver_id,))
-    
-    # Create delivery record
-    cur.execute("SELECT delivery_location FROM orders WHERE order_id=?", (order_id,))
-    address = cur.fetchone()[0]
-    cur.execute("INSERT OR REPLACE INTO deliveries (order_id, delivery_status, address, driver_id) VALUES (?, ?, ?, ?)",
-                (order_id, "on the way", address, request.driver_id))
-    
-    conn.commit()
-    conn.close()
-    
-    send_tcp_update(f"Driver assigned: order_id={order_id}, driver={request.driver_id}")
-    return {"message": "Driver assigned successfully", "order_id": order_id, "driver_id": request.driver_id}
+    result = apply_order_transition(order_state.Transition("assign", order_id, request.driver_id))
+    return {"message": "Driver assigned successfully", "order_id": result["order_id"], "driver_id": result["driver_id"]}
 
 @app.post("/orders/{order_id}/return")
+@db_executor.writes
 def return_order(order_id: str):
     """Return a borrowed or assigned order back to pending"""
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    
-    # Get current order status and driver
-    cur.execute("SELECT status, driver_id FROM orders WHERE order_id=?", (order_id,))
-    row = cur.fetchone()
-    if not row:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    status, driver_id = row
-    if status not in ['borrowed', 'assigned']:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Order cannot be returned")
-    
-    # If assigned, make driver available again
-    if status == 'assigned' and driver_id:
-        cur.execute("UPDATE drivers SET available=1 WHERE driver_id=?", (driver_id,))
-        # Remove delivery record
-        cur.execute("DELETE FROM deliveries WHERE order_id=?", (order_id,))
-    
-    # Reset order to pending
-    cur.execute("UPDATE orders SET status='pending', driver_id=NULL, borrowed_at=NULL, assigned_at=NULL WHERE order_id=?", 
-                (order_id,))
-    conn.commit()
-    conn.close()
-    
-    send_tcp_update(f"Order returned: {order_id}")
-    return {"message": "Order returned to pending", "order_id": order_id}
+    result = apply_order_transition(order_state.Transition("return", order_id))
+    return {"message": "Order returned to pending", "order_id": result["order_id"]}
 
 @app.post("/orders", response_model=OrderResponse)
+@db_executor.writes
 def create_order(order: OrderCreate):
     """Create a new order (called from CMS when client places order)"""
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    
-    try:
+    if order.weight < 0:
+        raise HTTPException(status_code=400, detail="weight cannot be negative")
+    def insert(cur):
         cur.execute("""
-            INSERT INTO orders (order_id, client_name, pickup_location, delivery_location, package_info, status)
-            VALUES (?, ?, ?, ?, ?, 'pending')
-        """, (order.order_id, order.client_name, order.pickup_location, order.delivery_location, order.package_info))
-        
+            INSERT INTO orders (order_id, client_name, pickup_location, delivery_location, package_info, weight, status)
+            VALUES (?, ?, ?, ?, ?, ?, 'pending')
+        """, (order.order_id, order.client_name, order.pickup_location, order.delivery_location, order.package_info,
+              order.weight))
         # Get the created order
         cur.execute("""
             SELECT id, order_id, client_name, pickup_location, delivery_location,
-                   package_info, status, driver_id, created_at, borrowed_at, assigned_at
+                   package_info, status, driver_id, created_at, borrowed_at, assigned_at, weight
             FROM orders WHERE order_id=?
         """, (order.order_id,))
-        row = cur.fetchone()
-        conn.commit()
-        conn.close()
-        
-        send_tcp_update(f"New order created: {order.order_id}")
-        
-        return OrderResponse(
-            id=row[0],
-            order_id=row[1],
-            client_name=row[2],
-            pickup_location=row[3],
-            delivery_location=row[4],
-            package_info=row[5],
-            status=row[6],
-            driver_id=row[7],
-            created_at=row[8],
-            borrowed_at=row[9],
-            assigned_at=row[10]
-        )
-        
+        return cur.fetchone()
+
+    try:
+        row = run_mutation(insert)
     except sqlite3.IntegrityError:
-        conn.close()
         raise HTTPException(status_code=400, detail="Order already exists")
+    
+    publish_change("order", "order.created", f"New order created: {order.order_id}",
+                   order_id=order.order_id, status="pending")
+    
+    return OrderResponse(
+        id=row[0],
+        order_id=row[1],
+        client_name=row[2],
+        pickup_location=row[3],
+        delivery_location=row[4],
+        package_info=row[5],
+        status=row[6],
+        driver_id=row[7],
+        created_at=row[8],
+        borrowed_at=row[9],
+        assigned_at=row[10],
+        weight=row[11]
+    )
+
+MAX_BULK_ORDERS = 10000
+
+@app.post("/orders/bulk")
+@db_executor.writes
+def create_orders_bulk(request: BulkOrderCreate):
+    """
+    Create many orders in one transaction (used by CMS to replay a backlog).
+
+    Existing order ids are found with a few indexed IN (...) lookups and the
+    new rows are written with a single executemany, so the whole batch costs
+    one commit and one TCP event instead of one of each per order.
+    """
+    if len(request.orders) > MAX_BULK_ORDERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ORDERS} orders per request")
+    if any(o.weight < 0 for o in request.orders):
+        raise HTTPException(status_code=400, detail="weight cannot be negative")
+
+    ids = [o.order_id for o in request.orders]
+    with db_conf.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        existing = {r[0] for r in db_conf.select_in(cur, "SELECT order_id FROM orders WHERE order_id IN ({})", ids)}
+
+        results = []
+        rows = []
+        for o in request.orders:
+            if o.order_id in existing:
+                results.append({"order_id": o.order_id, "status": "duplicate"})
+                continue
+            # later copies of the same id within the batch are duplicates too
+            existing.add(o.order_id)
+            rows.append((o.order_id, o.client_name, o.pickup_location, o.delivery_location, o.package_info, o.weight))
+            results.append({"order_id": o.order_id, "status": "created"})
+
+        cur.executemany("""
+            INSERT INTO orders (order_id, client_name, pickup_location, delivery_location, package_info, weight, status)
+            VALUES (?, ?, ?, ?, ?, ?, 'pending')
+        """, rows)
+        conn.commit()
+
+    if rows:
+        publish_change("order", "order.bulk_created", f"Bulk orders created: {len(rows)}",
+                       order_ids=[r[0] for r in rows])
+
+    return {
+        "message": f"Created {len(rows)} order(s)",
+        "created": len(rows),
+        "duplicates": len(results) - len(rows),
+        "results": results,
+    }
 
 @app.post("/orders/{order_id}/delivered")
+@db_executor.writes
 def mark_order_delivered(order_id: str):
     """Mark order as delivered and make driver available"""
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    
-    # Get current order and driver info
-    cur.execute("SELECT status, driver_id FROM orders WHERE order_id=?", (order_id,))
-    row = cur.fetchone()
-    if not row:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    status, driver_id = row
-    if status != 'assigned':
-        conn.close()
-        raise HTTPException(status_code=400, detail="Order is not assigned")
-    
-    # Update order status to delivered
-    cur.execute("UPDATE orders SET status='delivered' WHERE order_id=?", (order_id,))
-    
-    # Make driver available again
-    if driver_id:
-        cur.execute("UPDATE drivers SET available=1 WHERE driver_id=?", (driver_id,))
-    
-    # Update delivery status
-    cur.execute("UPDATE deliveries SET delivery_status='delivered' WHERE order_id=?", (order_id,))
-    
-    conn.commit()
-    conn.close()
-    
-    send_tcp_update(f"Order delivered: {order_id}, driver {driver_id} now available")
-    return {"message": "Order marked as delivered", "order_id": order_id, "driver_id": driver_id}
+    result = apply_order_transition(order_state.Transition("deliver", order_id))
+    return {"message": "Order marked as delivered", "order_id": result["order_id"], "driver_id": result["driver_id"]}
+
+@app.post("/orders/transitions")
+@db_executor.writes
+def apply_order_transitions(request: TransitionBatchRequest):
+    """
+    Apply many order transitions (borrow, assign, return, deliver) in one
+    transaction. Each item succeeds or fails on its own; see order_state.
+    """
+    transitions = [order_state.Transition(t.action, t.order_id, t.driver_id) for t in request.transitions]
+    with db_conf.connection() as conn:
+        results = order_state.apply_transitions(conn, transitions)
+
+    for result in results:
+        if result["ok"]:
+            after_transition(result["action"], result)
+
+    return {
+        "applied": sum(1 for r in results if r["ok"]),
+        "rejected": sum(1 for r in results if not r["ok"]),
+        "results": results,
+    }
+
+# ---------------------- Dispatch Endpoints ----------------------
+@app.post("/dispatch/run")
+@db_executor.writes
+def run_dispatch(request: DispatchRequest):
+    """
+    Assign every pending order to an available driver in one transaction.
+
+    Pairs are chosen by the requested policy (fifo, oldest_first,
+    nearest_driver) and written exactly as /orders/{id}/assign would. An
+    order is only given a driver whose capacity takes its weight; orders
+    no free vehicle can carry stay pending.
+    """
+    if request.policy not in dispatch.POLICIES:
+        raise HTTPException(status_code=400, detail=f"Unknown dispatch policy: {request.policy}")
+
+    positions = {"orders": request.order_positions, "drivers": request.driver_positions}
+    with db_conf.connection() as conn:
+        result = dispatch.run_dispatch(conn, request.policy, request.max_pairs, positions,
+                                       availability_index.snapshot())
+        if result.unindexed_drivers:
+            # the index missed drivers the table shows as available (an out-of-band
+            # edit, or write-throughs landing out of commit order); resync it
+            availability_index.rebuild(conn)
+
+    for order_id, driver_id in result.assignments:
+        availability_index.mark_unavailable(driver_id)
+        publish_change("order", "order.assigned", f"Driver assigned: order_id={order_id}, driver={driver_id}",
+                       order_id=order_id, status="assigned", driver_id=driver_id)
+
+    return {
+        "message": f"Dispatched {len(result.assignments)} order(s)",
+        "policy": result.policy,
+        "pending_orders": result.pending_orders,
+        "available_drivers": result.available_drivers,
+        "matched": len(result.assignments),
+        "assignments": [{"order_id": o, "driver_id": d} for o, d in result.assignments],
+        "elapsed_ms": round(result.elapsed_seconds * 1000, 3),
+        "pairs_per_second": round(result.pairs_per_second, 1),
+    }
+
+@app.post("/dispatch/loads")
+@db_executor.writes
+def run_load_dispatch(request: LoadDispatchRequest):
+    """
+    Give available drivers whole loads instead of single orders.
+
+    Pending orders are grouped by delivery area (position hint cell, else
+    the address's last part) and packed into loads that fit each driver's
+    capacity, oldest orders first (see dispatch.plan_loads). Each load is
+    assigned in the same transaction; the driver is busy until every order
+    in it is delivered or returned. dry_run returns the plan only.
+    """
+    if request.max_orders_per_load < 1:
+        raise HTTPException(status_code=400, detail="max_orders_per_load must be at least 1")
+
+    positions = {"orders": request.order_positions}
+    with db_conf.connection() as conn:
+        result = dispatch.run_load_dispatch(conn, request.max_loads, positions, availability_index.snapshot(),
+                                            request.max_orders_per_load, request.dry_run)
+        if result.unindexed_drivers:
+            availability_index.rebuild(conn)
+
+    if not result.dry_run:
+        for load in result.loads:
+            availability_index.mark_unavailable(load["driver_id"])
+            for order_id in load["order_ids"]:
+                publish_change("order", "order.assigned", f"Driver assigned: order_id={order_id}, driver={load['driver_id']}",
+                               order_id=order_id, status="assigned", driver_id=load["driver_id"], load_id=load["load_id"])
+
+    return {
+        "message": f"{'Planned' if result.dry_run else 'Dispatched'} {len(result.loads)} load(s) "
+                   f"with {result.orders_assigned} order(s)",
+        "dry_run": result.dry_run,
+        "pending_orders": result.pending_orders,
+        "available_drivers": result.available_drivers,
+        "orders_assigned": result.orders_assigned,
+        "utilisation": round(result.utilisation, 3),
+        "loads": result.loads,
+        "unplaceable": result.unplaceable,
+        "elapsed_ms": round(result.elapsed_seconds * 1000, 3),
+    }
+
+@app.get("/loads/{load_id}")
+@db_executor.reads
+def get_load(load_id: int):
+    """A dispatched load and the current state of its orders."""
+    with db_conf.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, driver_id, area, order_count, total_weight, capacity, created_at FROM loads WHERE id=?",
+                    (load_id,))
+        row = cur.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Load not found")
+        cur.execute("SELECT order_id, status, weight, delivery_location FROM orders WHERE load_id=? ORDER BY id",
+                    (load_id,))
+        orders = [{"order_id": r[0], "status": r[1], "weight": r[2], "delivery_location": r[3]}
+                  for r in cur.fetchall()]
+    return {
+        "load_id": row[0], "driver_id": row[1], "area": row[2], "order_count": row[3],
+        "total_weight": row[4], "capacity": row[5], "created_at": row[6],
+        # orders returned since dispatch have left the load
+        "orders": orders,
+    }
+
+# ---------------------- Event Endpoints ----------------------
+@app.get("/events/stats")
+async def get_event_stats():
+    """Queue depth, drop and delivery counters of the TCP event publisher and live feed, plus DB executor load"""
+    return {**publisher.stats(), "feed": feed.stats(), "db": db_executor.stats(),
+            "group_commit": writer.stats() if writer is not None else None}
+
+SSE_KEEPALIVE_SECONDS = 15
+
+@app.get("/events/stream")
+async def stream_changes(topics: str | None = None):
+    """
+    Server-Sent Events feed of order and driver changes.
+
+    Load a snapshot (GET /orders, GET /drivers/) after connecting and note
+    its X-Change-Seq, then apply the `change` events whose `version` is
+    greater; events at or below it are already in the snapshot. `version`
+    is the database change sequence, so it is comparable across worker
+    processes, unlike the per-process `seq` (the SSE id). `hello` reports
+    the database sequence at connect time. A `resync` event means this
+    client fell too far behind and should reload its snapshot. `topics` is
+    an optional comma-separated filter, e.g. `order` or `order,driver`.
+    """
+    sub = feed.subscribe(topics.split(",") if topics else None)
+    version = await db_executor.run_read(committed_version)
+
+    async def generate():
+        try:
+            yield f"event: hello\ndata: {json.dumps({'seq': feed.last_seq, 'version': version})}\n\n"
+            while True:
+                changes, resync = await sub.next_batch(SSE_KEEPALIVE_SECONDS)
+                if resync:
+                    yield f"event: resync\ndata: {json.dumps({'seq': feed.last_seq})}\n\n"
+                for change in changes:
+                    yield f"id: {change['seq']}\nevent: change\ndata: {json.dumps(change)}\n\n"
+                if not changes and not resync:
+                    yield ": keepalive\n\n"
+        finally:
+            sub.close()
+
+    return StreamingResponse(generate(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Archival of delivered WMS orders.
+
+Delivered orders are moved from `orders` / `deliveries` into
+`orders_history` / `deliveries_history` once they are older than a given
+age (measured from delivery; orders delivered before `delivered_at`
+existed fall back to assigned_at / created_at). The live tables, and every
+index and join the warehouse workflow uses, then only hold work in flight
+plus recent history.
+
+Rows move in small batches, each its own short BEGIN IMMEDIATE transaction,
+with a pause in between, so live writers only ever wait for one batch. The
+existing delete triggers see the move like any delete: delta-sync clients
+get tombstones and GET /orders/stats counts the live tables only.
+
+History stays readable: GET /orders?history=true lists archived orders and
+GET /deliveries/{order_id}?history=true falls back to the archive.
+
+Run a pass from the command line (e.g. nightly from cron):
+
+    python archive.py --older-than-days 30
+"""
+
+import argparse
+import sqlite3
+import time
+
+import db_conf
+
+ORDER_COLUMNS = ("id, order_id, client_name, pickup_location, delivery_location, package_info, "
+                 "status, driver_id, created_at, borrowed_at, assigned_at, delivered_at, weight, load_id")
+DELIVERY_COLUMNS = "id, order_id, delivery_status, address, driver_id"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders_history (
+    id INTEGER PRIMARY KEY,
+    order_id TEXT,
+    client_name TEXT,
+    pickup_location TEXT,
+    delivery_location TEXT,
+    package_info TEXT,
+    status TEXT,
+    driver_id TEXT,
+    created_at TIMESTAMP,
+    borrowed_at TIMESTAMP,
+    assigned_at TIMESTAMP,
+    delivered_at TIMESTAMP,
+    weight INTEGER NOT NULL DEFAULT 1,
+    load_id INTEGER,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_orders_history_created ON orders_history (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_orders_history_order ON orders_history (order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_history_driver ON orders_history (driver_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS deliveries_history (
+    id INTEGER PRIMARY KEY,
+    order_id TEXT,
+    delivery_status TEXT,
+    address TEXT,
+    driver_id TEXT,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_deliveries_history_order ON deliveries_history (order_id);
+
+-- finds archivable orders without scanning the live ones
+CREATE INDEX IF NOT EXISTS idx_orders_delivered_age
+    ON orders (COALESCE(delivered_at, assigned_at, created_at)) WHERE status = 'delivered';
+"""
+
+DEFAULT_BATCH = 500
+MAX_BATCH = 900  # stays under SQLite's host-parameter limit on older builds
+BATCH_PAUSE = 0.05
+
+
+def install(conn: sqlite3.Connection):
+    """Add orders.delivered_at if missing, then the history tables."""
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(orders)")
+    if "delivered_at" not in {col[1] for col in cur.fetchall()}:
+        cur.execute("ALTER TABLE orders ADD COLUMN delivered_at TIMESTAMP")
+    conn.commit()
+    cur.executescript(SCHEMA)
+
+
+def _archive_batch(conn: sqlite3.Connection, cutoff: str, batch_size: int) -> int:
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("""
+            SELECT id, order_id FROM orders INDEXED BY idx_orders_delivered_age
+            WHERE status = 'delivered' AND COALESCE(delivered_at, assigned_at, created_at) < datetime('now', ?)
+            LIMIT ?
+        """, (cutoff, batch_size))
+        rows = cur.fetchall()
+        if rows:
+            ids = [r[0] for r in rows]
+            order_ids = [r[1] for r in rows]
+            id_marks = ",".join("?" * len(ids))
+            order_marks = ",".join("?" * len(order_ids))
+            cur.execute(f"INSERT OR REPLACE INTO orders_history ({ORDER_COLUMNS}) "
+                        f"SELECT {ORDER_COLUMNS} FROM orders WHERE id IN ({id_marks})", ids)
+            cur.execute(f"INSERT OR REPLACE INTO deliveries_history ({DELIVERY_COLUMNS}) "
+                        f"SELECT {DELIVERY_COLUMNS} FROM deliveries WHERE order_id IN ({order_marks})", order_ids)
+            cur.execute(f"DELETE FROM deliveries WHERE order_id IN ({order_marks})", order_ids)
+            cur.execute(f"DELETE FROM orders WHERE id IN ({id_marks})", ids)
+        conn.commit()
+        return len(rows)
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def archive_delivered(conn: sqlite3.Connection, older_than_days: float,
+                      batch_size: int = DEFAULT_BATCH, pause: float = BATCH_PAUSE,
+                      max_batches: int | None = None) -> dict:
+    """
+    Move delivered orders older than `older_than_days` (and their delivery
+    rows) into the history tables, `batch_size` orders per transaction.
+    Returns {"archived", "batches", "elapsed_seconds"}.
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH))
+    cutoff = f"-{older_than_days} days"
+    started = time.perf_counter()
+    archived = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = _archive_batch(conn, cutoff, batch_size)
+        if moved == 0:
+            break
+        archived += moved
+        batches += 1
+        if moved < batch_size:
+            break
+        # let queued live writers take the lock between batches
+        time.sleep(pause)
+    return {"archived": archived, "batches": batches,
+            "elapsed_seconds": round(time.perf_counter() - started, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive delivered WMS orders into the history tables")
+    parser.add_argument("--older-than-days", type=float, default=30)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--pause", type=float, default=BATCH_PAUSE, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    conn = db_conf.get_connection()
+    install(conn)
+    result = archive_delivered(conn, args.older_than_days, args.batch_size, args.pause)
+    print(f"Archived {result['archived']} order(s) in {result['batches']} batch(es), "
+          f"{result['elapsed_seconds']}s")
+    db_conf.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+In-process index of available drivers for the WMS service.
+
+An insertion-ordered set of driver ids, kept in step with the `drivers`
+table by every handler that changes availability (write-through, after the
+commit). The front of the set is the driver who has been free the longest,
+so "next available driver" and "N available drivers" are answered without
+touching SQLite. The index is rebuilt from the database at startup.
+
+Because the write-through happens after the commit, two transitions racing
+on the same driver can apply their index updates in the opposite order to
+their commits. The index is therefore only a candidate list: readers
+confirm ids against the table (see app.fetch_available_drivers) and drop
+the ones that are no longer available. Dispatch takes its drivers from the
+table and uses the index only for their order, rebuilding it when the
+table has available drivers the index is missing.
+
+The index only sees writes made by its own process. Multi-process
+deployments (WMS_MULTIPROCESS=1) use SharedAvailability instead, which has
+the same interface but reads the drivers table on every call.
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import db_conf
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        self._drivers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def rebuild(self, conn: sqlite3.Connection):
+        rows = conn.execute("SELECT driver_id FROM drivers WHERE available=1 ORDER BY id").fetchall()
+        with self._lock:
+            self._drivers = OrderedDict((r[0], None) for r in rows)
+
+    def set_available(self, driver_id: str, available: bool):
+        if available:
+            self.mark_available(driver_id)
+        else:
+            self.mark_unavailable(driver_id)
+
+    def mark_available(self, driver_id: str):
+        with self._lock:
+            # a driver who becomes free again goes to the back of the line
+            self._drivers.pop(driver_id, None)
+            self._drivers[driver_id] = None
+
+    def mark_unavailable(self, driver_id: str):
+        with self._lock:
+            self._drivers.pop(driver_id, None)
+
+    def next(self) -> str | None:
+        """The driver who has been available the longest, or None."""
+        with self._lock:
+            return next(iter(self._drivers), None)
+
+    def first(self, n: int) -> list[str]:
+        """Up to n available drivers, longest-available first."""
+        with self._lock:
+            it = iter(self._drivers)
+            return [d for _, d in zip(range(n), it)]
+
+    def snapshot(self) -> list[str]:
+        with self._lock:
+            return list(self._drivers)
+
+    def __contains__(self, driver_id: str) -> bool:
+        return driver_id in self._drivers
+
+    def __len__(self) -> int:
+        return len(self._drivers)
+
+
+class SharedAvailability:
+    """
+    Available drivers read from the database, so every worker process sees
+    every other worker's changes. A driver's row_version is the change
+    sequence of its last write, which for an available driver is normally
+    the change that freed it, so ordering by it keeps "longest available
+    first"; the partial index idx_drivers_available_version makes that an
+    index range scan. Write-through calls are no-ops: the committed row is
+    already the source of truth.
+    """
+
+    QUERY = ("SELECT driver_id FROM drivers INDEXED BY idx_drivers_available_version "
+             "WHERE available=1 ORDER BY row_version, id")
+
+    def rebuild(self, conn: sqlite3.Connection):
+        pass
+
+    def set_available(self, driver_id: str, available: bool):
+        pass
+
+    def mark_available(self, driver_id: str):
+        pass
+
+    def mark_unavailable(self, driver_id: str):
+        pass
+
+    def next(self) -> str | None:
+        first = self.first(1)
+        return first[0] if first else None
+
+    def first(self, n: int) -> list[str]:
+        with db_conf.connection() as conn:
+            return [r[0] for r in conn.execute(f"{self.QUERY} LIMIT ?", (n,)).fetchall()]
+
+    def snapshot(self) -> list[str]:
+        with db_conf.connection() as conn:
+            return [r[0] for r in conn.execute(self.QUERY).fetchall()]
+
+    def __contains__(self, driver_id: str) -> bool:
+        with db_conf.connection() as conn:
+            return conn.execute("SELECT 1 FROM drivers WHERE driver_id=? AND available=1",
+                                (driver_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with db_conf.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM drivers WHERE available=1").fetchone()[0]
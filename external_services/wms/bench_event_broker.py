@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Event Broker Throughput Benchmark
+Starts an in-process broker on a free port, connects publishers and
+subscribers over real TCP sockets and reports delivered events per second.
+
+    python bench_event_broker.py --publishers 4 --subscribers 8 --events 20000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from event_broker import EventBroker, read_frame
+from events import encode_frame
+
+
+async def publisher(port: int, count: int, topic: str):
+    _, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(encode_frame(json.dumps({"role": "publisher"}).encode()))
+    for i in range(count):
+        event = {"topic": topic, "message": f"bench {i}", "seq": i}
+        writer.write(encode_frame(json.dumps(event).encode()))
+        if i % 256 == 0:
+            await writer.drain()
+    await writer.drain()
+    writer.close()
+
+
+async def subscriber(port: int, topics, expected: int, ready: asyncio.Event, counts: list):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(encode_frame(json.dumps({"role": "subscriber", "topics": topics}).encode()))
+    await writer.drain()
+    ready.set()
+    received = 0
+    while received < expected:
+        frame = await read_frame(reader)
+        if frame is None:
+            break
+        received += 1
+    counts.append(received)
+    writer.close()
+
+
+async def run(publishers: int, subscribers: int, events: int, buffer: int):
+    broker = EventBroker(buffer_size=buffer)
+    server = await asyncio.start_server(broker.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    # half the subscribers follow everything, half only order events
+    per_topic = events * publishers // 2
+    counts = []
+    tasks = []
+    for i in range(subscribers):
+        ready = asyncio.Event()
+        topics = None if i % 2 == 0 else ["order"]
+        expected = events * publishers if topics is None else per_topic
+        tasks.append(asyncio.create_task(subscriber(port, topics, expected, ready, counts)))
+        await ready.wait()
+    await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(publisher(port, events, "order" if i % 2 == 0 else "driver")
+                           for i in range(publishers)))
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=60)
+    except asyncio.TimeoutError:
+        print("⚠️  Timed out waiting for subscribers (events were dropped)")
+    elapsed = time.perf_counter() - started
+
+    stats = broker.stats()
+    server.close()
+
+    delivered = sum(counts)
+    print(f"Publishers: {publishers}, subscribers: {subscribers}, events per publisher: {events}")
+    print(f"Published:  {publishers * events} events ({publishers * events / elapsed:,.0f}/s)")
+    print(f"Delivered:  {delivered} events ({delivered / elapsed:,.0f}/s) in {elapsed:.2f}s")
+    print(f"Dropped:    {stats['dropped']} (slow-subscriber overflow)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the WMS event broker")
+    parser.add_argument("--publishers", type=int, default=4)
+    parser.add_argument("--subscribers", type=int, default=8)
+    parser.add_argument("--events", type=int, default=20000, help="events sent by each publisher")
+    parser.add_argument("--buffer", type=int, default=100000, help="per-subscriber buffer")
+    args = parser.parse_args()
+    asyncio.run(run(args.publishers, args.subscribers, args.events, args.buffer))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+WMS Mixed-Traffic Load Test
+Starts the WMS under uvicorn on a throwaway database, once with the old
+sync handlers on Starlette's threadpool (WMS_DB_EXECUTORS=0) and once with
+async handlers and the dedicated read/write executors, then fires the same
+concurrent mix of reads and writes at each and reports p50/p99 latency.
+
+    python bench_load.py --concurrency 64 --requests 4000 --write-ratio 0.2
+
+Needs uvicorn and httpx.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+WMS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/orders/stats")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("WMS did not start")
+
+
+async def seed(client: httpx.AsyncClient, orders: int, drivers: int) -> list[str]:
+    await client.post("/orders/bulk", json={"orders": [
+        {"order_id": f"SEED-{i:06d}", "client_name": f"Client {i % 50}",
+         "pickup_location": "Warehouse A", "delivery_location": f"{i} Main Street"}
+        for i in range(orders)]})
+    r = await client.post("/drivers/bulk", json=[
+        {"name": f"Driver {i}", "email": f"load{i}@example.com", "phone": f"555-{i:04d}", "license_number": f"L{i}"}
+        for i in range(drivers)])
+    return [row["driver_id"] for row in r.json()["results"] if row["status"] == "created"]
+
+
+async def run_load(client: httpx.AsyncClient, driver_ids: list[str], seeded: int,
+                   total: int, concurrency: int, write_ratio: float) -> dict:
+    rng = random.Random(42)
+    latencies = {"read": [], "write": []}
+    errors = 0
+    counter = iter(range(total))
+    borrowable = iter(range(seeded))
+
+    def next_request():
+        if rng.random() < write_ratio:
+            kind = rng.choice(("create", "borrow", "availability"))
+            if kind == "create":
+                return "write", "POST", "/orders", {
+                    "order_id": f"LOAD-{time.time_ns()}-{rng.random()}", "client_name": "Load",
+                    "pickup_location": "Warehouse A", "delivery_location": "Somewhere"}
+            if kind == "borrow":
+                n = next(borrowable, None)
+                if n is not None:
+                    return "write", "POST", f"/orders/SEED-{n:06d}/borrow", None
+            return "write", "PUT", f"/drivers/{rng.choice(driver_ids)}/availability", {"available": rng.random() < 0.5}
+        path = rng.choice(("/orders?limit=50", f"/drivers/{rng.choice(driver_ids)}",
+                           "/orders/stats", "/drivers/available/list?limit=20"))
+        return "read", "GET", path, None
+
+    async def worker():
+        nonlocal errors
+        while next(counter, None) is not None:
+            kind, method, path, body = next_request()
+            started = time.perf_counter()
+            r = await client.request(method, path, json=body)
+            latencies[kind].append((time.perf_counter() - started) * 1000)
+            if r.status_code >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"latencies": latencies, "errors": errors, "rps": total / elapsed}
+
+
+def start_server(port: int, env: dict, workers: int = 1) -> subprocess.Popen:
+    """Start uvicorn on a fresh database in a temporary directory."""
+    workdir = tempfile.mkdtemp(prefix="wms-load-")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--app-dir", WMS_DIR,
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def bench_mode(name: str, executors: bool, args) -> dict:
+    server = start_server(args.port, {"WMS_DB_EXECUTORS": "1" if executors else "0"})
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+            await wait_ready(client)
+            driver_ids = await seed(client, args.seed_orders, args.seed_drivers)
+            result = await run_load(client, driver_ids, args.seed_orders,
+                                    args.requests, args.concurrency, args.write_ratio)
+    finally:
+        server.terminate()
+        server.wait()
+    result["name"] = name
+    return result
+
+
+def report(result: dict):
+    print(f"{result['name']}: {result['rps']:.0f} req/s, {result['errors']} server errors")
+    for kind in ("read", "write"):
+        values = result["latencies"][kind]
+        if values:
+            print(f"  {kind:5s} n={len(values):5d}  p50 {statistics.median(values):7.1f} ms"
+                  f"  p99 {percentile(values, 99):7.1f} ms  max {max(values):7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed read/write load test for the WMS")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--seed-orders", type=int, default=2000)
+    parser.add_argument("--seed-drivers", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for name, executors in (("sync handlers, default threadpool", False),
+                            ("async handlers, read/write executors", True)):
+        report(asyncio.run(bench_mode(name, executors, args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Load Dispatch Benchmark
+Fills a throwaway WMS database with pending orders (random weights, spread
+over a number of delivery areas) and drivers (random vehicle capacities),
+then compares one dispatch run of the one-order-per-driver fifo policy with
+one run of capacity-aware load dispatch: orders moved, drivers used,
+capacity utilisation and the time the run takes.
+
+    python bench_loads.py --orders 20000 --drivers 1000 --areas 40
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+
+
+def fill(conn, orders: int, drivers: int, areas: int, seed: int):
+    rng = random.Random(seed)
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    cur.executemany("INSERT INTO drivers (driver_id, name, available, capacity) VALUES (?, ?, 1, ?)",
+                    [(f"DRV-{i:06d}", f"Driver {i}", rng.choice((50, 100, 100, 200))) for i in range(drivers)])
+    cur.executemany(
+        "INSERT INTO orders (order_id, client_name, pickup_location, delivery_location, weight, status) "
+        "VALUES (?, ?, ?, ?, ?, 'pending')",
+        [(f"ORD-{i:07d}", "Client", "Warehouse A", f"{i} Main Street, Area {rng.randrange(areas)}",
+          rng.choice((1, 2, 5, 10, 20))) for i in range(orders)])
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-order and per-load dispatch")
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--drivers", type=int, default=1000)
+    parser.add_argument("--areas", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    # db_conf opens wms.db relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="wms-loads-"))
+    import db_conf
+    import dispatch
+    import migrations
+
+    conn = db_conf.get_connection()
+    migrations.migrate(conn)
+    fill(conn, args.orders, args.drivers, args.areas, args.seed)
+    db_conf.close_connection()
+    shutil.copy("wms.db", "seeded.db")
+
+    print(f"{args.orders:,} pending orders in {args.areas} areas, {args.drivers:,} available drivers")
+    print(f"{'':16s}{'orders':>9s}{'drivers':>9s}{'per driver':>12s}{'utilisation':>13s}{'ms':>9s}")
+
+    conn = db_conf.get_connection()
+    single = dispatch.run_dispatch(conn, "fifo")
+    used = len({d for _, d in single.assignments})
+    print(f"{'one per driver':16s}{len(single.assignments):9d}{used:9d}{len(single.assignments) / max(1, used):12.1f}"
+          f"{'-':>13s}{single.elapsed_seconds * 1000:9.1f}")
+    db_conf.close_connection()
+
+    shutil.copy("seeded.db", "wms.db")
+    conn = db_conf.get_connection()
+    loads = dispatch.run_load_dispatch(conn)
+    print(f"{'loads':16s}{loads.orders_assigned:9d}{len(loads.loads):9d}"
+          f"{loads.orders_assigned / max(1, len(loads.loads)):12.1f}{loads.utilisation:13.1%}"
+          f"{loads.elapsed_seconds * 1000:9.1f}")
+    db_conf.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Read Endpoint Serialization Benchmark
+Fills a throwaway WMS database and compares, for the orders and drivers
+lists, the old per-row Pydantic path (build a model per row, validate the
+list against the response model, encode with json) with the fast path
+(row factory + fast_json.dumps). Reports rows per second for each.
+
+    python bench_serialization.py --orders 50000 --drivers 5000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from pydantic import TypeAdapter
+
+
+def fill(conn, orders: int, drivers: int):
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    cur.executemany(
+        "INSERT INTO drivers (driver_id, name, email, phone, license_number, available) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"DRV-{i:06d}", f"Driver {i}", f"driver{i}@example.com", f"555-{i:06d}", f"LIC-{i}", i % 2)
+         for i in range(drivers)])
+    cur.executemany(
+        "INSERT INTO orders (order_id, client_name, pickup_location, delivery_location, package_info, status, driver_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(f"ORD-{i:07d}", f"Client {i % 100}", "Warehouse A", f"{i} Main Street", "Standard Package",
+          "assigned" if i % 3 == 0 else "pending", f"DRV-{i % drivers:06d}" if i % 3 == 0 else None)
+         for i in range(orders)])
+    conn.commit()
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WMS list serialization")
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--drivers", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case; the best is reported")
+    args = parser.parse_args()
+
+    # db_conf opens wms.db relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="wms-bench-"))
+    import app
+    import db_conf
+    import fast_json
+    import migrations
+
+    conn = db_conf.get_connection()
+    migrations.migrate(conn)
+    fill(conn, args.orders, args.drivers)
+
+    orders_sql = """
+        SELECT o.id, o.order_id, o.client_name, o.pickup_location, o.delivery_location,
+               o.package_info, o.status, o.driver_id, d.name as driver_name,
+               o.created_at, o.borrowed_at, o.assigned_at, o.weight, o.load_id
+        FROM orders o
+        LEFT JOIN drivers d ON o.driver_id = d.driver_id
+        ORDER BY o.created_at DESC, o.id DESC
+    """
+    drivers_sql = "SELECT driver_id, name, email, phone, license_number, available, capacity FROM drivers"
+    orders_adapter = TypeAdapter(list[app.OrderResponse])
+    drivers_adapter = TypeAdapter(list[app.DriverResponse])
+
+    def orders_pydantic():
+        rows = conn.execute(orders_sql).fetchall()
+        models = [app.OrderResponse(**app.order_row_to_dict(r)) for r in rows]
+        json.dumps(orders_adapter.dump_python(orders_adapter.validate_python(models), mode="json")).encode()
+
+    def drivers_pydantic():
+        rows = conn.execute(drivers_sql).fetchall()
+        models = [app.DriverResponse(**app.driver_row_to_dict(r)) for r in rows]
+        json.dumps(drivers_adapter.dump_python(drivers_adapter.validate_python(models), mode="json")).encode()
+
+    def fast(sql, to_dict):
+        def run():
+            cur = conn.cursor()
+            cur.row_factory = fast_json.row_factory(to_dict)
+            fast_json.dumps(cur.execute(sql).fetchall())
+        return run
+
+    print(f"JSON backend: {fast_json.BACKEND}")
+    for name, count, before, after in (
+        ("orders", args.orders, orders_pydantic, fast(orders_sql, app.order_row_to_dict)),
+        ("drivers", args.drivers, drivers_pydantic, fast(drivers_sql, app.driver_row_to_dict)),
+    ):
+        slow = timed(before, args.repeat)
+        quick = timed(after, args.repeat)
+        print(f"{name:8s} {count:7d} rows  pydantic {count / slow:12,.0f} rows/s"
+              f"  fast {count / quick:12,.0f} rows/s  ({slow / quick:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
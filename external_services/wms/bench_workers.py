@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+WMS Worker Scaling Benchmark
+Starts the WMS in multi-process mode (WMS_MULTIPROCESS=1) under
+`uvicorn --workers N` for each requested N, seeds it, then drives the same
+mixed read/write traffic from several client processes and reports
+throughput and latency per worker count. With --broker the event broker is
+started on port 9000 too, so the relayed live feed is part of the run.
+
+    python bench_workers.py --workers 1 2 4 --clients 4 --requests 8000
+
+Throughput only scales with workers when there are spare cores; on a
+single-core machine all worker counts should land close together.
+Needs uvicorn and httpx.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench_load import WMS_DIR, report, run_load, seed, start_server, wait_ready
+
+
+def client_process(port: int, driver_ids: list[str], seeded: int, total: int,
+                   concurrency: int, write_ratio: float) -> dict:
+    async def go():
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            return await run_load(client, driver_ids, seeded, total, concurrency, write_ratio)
+    return asyncio.run(go())
+
+
+async def prepare(port: int, args) -> list[str]:
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+        await wait_ready(client)
+        return await seed(client, args.seed_orders, args.seed_drivers)
+
+
+def bench_workers(workers: int, args) -> dict:
+    server = start_server(args.port, {"WMS_MULTIPROCESS": "1"}, workers=workers)
+    try:
+        driver_ids = asyncio.run(prepare(args.port, args))
+        per_client = args.requests // args.clients
+        # clients race to borrow the same seeded orders; the losers' 409s are part of the mix
+        seeded = args.seed_orders
+        started = time.perf_counter()
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.starmap(client_process, [
+                (args.port, driver_ids, seeded, per_client, args.concurrency, args.write_ratio)
+                for _ in range(args.clients)])
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "name": f"{workers} worker(s)",
+        "rps": per_client * args.clients / elapsed,
+        "errors": sum(r["errors"] for r in results),
+        "latencies": {kind: [v for r in results for v in r["latencies"][kind]] for kind in ("read", "write")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure WMS throughput against uvicorn worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4, help="client processes generating load")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per client process")
+    parser.add_argument("--requests", type=int, default=8000)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--seed-orders", type=int, default=2000)
+    parser.add_argument("--seed-drivers", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--broker", action="store_true", help="also run the event broker on port 9000")
+    args = parser.parse_args()
+
+    broker = None
+    if args.broker:
+        broker = subprocess.Popen([sys.executable, os.path.join(WMS_DIR, "event_broker.py"), "--port", "9000"],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        print(f"{os.cpu_count()} CPU(s) available")
+        for workers in args.workers:
+            report(bench_workers(workers, args))
+    finally:
+        if broker is not None:
+            broker.terminate()
+            broker.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+In-process push feed of WMS order and driver changes.
+
+Handlers publish a small structured event for every committed change
+(from the request threads). Each connected client owns a bounded buffer:
+
+* Coalescing: events are keyed by (topic, order_id/driver_id). If a client
+  has not yet received an earlier change for the same key, the two are
+  merged (newer fields win), so a client only sees the latest state per
+  entity.
+* Backpressure: if a client's buffer still overflows, it is cleared and
+  the client gets a single "resync" marker telling it to reload its
+  snapshot. A slow client never slows publishers or other clients.
+
+Every event carries a monotonically increasing `seq` (this process's
+feed order, used as the SSE id) and the `version` it was published with:
+the database change sequence after the commit. Clients compare `version`
+with the X-Change-Seq of their snapshot and drop events at or below it.
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+CLIENT_BUFFER = 500
+
+
+class Subscription:
+    def __init__(self, feed, topics, loop: asyncio.AbstractEventLoop, buffer_size: int):
+        self._feed = feed
+        self.topics = set(topics) if topics else None
+        self._loop = loop
+        self._buffer_size = buffer_size
+        self._pending = OrderedDict()
+        self._overflowed = False
+        self._wakeup = asyncio.Event()
+        self.coalesced = 0
+
+    def wants(self, topic) -> bool:
+        return self.topics is None or topic in self.topics
+
+    def offer(self, key, event: dict):
+        # called with the feed lock held, from any thread
+        if key is not None and key in self._pending:
+            # keep fields only the earlier event carried, newer values win; events
+            # published by racing threads can arrive out of version order
+            pending = self._pending.pop(key)
+            if pending.get("version", 0) > event.get("version", 0):
+                event = {**event, **pending}
+            else:
+                event = {**pending, **event}
+            self.coalesced += 1
+        elif len(self._pending) >= self._buffer_size:
+            self._pending.clear()
+            self._overflowed = True
+        self._pending[key if key is not None else ("seq", event["seq"])] = event
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def next_batch(self, timeout: float) -> tuple[list[dict], bool]:
+        """Wait for changes; returns (events, resync_required). Empty on timeout."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return [], False
+        with self._feed._lock:
+            self._wakeup.clear()
+            events = list(self._pending.values())
+            self._pending.clear()
+            resync, self._overflowed = self._overflowed, False
+        return events, resync
+
+    def mark_resync(self):
+        # called with the feed lock held
+        self._pending.clear()
+        self._overflowed = True
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def close(self):
+        self._feed._unsubscribe(self)
+
+
+class ChangeFeed:
+    def __init__(self, buffer_size: int = CLIENT_BUFFER):
+        self.buffer_size = buffer_size
+        self._subs: set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self.last_seq = 0
+
+    def publish(self, topic: str, event_type: str, **data):
+        with self._lock:
+            self.last_seq = next(self._seq)
+            event = {"seq": self.last_seq, "topic": topic, "type": event_type, "ts": time.time(), **data}
+            entity = data.get("order_id") if topic == "order" else data.get("driver_id")
+            key = (topic, entity) if isinstance(entity, str) else None
+            for sub in self._subs:
+                if sub.wants(topic):
+                    sub.offer(key, event)
+
+    def resync_all(self):
+        """Tell every client to reload, e.g. after events may have been missed upstream."""
+        with self._lock:
+            for sub in self._subs:
+                sub.mark_resync()
+
+    def subscribe(self, topics=None) -> Subscription:
+        sub = Subscription(self, topics, asyncio.get_running_loop(), self.buffer_size)
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"clients": len(self._subs), "last_seq": self.last_seq}
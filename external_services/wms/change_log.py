@@ -0,0 +1,133 @@
+"""
+Monotonic change sequence for delta sync of WMS lists.
+
+A single global counter (`change_seq`) is bumped by triggers on every
+insert, update and delete of orders, drivers and deliveries. Each order and
+driver row stores the sequence value of its last change in `row_version`,
+and deletions leave a tombstone carrying the sequence value of the delete.
+A client that remembers the sequence of its last sync asks for
+`?since=<seq>` and receives only rows and tombstones newer than that.
+
+Everything is done by triggers, so writes from any process or script are
+tracked, and the version is assigned in the same transaction as the write.
+"""
+
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS change_seq (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    seq INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO change_seq (id, seq) VALUES (1, 0);
+
+CREATE TABLE IF NOT EXISTS tombstones (
+    entity TEXT NOT NULL,
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (entity, key)
+);
+CREATE INDEX IF NOT EXISTS idx_tombstones_seq ON tombstones (seq);
+CREATE INDEX IF NOT EXISTS idx_orders_row_version ON orders (row_version);
+CREATE INDEX IF NOT EXISTS idx_drivers_row_version ON drivers (row_version);
+
+CREATE TRIGGER IF NOT EXISTS trg_orders_version_insert AFTER INSERT ON orders
+BEGIN
+    UPDATE change_seq SET seq = seq + 1 WHERE id = 1;
+    UPDATE orders SET row_version = (SELECT seq FROM change_seq WHERE id = 1) WHERE id = NEW.id;
+    DELETE FROM tombstones WHERE entity = 'order' AND key = NEW.order_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_orders_version_update AFTER UPDATE ON orders
+WHEN NEW.row_version IS OLD.row_version
+BEGIN
+    UPDATE change_seq SET seq = seq + 1 WHERE id = 1;
+    UPDATE orders SET row_version = (SELECT seq FROM change_seq WHERE id = 1) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_orders_version_delete AFTER DELETE ON orders
+BEGIN
+    UPDATE change_seq SET seq = seq + 1 WHERE id = 1;
+    INSERT OR REPLACE INTO tombstones (entity, key, seq)
+        VALUES ('order', OLD.order_id, (SELECT seq FROM change_seq WHERE id = 1));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_drivers_version_insert AFTER INSERT ON drivers
+BEGIN
+    UPDATE change_seq SET seq = seq + 1 WHERE id = 1;
+    UPDATE drivers SET row_version = (SELECT seq FROM change_seq WHERE id = 1) WHERE id = NEW.id;
+    DELETE FROM tombstones WHERE entity = 'driver' AND key = NEW.driver_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_drivers_version_update AFTER UPDATE ON drivers
+WHEN NEW.row_version IS OLD.row_version
+BEGIN
+    UPDATE change_seq SET seq = seq + 1 WHERE id = 1;
+    UPDATE drivers SET row_version = (SELECT seq FROM change_seq WHERE id = 1) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_drivers_version_delete AFTER DELETE ON drivers
+BEGIN
+    UPDATE change_seq SET seq = seq + 1 WHERE id = 1;
+    INSERT OR REPLACE INTO tombstones (entity, key, seq)
+        VALUES ('driver', OLD.driver_id, (SELECT seq FROM change_seq WHERE id = 1));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_deliveries_version_insert AFTER INSERT ON deliveries
+BEGIN
+    DELETE FROM tombstones WHERE entity = 'delivery' AND key = NEW.order_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_deliveries_version_delete AFTER DELETE ON deliveries
+BEGIN
+    UPDATE change_seq SET seq = seq + 1 WHERE id = 1;
+    INSERT OR REPLACE INTO tombstones (entity, key, seq)
+        VALUES ('delivery', OLD.order_id, (SELECT seq FROM change_seq WHERE id = 1));
+END;
+"""
+
+MAX_PAGE = 10000
+
+
+def install(conn: sqlite3.Connection):
+    """Add row_version columns if missing, then the sequence table and triggers."""
+    cur = conn.cursor()
+    for table in ("orders", "drivers"):
+        cur.execute(f"PRAGMA table_info({table})")
+        if "row_version" not in {col[1] for col in cur.fetchall()}:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+    conn.commit()
+    cur.executescript(SCHEMA)
+
+
+def current_seq(cur: sqlite3.Cursor) -> int:
+    cur.execute("SELECT seq FROM change_seq WHERE id = 1")
+    return cur.fetchone()[0]
+
+
+def read_changes(conn: sqlite3.Connection, select_sql: str, version_column: str,
+                 entities: tuple[str, ...], since: int, limit: int) -> dict:
+    """
+    Rows changed and tombstones written after `since`, in one read snapshot.
+
+    `select_sql` is the list query without WHERE/ORDER, selecting
+    `version_column` as its last column. Rows come back in version order.
+    If more than `limit` rows changed, the page stops at the last returned
+    version and `has_more` is set; either way, pass the returned `seq` back
+    as the next `since`.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN")
+    try:
+        seq = current_seq(cur)
+        cur.execute(f"{select_sql} WHERE {version_column} > ? ORDER BY {version_column} LIMIT ?",
+                    (since, limit + 1))
+        rows = cur.fetchall()
+        has_more = len(rows) > limit
+        if has_more:
+            rows = rows[:limit]
+            seq = rows[-1][-1]
+        cur.execute(f"""
+            SELECT entity, key, seq FROM tombstones
+            WHERE entity IN ({','.join('?' * len(entities))}) AND seq > ? AND seq <= ?
+            ORDER BY seq
+        """, (*entities, since, seq))
+        deleted = [{"entity": e, "key": k, "seq": s} for e, k, s in cur.fetchall()]
+    finally:
+        conn.rollback()
+    return {"seq": seq, "has_more": has_more, "rows": rows, "deleted": deleted}
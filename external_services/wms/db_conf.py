@@ -0,0 +1,98 @@
+"""
+SQLite connection management for the WMS service.
+
+Opening a connection per request means re-reading the schema and starting
+with a cold page cache every time, so each worker thread keeps one long-lived
+connection instead. All connections are opened in WAL mode so readers
+(e.g. the dashboard polling /orders) never block behind writers.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_NAME = "wms.db"
+
+# Tuning applied to every connection. This is the single place to change them.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",     # safe with WAL, avoids an fsync per commit
+    "cache_size": -64000,        # negative = KiB, i.e. ~64 MB page cache
+    "mmap_size": 268435456,      # 256 MB memory-mapped I/O
+    "busy_timeout": 5000,        # ms to wait on a locked database
+    "temp_store": "MEMORY",
+}
+
+# most values bound into one IN (...) list; older SQLite builds cap a
+# statement at 999 parameters
+SQL_IN_CHUNK = 500
+
+_local = threading.local()
+
+
+def _open_connection() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """Return this thread's connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _open_connection()
+        _local.conn = conn
+    return conn
+
+
+@contextmanager
+def connection():
+    """
+    Borrow the thread's connection for the duration of a request.
+
+    Anything the handler did not commit (e.g. it raised an HTTPException
+    half-way through) is rolled back so it cannot leak into the next request
+    served by the same thread.
+    """
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+
+
+@contextmanager
+def dedicated_connection():
+    """
+    Open a private connection for work that outlives a single handler call,
+    such as a streaming response whose generator may be resumed on other
+    threads while the thread's own connection serves new requests.
+    """
+    conn = _open_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def select_in(cur: sqlite3.Cursor, sql: str, values: list) -> list[tuple]:
+    """
+    Run `sql`, whose "{}" marks the IN (...) placeholder list, once per
+    SQL_IN_CHUNK values and return the rows of every run.
+    """
+    rows = []
+    for start in range(0, len(values), SQL_IN_CHUNK):
+        chunk = values[start:start + SQL_IN_CHUNK]
+        cur.execute(sql.format(",".join("?" * len(chunk))), chunk)
+        rows.extend(cur.fetchall())
+    return rows
+
+
+def close_connection():
+    """Close this thread's connection (used on shutdown and in scripts)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
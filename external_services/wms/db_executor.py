@@ -0,0 +1,125 @@
+"""
+Dedicated executors for WMS database work.
+
+Handlers are async; their blocking sqlite3 work runs on one of two sized
+thread pools instead of Starlette's shared threadpool:
+
+* reads  - READ_WORKERS threads, each with its own WAL connection, so
+           reads run in parallel and never wait behind writers.
+* writes - WRITE_WORKERS threads (one by default). SQLite allows a single
+           writer anyway; queueing writes here instead of letting them
+           contend for the database lock keeps them from tying up threads
+           that reads need. With group commit on (write_queue.py) these
+           threads mostly wait for their batch to commit, so the default
+           rises to let enough mutations be in flight to fill a batch.
+
+Decorate a sync handler with @reads or @writes to turn it into an async
+handler that runs its body on the matching pool. The handler's signature is
+kept, so FastAPI resolves parameters exactly as before.
+
+Set WMS_DB_EXECUTORS=0 to fall back to plain sync handlers on Starlette's
+threadpool (useful for comparing, see bench_load.py).
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.concurrency import run_in_threadpool
+
+import write_queue
+
+ENABLED = os.environ.get("WMS_DB_EXECUTORS", "1") != "0"
+READ_WORKERS = int(os.environ.get("WMS_DB_READ_WORKERS", "8"))
+WRITE_WORKERS = int(os.environ.get("WMS_DB_WRITE_WORKERS",
+                                   str(write_queue.MAX_OPS) if write_queue.ENABLED else "1"))
+
+SIZES = {"read": READ_WORKERS, "write": WRITE_WORKERS}
+
+# pools are created on first use and torn down by shutdown() (app lifespan)
+_executors: dict[str, ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+# tasks submitted but not yet picked up by a worker, per pool
+_queued = {kind: 0 for kind in SIZES}
+_queued_lock = threading.Lock()
+
+
+def _executor(kind: str) -> ThreadPoolExecutor:
+    executor = _executors.get(kind)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(kind)
+            if executor is None:
+                executor = ThreadPoolExecutor(SIZES[kind], thread_name_prefix=f"wms-db-{kind}")
+                _executors[kind] = executor
+    return executor
+
+
+def shutdown():
+    """Wait for queued DB work to finish and stop the pools."""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=True)
+
+
+def _dequeue(kind: str):
+    with _queued_lock:
+        _queued[kind] -= 1
+
+
+async def _run(kind: str, fn, *args, **kwargs):
+    if not ENABLED:
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    def task():
+        _dequeue(kind)
+        return fn(*args, **kwargs)
+
+    with _queued_lock:
+        _queued[kind] += 1
+    try:
+        future = _executor(kind).submit(task)
+    except BaseException:
+        _dequeue(kind)
+        raise
+    # a task cancelled before a worker took it never runs task()
+    future.add_done_callback(lambda f: _dequeue(kind) if f.cancelled() else None)
+    return await asyncio.wrap_future(future)
+
+
+async def run_read(fn, *args, **kwargs):
+    return await _run("read", fn, *args, **kwargs)
+
+
+async def run_write(fn, *args, **kwargs):
+    return await _run("write", fn, *args, **kwargs)
+
+
+def _offload(kind: str):
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        async def handler(*args, **kwargs):
+            return await _run(kind, fn, *args, **kwargs)
+        return handler
+    return decorator
+
+
+reads = _offload("read")
+writes = _offload("write")
+
+
+def stats() -> dict:
+    return {
+        "enabled": ENABLED,
+        "read_workers": READ_WORKERS,
+        "write_workers": WRITE_WORKERS,
+        # tasks submitted but not yet picked up by a worker
+        **{f"{kind}_queue": _queued[kind] for kind in _executors},
+    }
@@ -0,0 +1,419 @@
+"""
+Batch auto-dispatch for the WMS service.
+
+Instead of borrowing and assigning orders one HTTP call at a time, a
+dispatch run loads every pending order and every available driver, pairs
+them with a matching policy and applies all assignments in one transaction.
+
+Policies are plain functions registered in POLICIES; each takes the pending
+orders, the available drivers and the request's position hints, and returns
+(order, driver) pairs. A driver is only paired with an order whose weight
+fits the vehicle's capacity; orders no free vehicle can carry wait for the
+next run. Adding a policy means adding a function here.
+
+Load dispatch (run_load_dispatch) instead gives each driver a whole load:
+plan_loads groups pending orders by delivery area and packs them into
+loads that fit the driver's vehicle capacity.
+"""
+
+import heapq
+import math
+import sqlite3
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+
+# most orders one load may hold, whatever their weight
+MAX_LOAD_ORDERS = 20
+# side of the grid cells (degrees, ~5.5 km) that located orders are grouped by
+AREA_CELL_DEG = 0.05
+
+
+@dataclass
+class PendingOrder:
+    id: int
+    order_id: str
+    delivery_location: str
+    created_at: str
+    weight: int = 1
+
+
+@dataclass
+class AvailableDriver:
+    id: int
+    driver_id: str
+    capacity: int = 1
+
+
+@dataclass
+class Load:
+    driver: AvailableDriver
+    area: str
+    orders: list[PendingOrder] = field(default_factory=list)
+
+    @property
+    def weight(self) -> int:
+        return sum(o.weight for o in self.orders)
+
+
+@dataclass
+class DispatchResult:
+    policy: str
+    pending_orders: int
+    available_drivers: int
+    assignments: list[tuple[str, str]]
+    elapsed_seconds: float
+    # available drivers the caller's driver_ids did not list
+    unindexed_drivers: int = 0
+
+    @property
+    def pairs_per_second(self) -> float:
+        if not self.assignments or self.elapsed_seconds <= 0:
+            return 0.0
+        return len(self.assignments) / self.elapsed_seconds
+
+
+# ---------------------- Matching Policies ----------------------
+def _pair_in_order(orders, drivers):
+    """
+    Give each order, in the order given, the earliest remaining driver whose
+    capacity takes its weight. Drivers are queued per distinct capacity, so
+    an order only looks at one queue head per vehicle size. Orders that no
+    remaining driver can carry are left unpaired.
+    """
+    queues = defaultdict(deque)
+    for rank, driver in enumerate(drivers):
+        queues[driver.capacity].append((rank, driver))
+    remaining = len(drivers)
+    pairs = []
+    for order in orders:
+        if not remaining:
+            break
+        best = None
+        for capacity, queue in queues.items():
+            if queue and capacity >= order.weight and (best is None or queue[0][0] < best[0][0]):
+                best = queue
+        if best is not None:
+            pairs.append((order, best.popleft()[1]))
+            remaining -= 1
+    return pairs
+
+
+def match_fifo(orders, drivers, positions):
+    """Orders in arrival order, drivers in queue order (longest available first)."""
+    orders = sorted(orders, key=lambda o: o.id)
+    drivers = sorted(drivers, key=lambda d: d.id)
+    return _pair_in_order(orders, drivers)
+
+
+def match_oldest_first(orders, drivers, positions):
+    """Orders that have waited longest (by created_at) are served first."""
+    orders = sorted(orders, key=lambda o: (o.created_at or "", o.id))
+    drivers = sorted(drivers, key=lambda d: d.id)
+    return _pair_in_order(orders, drivers)
+
+
+def haversine_km(a: tuple[float, float], b: tuple[float, float]) -> float:
+    lat1, lon1 = map(math.radians, a)
+    lat2, lon2 = map(math.radians, b)
+    h = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+
+def match_nearest_driver(orders, drivers, positions):
+    """
+    Oldest order first, each taking the closest remaining driver that can
+    carry it.
+
+    Orders or drivers without a known position are paired FIFO with
+    whatever is left once the located ones have been matched.
+    """
+    order_pos = positions.get("orders", {})
+    driver_pos = positions.get("drivers", {})
+    orders = sorted(orders, key=lambda o: (o.created_at or "", o.id))
+    located = [d for d in sorted(drivers, key=lambda d: d.id) if d.driver_id in driver_pos]
+    unlocated = [d for d in sorted(drivers, key=lambda d: d.id) if d.driver_id not in driver_pos]
+
+    pairs = []
+    leftover_orders = []
+    for order in orders:
+        target = order_pos.get(order.order_id)
+        fitting = [i for i, d in enumerate(located) if d.capacity >= order.weight] if target is not None else []
+        if not fitting:
+            leftover_orders.append(order)
+            continue
+        best = min(fitting, key=lambda i: haversine_km(target, driver_pos[located[i].driver_id]))
+        pairs.append((order, located.pop(best)))
+
+    pairs.extend(_pair_in_order(leftover_orders, unlocated + located))
+    return pairs
+
+
+POLICIES = {
+    "fifo": match_fifo,
+    "oldest_first": match_oldest_first,
+    "nearest_driver": match_nearest_driver,
+}
+
+
+# ---------------------- Load Planning ----------------------
+def area_of(order: PendingOrder, order_positions: dict) -> str:
+    """
+    Delivery area of an order: its AREA_CELL_DEG grid cell when a position
+    hint is given, else the last comma-separated part of the delivery
+    address (city / district), case-folded.
+    """
+    position = order_positions.get(order.order_id)
+    if position is not None:
+        return f"cell:{math.floor(position[0] / AREA_CELL_DEG)}:{math.floor(position[1] / AREA_CELL_DEG)}"
+    area = (order.delivery_location or "").rsplit(",", 1)[-1].strip().casefold()
+    return area or "unknown"
+
+
+def _pick_driver(drivers: list[AvailableDriver], weight: int) -> int:
+    """
+    Index of the driver for an area holding `weight`: the smallest vehicle
+    that takes all of it, else the largest one. Ties go to the driver who
+    has been free the longest (earliest in the list).
+    """
+    fitting = [i for i, d in enumerate(drivers) if d.capacity >= weight]
+    if fitting:
+        return min(fitting, key=lambda i: (drivers[i].capacity, i))
+    return max(range(len(drivers)), key=lambda i: (drivers[i].capacity, -i))
+
+
+def plan_loads(orders: list[PendingOrder], drivers: list[AvailableDriver], positions: dict | None = None,
+               max_orders: int = MAX_LOAD_ORDERS) -> tuple[list[Load], list[PendingOrder]]:
+    """
+    Pack pending orders into capacity-feasible loads, one per driver.
+
+    Orders are grouped by area (area_of). The area whose oldest order has
+    waited longest is served next: it gets a driver (_pick_driver), whose
+    load is filled first-fit in order age, up to the vehicle capacity and
+    max_orders. An area with orders left over goes back in the queue under
+    its new oldest order. Drivers are given out in list order (longest
+    available first) among equals.
+
+    Returns (loads, unplaceable): orders heavier than every available
+    vehicle cannot go in any load and are reported instead. With no
+    drivers free there is nothing to compare against, so nothing is
+    reported unplaceable and every order simply waits.
+    """
+    if not drivers:
+        return [], []
+    order_positions = (positions or {}).get("orders", {})
+    heaviest = max(d.capacity for d in drivers)
+    unplaceable = [o for o in orders if o.weight > heaviest]
+    areas = defaultdict(list)
+    for order in sorted(orders, key=lambda o: (o.created_at or "", o.id)):
+        if order.weight <= heaviest:
+            areas[area_of(order, order_positions)].append(order)
+
+    def key(area):
+        oldest = areas[area][0]
+        return (oldest.created_at or "", oldest.id, area)
+
+    queue = [key(area) for area in areas]
+    heapq.heapify(queue)
+    free = list(drivers)
+    loads = []
+    while queue and free:
+        area = heapq.heappop(queue)[2]
+        waiting = areas[area]
+        driver = free[_pick_driver(free, sum(o.weight for o in waiting))]
+        load = Load(driver, area)
+        room = driver.capacity
+        left = []
+        for order in waiting:
+            if order.weight <= room and len(load.orders) < max_orders:
+                load.orders.append(order)
+                room -= order.weight
+            else:
+                left.append(order)
+        if not load.orders:
+            # nothing in this area fits the vehicles still free; it waits for the next run
+            continue
+        free.remove(driver)
+        loads.append(load)
+        areas[area] = left
+        if left:
+            heapq.heappush(queue, key(area))
+    return loads, unplaceable
+
+
+# ---------------------- Engine ----------------------
+class StaleAvailability(Exception):
+    """The driver list passed in no longer matches the drivers table."""
+
+
+def _available_drivers(cur: sqlite3.Cursor, driver_ids: list[str] | None) -> tuple[list[AvailableDriver], int]:
+    """
+    Every driver the table shows as available, in queue order: driver_ids'
+    order (the availability index, longest-free first) when given, then the
+    ones it is missing by table id. Each driver's `id` is its queue
+    position, which is what the policies sort by. Also returns how many
+    available drivers driver_ids was missing.
+    """
+    cur.execute("SELECT id, driver_id, capacity FROM drivers WHERE available=1")
+    rows = cur.fetchall()
+    if driver_ids is None:
+        rows.sort()
+        return [AvailableDriver(*row) for row in rows], 0
+    rank = {d: i for i, d in enumerate(driver_ids)}
+    rows.sort(key=lambda r: (rank.get(r[1], len(rank)), r[0]))
+    drivers = [AvailableDriver(position, driver_id, capacity) for position, (_, driver_id, capacity) in enumerate(rows)]
+    return drivers, sum(1 for d in drivers if d.driver_id not in rank)
+
+
+def run_dispatch(conn: sqlite3.Connection, policy: str = "fifo",
+                 max_pairs: int | None = None, positions: dict | None = None,
+                 driver_ids: list[str] | None = None) -> DispatchResult:
+    """
+    Match pending orders to available drivers and assign them in bulk.
+
+    Everything happens inside a single BEGIN IMMEDIATE transaction, so the
+    snapshot the policy sees cannot change underneath it and the whole run
+    costs one commit. Rows are written exactly as assign_driver_to_order
+    writes them (order -> assigned, driver -> unavailable, delivery row
+    "on the way"). Raises KeyError for an unknown policy.
+
+    The available drivers always come from the table (`available = 1`),
+    inside the transaction. driver_ids, when given, is the availability
+    index's longest-free-first order and only decides who is offered work
+    first; drivers the index is missing still take part, after the ones it
+    lists, and the result counts them (unindexed_drivers) so the caller
+    can resync its index. StaleAvailability is raised (and the run rolled
+    back) only if a driver could not be claimed, which the transaction
+    should rule out.
+    """
+    match = POLICIES[policy]
+    started = time.perf_counter()
+
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("SELECT id, order_id, delivery_location, created_at, weight FROM orders WHERE status='pending'")
+        orders = [PendingOrder(*row) for row in cur.fetchall()]
+        drivers, unindexed = _available_drivers(cur, driver_ids)
+
+        pairs = match(orders, drivers, positions or {})
+        if max_pairs is not None:
+            pairs = pairs[:max_pairs]
+
+        cur.executemany("""
+            UPDATE orders
+            SET status='assigned', driver_id=?,
+                borrowed_at=COALESCE(borrowed_at, CURRENT_TIMESTAMP), assigned_at=CURRENT_TIMESTAMP
+            WHERE order_id=?
+        """, [(d.driver_id, o.order_id) for o, d in pairs])
+        cur.executemany("UPDATE drivers SET available=0 WHERE driver_id=? AND available=1",
+                        [(d.driver_id,) for _, d in pairs])
+        if pairs and cur.rowcount != len(pairs):
+            raise StaleAvailability()
+        cur.executemany("INSERT OR REPLACE INTO deliveries (order_id, delivery_status, address, driver_id) VALUES (?, ?, ?, ?)",
+                        [(o.order_id, "on the way", o.delivery_location, d.driver_id) for o, d in pairs])
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    return DispatchResult(
+        policy=policy,
+        pending_orders=len(orders),
+        available_drivers=len(drivers),
+        assignments=[(o.order_id, d.driver_id) for o, d in pairs],
+        elapsed_seconds=time.perf_counter() - started,
+        unindexed_drivers=unindexed,
+    )
+
+
+@dataclass
+class LoadDispatchResult:
+    pending_orders: int
+    available_drivers: int
+    loads: list[dict]
+    unplaceable: list[str]
+    elapsed_seconds: float
+    dry_run: bool
+    # available drivers the caller's driver_ids did not list
+    unindexed_drivers: int = 0
+
+    @property
+    def orders_assigned(self) -> int:
+        return sum(len(load["order_ids"]) for load in self.loads)
+
+    @property
+    def utilisation(self) -> float:
+        """Share of the dispatched vehicles' capacity the loads use."""
+        capacity = sum(load["capacity"] for load in self.loads)
+        return sum(load["total_weight"] for load in self.loads) / capacity if capacity else 0.0
+
+
+def run_load_dispatch(conn: sqlite3.Connection, max_loads: int | None = None, positions: dict | None = None,
+                      driver_ids: list[str] | None = None, max_orders: int = MAX_LOAD_ORDERS,
+                      dry_run: bool = False) -> LoadDispatchResult:
+    """
+    Plan loads (plan_loads) and assign each one to its driver, all in one
+    BEGIN IMMEDIATE transaction. Every order is written as an assignment
+    would write it, plus its load_id; the driver becomes unavailable until
+    the whole load is delivered or returned (see order_state). With
+    dry_run the plan is returned and nothing is written.
+
+    driver_ids, when given, is the availability index's longest-free-first
+    order and decides who is offered work first; the drivers and their
+    capacities still come from the table, as in run_dispatch.
+    """
+    started = time.perf_counter()
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("SELECT id, order_id, delivery_location, created_at, weight FROM orders WHERE status='pending'")
+        orders = [PendingOrder(*row) for row in cur.fetchall()]
+        drivers, unindexed = _available_drivers(cur, driver_ids)
+
+        loads, unplaceable = plan_loads(orders, drivers, positions, max_orders)
+        if max_loads is not None:
+            loads = loads[:max_loads]
+
+        planned = []
+        for load in loads:
+            load_id = None
+            if not dry_run:
+                cur.execute("INSERT INTO loads (driver_id, area, order_count, total_weight, capacity) VALUES (?, ?, ?, ?, ?)",
+                            (load.driver.driver_id, load.area, len(load.orders), load.weight, load.driver.capacity))
+                load_id = cur.lastrowid
+            planned.append({"load_id": load_id, "driver_id": load.driver.driver_id, "area": load.area,
+                            "order_ids": [o.order_id for o in load.orders],
+                            "total_weight": load.weight, "capacity": load.driver.capacity})
+
+        if not dry_run:
+            cur.executemany("""
+                UPDATE orders
+                SET status='assigned', driver_id=?, load_id=?,
+                    borrowed_at=COALESCE(borrowed_at, CURRENT_TIMESTAMP), assigned_at=CURRENT_TIMESTAMP
+                WHERE order_id=?
+            """, [(p["driver_id"], p["load_id"], order_id) for p in planned for order_id in p["order_ids"]])
+            cur.executemany("UPDATE drivers SET available=0 WHERE driver_id=? AND available=1",
+                            [(p["driver_id"],) for p in planned])
+            if planned and cur.rowcount != len(planned):
+                raise StaleAvailability()
+            cur.executemany("INSERT OR REPLACE INTO deliveries (order_id, delivery_status, address, driver_id) VALUES (?, ?, ?, ?)",
+                            [(o.order_id, "on the way", o.delivery_location, load.driver.driver_id)
+                             for load in loads for o in load.orders])
+            conn.commit()
+        else:
+            conn.rollback()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    return LoadDispatchResult(
+        pending_orders=len(orders),
+        available_drivers=len(drivers),
+        loads=planned,
+        unplaceable=[o.order_id for o in unplaceable],
+        elapsed_seconds=time.perf_counter() - started,
+        dry_run=dry_run,
+        unindexed_drivers=unindexed,
+    )
@@ -0,0 +1,118 @@
+"""
+Bulk driver onboarding for the WMS service.
+
+Used by POST /drivers/bulk and by the seed scripts, so a whole contractor
+fleet goes in with one indexed duplicate-email pass and batched inserts
+instead of one signup round trip per driver.
+"""
+
+import csv
+import io
+import sqlite3
+import uuid
+
+import db_conf
+import migrations
+
+INSERT_BATCH = 1000
+DRIVER_FIELDS = ("name", "email", "phone", "license_number")
+
+
+def generate_driver_id() -> str:
+    return f"DRV{uuid.uuid4().hex[:8].upper()}"
+
+
+def parse_csv(text: str) -> list[dict]:
+    """Read a CSV upload with a header row naming DRIVER_FIELDS (and optionally capacity)."""
+    return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+
+
+def _capacity(record: dict) -> int | None:
+    """The row's vehicle capacity, DEFAULT_CAPACITY when blank; None if not a positive integer."""
+    value = record.get("capacity")
+    if value is None or str(value).strip() == "":
+        return migrations.DEFAULT_CAPACITY
+    try:
+        capacity = int(str(value).strip())
+    except ValueError:
+        return None
+    return capacity if capacity > 0 else None
+
+
+def _validate(record) -> str | None:
+    if not isinstance(record, dict):
+        return "row is not an object"
+    missing = [f for f in DRIVER_FIELDS if not str(record.get(f) or "").strip()]
+    if missing:
+        return f"missing field(s): {', '.join(missing)}"
+    if _capacity(record) is None:
+        return "capacity must be a positive integer"
+    return None
+
+
+def _unique_driver_ids(cur: sqlite3.Cursor, count: int) -> list[str]:
+    """
+    `count` fresh driver ids that collide neither with each other nor with
+    the drivers table (checked through the UNIQUE(driver_id) index, one
+    chunked IN pass per round); colliding ids are drawn again.
+    """
+    ids = set()
+    while len(ids) < count:
+        fresh = list({generate_driver_id() for _ in range(count - len(ids))} - ids)
+        taken = db_conf.select_in(cur, "SELECT driver_id FROM drivers WHERE driver_id IN ({})", fresh)
+        ids.update(set(fresh) - {row[0] for row in taken})
+    return list(ids)
+
+
+def import_drivers(conn: sqlite3.Connection, records: list[dict]) -> list[dict]:
+    """
+    Insert drivers in one transaction and report the outcome of every row.
+
+    Each result has the row index and a status of "created" (with the new
+    driver_id), "conflict" (email already registered or repeated in the
+    upload) or "invalid" (missing fields or a bad capacity). Rows without a
+    capacity get migrations.DEFAULT_CAPACITY.
+    """
+    results = [None] * len(records)
+    candidates = []
+    for i, record in enumerate(records):
+        error = _validate(record)
+        if error:
+            results[i] = {"row": i, "status": "invalid", "reason": error}
+        else:
+            candidates.append((i, {**{f: str(record[f]).strip() for f in DRIVER_FIELDS},
+                                   "capacity": _capacity(record)}))
+
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        # one pass over the UNIQUE(email) index for the whole upload
+        emails = [r["email"] for _, r in candidates]
+        taken = {row[0] for row in db_conf.select_in(cur, "SELECT email FROM drivers WHERE email IN ({})", emails)}
+
+        accepted = []
+        seen = set()
+        for i, r in candidates:
+            if r["email"] in taken or r["email"] in seen:
+                reason = "Email already registered" if r["email"] in taken else "Email repeated in upload"
+                results[i] = {"row": i, "email": r["email"], "status": "conflict", "reason": reason}
+                continue
+            seen.add(r["email"])
+            accepted.append((i, r))
+
+        driver_ids = _unique_driver_ids(cur, len(accepted))
+        rows = []
+        for (i, r), driver_id in zip(accepted, driver_ids):
+            rows.append((driver_id, r["name"], r["email"], r["phone"], r["license_number"], r["capacity"]))
+            results[i] = {"row": i, "email": r["email"], "status": "created", "driver_id": driver_id}
+
+        for start in range(0, len(rows), INSERT_BATCH):
+            cur.executemany("""
+                INSERT INTO drivers (driver_id, name, email, phone, license_number, capacity, available)
+                VALUES (?, ?, ?, ?, ?, ?, 1)
+            """, rows[start:start + INSERT_BATCH])
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return results
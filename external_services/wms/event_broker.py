@@ -0,0 +1,175 @@
+"""
+Multi-publisher / multi-subscriber event broker for WMS events.
+
+Built on asyncio streams and the length-prefixed JSON framing used by
+events.EventPublisher. The first frame a client sends says what it is:
+
+    {"role": "publisher"}
+    {"role": "subscriber", "topics": ["order", "driver"]}   # omit topics for all
+
+A connection whose first frame is an event (no "role") is treated as a
+publisher, so older publishers work without a handshake. Every published
+event carries a "topic" and is fanned out to the subscribers interested in
+it. Each subscriber has its own bounded buffer; when a slow subscriber's
+buffer is full the oldest event is discarded and counted, so one stuck
+consumer never holds up publishers or other subscribers.
+
+Run with:  python event_broker.py [--host 127.0.0.1] [--port 9000]
+"""
+
+import argparse
+import asyncio
+import json
+
+from events import FRAME_HEADER, encode_frame
+
+SUBSCRIBER_BUFFER = 1000
+MAX_FRAME = 1 << 20
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes | None:
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+        (length,) = FRAME_HEADER.unpack(header)
+        if length > MAX_FRAME:
+            return None
+        return await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+class Subscriber:
+    def __init__(self, writer: asyncio.StreamWriter, topics, buffer_size: int):
+        self.writer = writer
+        self.topics = set(topics) if topics else None
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.delivered = 0
+        self.dropped = 0
+
+    def wants(self, topic) -> bool:
+        return self.topics is None or topic in self.topics
+
+    def offer(self, frame: bytes):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+    async def pump(self):
+        """Write queued frames, batching whatever accumulated since the last drain."""
+        while True:
+            frames = [await self.queue.get()]
+            while not self.queue.empty():
+                frames.append(self.queue.get_nowait())
+            self.writer.write(b"".join(frames))
+            await self.writer.drain()
+            self.delivered += len(frames)
+
+
+class EventBroker:
+    def __init__(self, buffer_size: int = SUBSCRIBER_BUFFER, verbose: bool = False):
+        self.buffer_size = buffer_size
+        self.verbose = verbose
+        self.subscribers: set[Subscriber] = set()
+        self.publishers = 0
+        self.published = 0
+
+    def route(self, frame: bytes, event: dict):
+        self.published += 1
+        if self.verbose:
+            print("Received:", event.get("message", event))
+        topic = event.get("topic")
+        framed = encode_frame(frame)
+        for sub in self.subscribers:
+            if sub.wants(topic):
+                sub.offer(framed)
+
+    def stats(self) -> dict:
+        return {
+            "publishers": self.publishers,
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "delivered": sum(s.delivered for s in self.subscribers),
+            "dropped": sum(s.dropped for s in self.subscribers),
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")
+        try:
+            first = await read_frame(reader)
+            if first is None:
+                return
+            hello = json.loads(first)
+            if hello.get("role") == "subscriber":
+                await self._serve_subscriber(reader, writer, hello.get("topics"), peer)
+            else:
+                await self._serve_publisher(reader, None if "role" in hello else (first, hello), peer)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            print("Dropping client with malformed frame", peer)
+        finally:
+            writer.close()
+
+    async def _serve_publisher(self, reader, pending, peer):
+        self.publishers += 1
+        print("Publisher connected", peer)
+        try:
+            if pending is not None:
+                self.route(*pending)
+            while (frame := await read_frame(reader)) is not None:
+                self.route(frame, json.loads(frame))
+        finally:
+            self.publishers -= 1
+            print("Publisher disconnected", peer)
+
+    async def _serve_subscriber(self, reader, writer, topics, peer):
+        sub = Subscriber(writer, topics, self.buffer_size)
+        self.subscribers.add(sub)
+        print("Subscriber connected", peer, "topics:", topics or "all")
+        pump = asyncio.create_task(sub.pump())
+        try:
+            # subscribers send nothing further; EOF means they went away
+            await reader.read()
+        finally:
+            self.subscribers.discard(sub)
+            pump.cancel()
+            print("Subscriber disconnected", peer)
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Event broker listening on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+async def subscribe(host: str, port: int, topics=None, on_connect=None):
+    """
+    Async iterator over events from the broker, for consumers such as CMS
+    sync. on_connect, if given, is called once the subscription has been
+    sent, before any event arrives.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    hello = {"role": "subscriber", "topics": list(topics) if topics else None}
+    writer.write(encode_frame(json.dumps(hello).encode()))
+    await writer.drain()
+    try:
+        if on_connect is not None:
+            on_connect()
+        while (frame := await read_frame(reader)) is not None:
+            yield json.loads(frame)
+    finally:
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WMS event broker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--buffer", type=int, default=SUBSCRIBER_BUFFER,
+                        help="events buffered per subscriber before the oldest is dropped")
+    parser.add_argument("--verbose", action="store_true", help="print every event")
+    args = parser.parse_args()
+    asyncio.run(EventBroker(args.buffer, args.verbose).serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Non-blocking event publisher for WMS status updates.
+
+Handlers call publish(), which only puts the event on a bounded in-memory
+queue and returns. A background thread drains the queue, coalesces whatever
+has accumulated into one batch and writes it to the protocol server with a
+single sendall(). If the server is slow or down, requests are unaffected:
+the queue absorbs bursts, overflow is counted and dropped, and the sender
+reconnects with exponential backoff.
+
+Wire format: every event is a JSON object framed by a 4-byte big-endian
+unsigned length prefix (see encode_frame / read_frame).
+"""
+
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+
+FRAME_HEADER = struct.Struct(">I")
+
+QUEUE_SIZE = 10000
+BATCH_MAX = 256          # events per sendall()
+BATCH_WINDOW = 0.005     # seconds to wait for more events once one arrives
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30.0
+CONNECT_TIMEOUT = 2.0
+
+
+def encode_frame(payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def read_frame(sock: socket.socket) -> bytes | None:
+    """Read one length-prefixed frame; None when the peer closed."""
+    header = _read_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    return _read_exact(sock, length)
+
+
+def _read_exact(sock: socket.socket, n: int) -> bytes | None:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+class EventPublisher:
+    def __init__(self, host: str, port: int, queue_size: int = QUEUE_SIZE):
+        self.host = host
+        self.port = port
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._sock = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.sent = 0
+        self.batches = 0
+        self.reconnects = 0
+
+    # ---------------------- producer side ----------------------
+    def publish(self, message: str, topic: str = "order", **data) -> bool:
+        """Queue an event without blocking. Returns False if it was dropped."""
+        event = {"topic": topic, "message": message, "ts": time.time(), **data}
+        try:
+            self._queue.put_nowait(encode_frame(json.dumps(event).encode()))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "connected": self._sock is not None,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "dropped": self.dropped,
+            "sent": self.sent,
+            "batches": self.batches,
+            "reconnects": self.reconnects,
+        }
+
+    # ---------------------- sender thread ----------------------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="wms-event-publisher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._disconnect()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT)
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # pid lets the broker tell the publishers of several WMS workers apart
+        sock.sendall(encode_frame(json.dumps({"role": "publisher", "pid": os.getpid()}).encode()))
+        self._sock = sock
+        print(f"Connected to TCP protocol server at {self.host}:{self.port}.")
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _next_batch(self) -> list[bytes]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + BATCH_WINDOW
+        while len(batch) < BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        backoff = BACKOFF_INITIAL
+        batch = []
+        while not self._stop.is_set():
+            if self._sock is None:
+                try:
+                    self._connect()
+                    backoff = BACKOFF_INITIAL
+                except OSError as e:
+                    print(f"TCP publisher connect failed ({e}), retrying in {backoff:.1f}s")
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, BACKOFF_MAX)
+                    continue
+
+            # a batch that failed to send is retried after reconnecting
+            if not batch:
+                batch = self._next_batch()
+                if not batch:
+                    continue
+            try:
+                self._sock.sendall(b"".join(batch))
+            except OSError as e:
+                print("Failed to send TCP update batch:", e)
+                self._disconnect()
+                with self._lock:
+                    self.reconnects += 1
+                continue
+            with self._lock:
+                self.sent += len(batch)
+                self.batches += 1
+            batch = []
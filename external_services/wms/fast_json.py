@@ -0,0 +1,47 @@
+"""
+Fast JSON output for the hot WMS read endpoints.
+
+The list endpoints used to build a Pydantic model per row and let FastAPI
+validate and re-encode it. Here rows come out of the cursor as plain dicts
+(via a row factory) and the whole list is encoded in one call. The shape
+is the same as the declared response models; only the per-row model work
+is skipped.
+
+orjson is used when it is installed; otherwise a json.JSONEncoder that is
+built once at import time (compact separators, no ASCII escaping).
+"""
+
+import json
+import sqlite3
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+else:
+    _encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+    def dumps(obj) -> bytes:
+        return _encoder.encode(obj).encode()
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def row_factory(to_dict):
+    """sqlite3 row factory that hands rows out already converted by to_dict."""
+    def factory(cursor: sqlite3.Cursor, row: tuple) -> dict:
+        return to_dict(row)
+    return factory
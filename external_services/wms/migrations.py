@@ -0,0 +1,242 @@
+"""
+Versioned schema migrations for the WMS database.
+
+The schema version lives in `PRAGMA user_version` (stored in the database
+header, so reading it costs nothing). On startup migrate() applies every
+step newer than that version, in order, bumping user_version after each
+one. Nothing is dropped or rebuilt: columns are added with ALTER TABLE ...
+ADD COLUMN (a header-only change in SQLite), indexes and triggers with
+IF NOT EXISTS, and data changes go through backfill(), which updates rows
+in short batches so the service can keep serving while it runs.
+
+Every step is idempotent. Databases created before versioning report
+user_version 0 and simply run all steps, which find their work already
+done; a step interrupted by a crash is re-run on the next start.
+
+Adding a schema change means appending a function to MIGRATIONS.
+
+When several worker processes start together, schema_lock() makes one of
+them migrate while the others wait and then find nothing left to do.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+
+import archive
+import change_log
+import order_stats
+
+BACKFILL_BATCH = 1000
+# vehicle capacity, in the same units as order weight, for drivers that do not set one
+DEFAULT_CAPACITY = 100
+
+
+def backfill(conn: sqlite3.Connection, table: str, set_sql: str, where_sql: str,
+             batch_size: int = BACKFILL_BATCH) -> int:
+    """
+    UPDATE `table` SET `set_sql` for rows matching `where_sql`, batch_size
+    rows per transaction. `where_sql` must stop matching a row once it has
+    been updated. Returns the number of rows changed.
+    """
+    cur = conn.cursor()
+    total = 0
+    while True:
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.execute(f"""
+                UPDATE {table} SET {set_sql}
+                WHERE rowid IN (SELECT rowid FROM {table} WHERE {where_sql} LIMIT ?)
+            """, (batch_size,))
+            changed = cur.rowcount
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        total += changed
+        if changed < batch_size:
+            return total
+
+
+def _columns(cur, table: str) -> set[str]:
+    cur.execute(f"PRAGMA table_info({table})")
+    return {col[1] for col in cur.fetchall()}
+
+
+# ---------------------- Steps ----------------------
+def _base_tables(conn):
+    cur = conn.cursor()
+    # orders table - for warehouse management
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT UNIQUE,
+            client_name TEXT,
+            pickup_location TEXT,
+            delivery_location TEXT,
+            package_info TEXT,
+            status TEXT DEFAULT 'pending',
+            driver_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            borrowed_at TIMESTAMP,
+            assigned_at TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS deliveries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT UNIQUE,
+            delivery_status TEXT,
+            address TEXT,
+            driver_id TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS drivers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            driver_id TEXT UNIQUE,
+            name TEXT,
+            email TEXT UNIQUE,
+            phone TEXT,
+            license_number TEXT,
+            available INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+
+def _driver_profile_columns(conn):
+    """
+    Drivers tables from before signup only had (id, driver_id, name,
+    available). Add the profile columns in place and give existing drivers
+    placeholder contact details (what setup_drivers_db.py used to do by
+    dropping and re-creating the table).
+    """
+    cur = conn.cursor()
+    existing = _columns(cur, "drivers")
+    added = False
+    for column, ddl in (("email", "TEXT"), ("phone", "TEXT"), ("license_number", "TEXT"),
+                        ("created_at", "TIMESTAMP")):
+        if column not in existing:
+            cur.execute(f"ALTER TABLE drivers ADD COLUMN {column} {ddl}")
+            added = True
+    cur.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='drivers'")
+    if "email TEXT UNIQUE" not in cur.fetchone()[0]:
+        # ADD COLUMN cannot carry UNIQUE, so enforce it with an index
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_drivers_email ON drivers (email)")
+    conn.commit()
+    # only legacy rows: drivers created via POST /drivers/ legitimately have no email
+    if added:
+        backfill(conn, "drivers",
+                 "email = lower(driver_id) || '@temp.com', phone = '+1-555-0000', license_number = 'DL00000000', "
+                 "created_at = COALESCE(created_at, CURRENT_TIMESTAMP)",
+                 "email IS NULL")
+
+
+def _list_indexes(conn):
+    cur = conn.cursor()
+    # indexes backing the keyset-paginated /orders listing and its filters
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_driver_created ON orders (driver_id, created_at, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_drivers_available ON drivers (id) WHERE available = 1")
+    conn.commit()
+
+
+def _available_by_version(conn):
+    # backs availability.SharedAvailability (longest-available first across processes)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_drivers_available_version ON drivers (row_version) WHERE available = 1")
+    conn.commit()
+
+
+def _capacity_and_loads(conn):
+    """
+    Vehicle capacity on drivers, weight on orders and the loads that group
+    orders per driver (dispatch.plan_loads). Existing drivers get the
+    default capacity and existing orders weight 1.
+    """
+    cur = conn.cursor()
+    if "capacity" not in _columns(cur, "drivers"):
+        cur.execute(f"ALTER TABLE drivers ADD COLUMN capacity INTEGER NOT NULL DEFAULT {DEFAULT_CAPACITY}")
+    existing = _columns(cur, "orders")
+    if "weight" not in existing:
+        cur.execute("ALTER TABLE orders ADD COLUMN weight INTEGER NOT NULL DEFAULT 1")
+    if "load_id" not in existing:
+        cur.execute("ALTER TABLE orders ADD COLUMN load_id INTEGER")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS loads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            driver_id TEXT,
+            area TEXT,
+            order_count INTEGER,
+            total_weight INTEGER,
+            capacity INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_load ON orders (load_id) WHERE load_id IS NOT NULL")
+    # "does this driver still have orders out?" when one of a load is delivered or returned
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_driver_assigned ON orders (driver_id) WHERE status = 'assigned'")
+    conn.commit()
+
+
+def _history_load_columns(conn):
+    """weight and load_id on orders_history, so archiving keeps them."""
+    cur = conn.cursor()
+    existing = _columns(cur, "orders_history")
+    if "weight" not in existing:
+        cur.execute("ALTER TABLE orders_history ADD COLUMN weight INTEGER NOT NULL DEFAULT 1")
+    if "load_id" not in existing:
+        cur.execute("ALTER TABLE orders_history ADD COLUMN load_id INTEGER")
+    conn.commit()
+
+
+MIGRATIONS = [
+    _base_tables,
+    _driver_profile_columns,
+    _list_indexes,
+    # trigger-maintained counters behind GET /orders/stats
+    order_stats.install,
+    # row versions and tombstones behind ?since= delta sync
+    change_log.install,
+    # history tables delivered orders are archived into
+    archive.install,
+    _available_by_version,
+    _capacity_and_loads,
+    _history_load_columns,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+@contextmanager
+def schema_lock(db_name: str, timeout: float = 120.0):
+    """
+    Cross-process lock around migrate(), held as an exclusive transaction on
+    a small side database (<db_name>.lock), so it works wherever SQLite does.
+    """
+    lock = sqlite3.connect(f"{db_name}.lock", timeout=timeout)
+    try:
+        lock.execute("BEGIN EXCLUSIVE")
+        yield
+    finally:
+        if lock.in_transaction:
+            lock.rollback()
+        lock.close()
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> tuple[int, int]:
+    """Apply pending steps; returns (version before, version after)."""
+    start = current_version(conn)
+    if start > SCHEMA_VERSION:
+        raise RuntimeError(f"wms.db is at schema version {start}, newer than this code ({SCHEMA_VERSION})")
+    for version, step in enumerate(MIGRATIONS[start:], start=start + 1):
+        step(conn)
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute(f"PRAGMA user_version = {version}")
+    return start, SCHEMA_VERSION
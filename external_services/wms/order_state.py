@@ -0,0 +1,172 @@
+"""
+Order state machine for the WMS service.
+
+    pending --borrow--> borrowed --assign--> assigned --deliver--> delivered
+       ^                   |                    |
+       +------return-------+--------return------+
+
+A driver may carry several orders at once (a load, see dispatch.plan_loads);
+delivering or returning one of them frees the driver only once none of
+their orders is still assigned.
+
+Every transition runs under BEGIN IMMEDIATE and is applied as a conditional
+UPDATE (`... WHERE status = <expected>`) whose rowcount decides whether it
+happened. There is no read-then-write window, so two operators cannot
+borrow the same order and a driver cannot be assigned twice. The order is
+only looked up again when a transition fails, to pick the right error.
+"""
+
+import sqlite3
+from dataclasses import dataclass
+
+
+class TransitionError(Exception):
+    """A transition was rejected; status_code/detail map onto an HTTP error."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class Transition:
+    action: str
+    order_id: str
+    driver_id: str | None = None
+
+
+def _order_missing(cur, order_id: str) -> bool:
+    cur.execute("SELECT 1 FROM orders WHERE order_id=?", (order_id,))
+    return cur.fetchone() is None
+
+
+def _release_driver(cur, driver_id: str) -> bool:
+    """Make the driver available unless they still have assigned orders; True if freed."""
+    cur.execute("""
+        UPDATE drivers SET available=1
+        WHERE driver_id=? AND NOT EXISTS (SELECT 1 FROM orders WHERE driver_id=? AND status='assigned')
+    """, (driver_id, driver_id))
+    return cur.rowcount > 0
+
+
+def _borrow(cur, t: Transition) -> dict:
+    cur.execute("UPDATE orders SET status='borrowed', borrowed_at=CURRENT_TIMESTAMP WHERE order_id=? AND status='pending'",
+                (t.order_id,))
+    if cur.rowcount == 0:
+        if _order_missing(cur, t.order_id):
+            raise TransitionError(404, "Order not found")
+        raise TransitionError(400, "Order is not available for borrowing")
+    return {"order_id": t.order_id}
+
+
+def _assign(cur, t: Transition) -> dict:
+    cur.execute("""
+        UPDATE orders SET status='assigned', driver_id=?, assigned_at=CURRENT_TIMESTAMP
+        WHERE order_id=? AND status='borrowed'
+    """, (t.driver_id, t.order_id))
+    if cur.rowcount == 0:
+        if _order_missing(cur, t.order_id):
+            raise TransitionError(404, "Order not found")
+        raise TransitionError(400, "Order is not borrowed")
+
+    # claim the driver; only one concurrent assignment can flip available 1 -> 0
+    cur.execute("UPDATE drivers SET available=0 WHERE driver_id=? AND available=1", (t.driver_id,))
+    if cur.rowcount == 0:
+        cur.execute("SELECT 1 FROM drivers WHERE driver_id=?", (t.driver_id,))
+        if cur.fetchone() is None:
+            raise TransitionError(404, "Driver not found")
+        raise TransitionError(400, "Driver is not available")
+
+    cur.execute("""
+        INSERT OR REPLACE INTO deliveries (order_id, delivery_status, address, driver_id)
+        SELECT order_id, 'on the way', delivery_location, driver_id FROM orders WHERE order_id=?
+    """, (t.order_id,))
+    return {"order_id": t.order_id, "driver_id": t.driver_id}
+
+
+def _return(cur, t: Transition) -> dict:
+    # the driver to release, if the order is currently assigned (we already
+    # hold the write lock, so this cannot change before the UPDATEs below)
+    cur.execute("SELECT driver_id FROM orders WHERE order_id=? AND status='assigned'", (t.order_id,))
+    row = cur.fetchone()
+    released = row[0] if row else None
+
+    cur.execute("""
+        UPDATE orders SET status='pending', driver_id=NULL, load_id=NULL, borrowed_at=NULL, assigned_at=NULL
+        WHERE order_id=? AND status IN ('borrowed', 'assigned')
+    """, (t.order_id,))
+    if cur.rowcount == 0:
+        if _order_missing(cur, t.order_id):
+            raise TransitionError(404, "Order not found")
+        raise TransitionError(400, "Order cannot be returned")
+
+    if row is not None:
+        if released and not _release_driver(cur, released):
+            # the rest of the driver's load is still out
+            released = None
+        cur.execute("DELETE FROM deliveries WHERE order_id=?", (t.order_id,))
+    return {"order_id": t.order_id, "released_driver_id": released}
+
+
+def _deliver(cur, t: Transition) -> dict:
+    cur.execute("UPDATE orders SET status='delivered', delivered_at=CURRENT_TIMESTAMP WHERE order_id=? AND status='assigned'",
+                (t.order_id,))
+    if cur.rowcount == 0:
+        if _order_missing(cur, t.order_id):
+            raise TransitionError(404, "Order not found")
+        raise TransitionError(400, "Order is not assigned")
+
+    # safe to read back: we hold the write lock until commit
+    cur.execute("SELECT driver_id FROM orders WHERE order_id=?", (t.order_id,))
+    driver_id = cur.fetchone()[0]
+    driver_available = bool(driver_id) and _release_driver(cur, driver_id)
+    cur.execute("UPDATE deliveries SET delivery_status='delivered' WHERE order_id=?", (t.order_id,))
+    return {"order_id": t.order_id, "driver_id": driver_id, "driver_available": driver_available}
+
+
+ACTIONS = {
+    "borrow": _borrow,
+    "assign": _assign,
+    "return": _return,
+    "deliver": _deliver,
+}
+
+
+def apply_on(cur, t: Transition) -> dict:
+    """Apply one transition inside the caller's transaction (no commit)."""
+    handler = ACTIONS.get(t.action)
+    if handler is None:
+        raise TransitionError(400, f"Unknown transition: {t.action}")
+    if t.action == "assign" and not t.driver_id:
+        raise TransitionError(400, "driver_id is required to assign")
+    return handler(cur, t)
+
+
+def apply_transitions(conn: sqlite3.Connection, transitions: list[Transition]) -> list[dict]:
+    """
+    Apply many transitions in one transaction (one lock, one commit).
+
+    Each transition runs inside its own SAVEPOINT, so a rejected one is
+    undone and reported without affecting the others. Results keep the
+    input order; failed ones carry "error" and "status_code".
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    results = []
+    try:
+        for t in transitions:
+            cur.execute("SAVEPOINT transition")
+            try:
+                result = apply_on(cur, t)
+                results.append({"action": t.action, "ok": True, **result})
+            except TransitionError as e:
+                cur.execute("ROLLBACK TO transition")
+                results.append({"action": t.action, "order_id": t.order_id, "ok": False,
+                                "status_code": e.status_code, "error": e.detail})
+            cur.execute("RELEASE transition")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return results
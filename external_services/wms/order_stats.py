@@ -0,0 +1,135 @@
+"""
+Incrementally maintained order counters for the WMS dashboard.
+
+SQLite triggers on `orders` keep three small counter tables up to date
+inside the same transaction as the write that changed them:
+
+    order_status_counts   status            -> count
+    order_driver_counts   driver_id, status -> count
+    order_daily_counts    day, status       -> count   (day of created_at)
+
+Reading the stats is a scan of these tables, whose size depends on the
+number of statuses, drivers and days, never on the number of orders.
+Because the triggers live in the database they also see writes made by
+other processes and scripts. reconcile() recomputes everything from
+`orders` and runs automatically when the triggers are first installed.
+"""
+
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_status_counts (
+    status TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS order_driver_counts (
+    driver_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (driver_id, status)
+);
+CREATE TABLE IF NOT EXISTS order_daily_counts (
+    day TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_order_stats_insert AFTER INSERT ON orders
+BEGIN
+    INSERT INTO order_status_counts (status, count) VALUES (NEW.status, 1)
+        ON CONFLICT(status) DO UPDATE SET count = count + 1;
+    INSERT INTO order_daily_counts (day, status, count) VALUES (date(NEW.created_at), NEW.status, 1)
+        ON CONFLICT(day, status) DO UPDATE SET count = count + 1;
+    INSERT INTO order_driver_counts (driver_id, status, count)
+        SELECT NEW.driver_id, NEW.status, 1 WHERE NEW.driver_id IS NOT NULL
+        ON CONFLICT(driver_id, status) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_order_stats_delete AFTER DELETE ON orders
+BEGIN
+    UPDATE order_status_counts SET count = count - 1 WHERE status = OLD.status;
+    UPDATE order_daily_counts SET count = count - 1
+        WHERE day = date(OLD.created_at) AND status = OLD.status;
+    UPDATE order_driver_counts SET count = count - 1
+        WHERE driver_id = OLD.driver_id AND status = OLD.status;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_order_stats_update AFTER UPDATE OF status, driver_id ON orders
+WHEN OLD.status IS NOT NEW.status OR OLD.driver_id IS NOT NEW.driver_id
+BEGIN
+    UPDATE order_status_counts SET count = count - 1 WHERE status = OLD.status;
+    INSERT INTO order_status_counts (status, count) VALUES (NEW.status, 1)
+        ON CONFLICT(status) DO UPDATE SET count = count + 1;
+    UPDATE order_daily_counts SET count = count - 1
+        WHERE day = date(OLD.created_at) AND status = OLD.status;
+    INSERT INTO order_daily_counts (day, status, count) VALUES (date(NEW.created_at), NEW.status, 1)
+        ON CONFLICT(day, status) DO UPDATE SET count = count + 1;
+    UPDATE order_driver_counts SET count = count - 1
+        WHERE driver_id = OLD.driver_id AND status = OLD.status;
+    INSERT INTO order_driver_counts (driver_id, status, count)
+        SELECT NEW.driver_id, NEW.status, 1 WHERE NEW.driver_id IS NOT NULL
+        ON CONFLICT(driver_id, status) DO UPDATE SET count = count + 1;
+END;
+"""
+
+
+def install(conn: sqlite3.Connection):
+    """Create counter tables and triggers; seed them if the triggers are new."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='trg_order_stats_insert'")
+    fresh = cur.fetchone() is None
+    cur.executescript(SCHEMA)
+    if fresh:
+        reconcile(conn)
+
+
+def reconcile(conn: sqlite3.Connection):
+    """Recompute every counter from the orders table (one full scan)."""
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("DELETE FROM order_status_counts")
+        cur.execute("DELETE FROM order_driver_counts")
+        cur.execute("DELETE FROM order_daily_counts")
+        cur.execute("INSERT INTO order_status_counts SELECT status, COUNT(*) FROM orders GROUP BY status")
+        cur.execute("""
+            INSERT INTO order_driver_counts SELECT driver_id, status, COUNT(*)
+            FROM orders WHERE driver_id IS NOT NULL GROUP BY driver_id, status
+        """)
+        cur.execute("INSERT INTO order_daily_counts SELECT date(created_at), status, COUNT(*) FROM orders GROUP BY 1, 2")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def read_stats(conn: sqlite3.Connection, days: int = 30, driver_id: str | None = None) -> dict:
+    cur = conn.cursor()
+    cur.execute("SELECT status, count FROM order_status_counts WHERE count > 0")
+    by_status = dict(cur.fetchall())
+
+    by_driver = {}
+    if driver_id is None:
+        cur.execute("SELECT driver_id, status, count FROM order_driver_counts WHERE count > 0")
+    else:
+        cur.execute("SELECT driver_id, status, count FROM order_driver_counts WHERE driver_id = ? AND count > 0",
+                    (driver_id,))
+    for d, status, count in cur.fetchall():
+        by_driver.setdefault(d, {})[status] = count
+
+    by_day = {}
+    cur.execute("""
+        SELECT day, status, count FROM order_daily_counts
+        WHERE count > 0 AND day >= date('now', ?)
+        ORDER BY day DESC
+    """, (f"-{days} days",))
+    for day, status, count in cur.fetchall():
+        by_day.setdefault(day, {})[status] = count
+
+    return {
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_driver": by_driver,
+        "by_day": by_day,
+    }
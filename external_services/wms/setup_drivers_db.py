@@ -3,64 +3,23 @@
 Update WMS Database Schema and Add Sample Drivers
 """
 
-import sqlite3
-import uuid
-
-DB_NAME = "wms.db"
+import db_conf
+import driver_import
+import migrations
 
 def update_database_schema():
-    """Update the drivers table schema to include new fields"""
+    """Bring the WMS schema up to date in place (see migrations.py)"""
     print("🔧 Updating Database Schema...")
     
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    
-    # Check current schema
-    cur.execute("PRAGMA table_info(drivers)")
-    columns = cur.fetchall()
-    print("Current columns:", [col[1] for col in columns])
-    
-    # Get existing drivers
-    cur.execute("SELECT * FROM drivers")
-    existing_drivers = cur.fetchall()
-    print(f"Found {len(existing_drivers)} existing drivers")
-    
-    # Drop and recreate table with new schema
-    cur.execute("DROP TABLE IF EXISTS drivers")
+    # same lock the service takes, so a service starting up cannot migrate concurrently
+    with migrations.schema_lock(db_conf.DB_NAME):
+        before, after = migrations.migrate(db_conf.get_connection())
     
-    # Create new table with enhanced schema
-    cur.execute("""
-        CREATE TABLE drivers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            driver_id TEXT UNIQUE,
-            name TEXT,
-            email TEXT UNIQUE,
-            phone TEXT,
-            license_number TEXT,
-            available INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    print("✅ Updated drivers table schema")
-    
-    # Re-add existing drivers with default values for new fields
-    for driver in existing_drivers:
-        old_id, old_driver_id, old_name, old_available = driver[:4]
-        default_email = f"{old_name.lower().replace(' ', '.')}@temp.com"
-        default_phone = "+1-555-0000"
-        default_license = "DL00000000"
-        
-        cur.execute("""
-            INSERT INTO drivers (driver_id, name, email, phone, license_number, available) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (old_driver_id, old_name, default_email, default_phone, default_license, old_available))
-        
-        print(f"Migrated existing driver: {old_name} ({old_driver_id})")
-    
-    conn.commit()
-    conn.close()
-    print("✅ Schema update complete")
+    if before == after:
+        print(f"✅ Schema already at version {after}")
+    else:
+        # legacy drivers keep their rows; new profile columns get placeholder values
+        print(f"✅ Migrated schema from version {before} to {after}")
     print()
 
 def add_sample_drivers():
@@ -88,29 +47,19 @@ def add_sample_drivers():
     
     print("🚚 Adding Sample Drivers...")
     
-    conn = sqlite3.connect(DB_NAME)
+    conn = db_conf.get_connection()
     cur = conn.cursor()
     
+    results = driver_import.import_drivers(conn, sample_drivers)
     added_drivers = []
     
-    for driver_data in sample_drivers:
-        driver_id = f"DRV{uuid.uuid4().hex[:8].upper()}"
-        
-        try:
-            cur.execute("""
-                INSERT INTO drivers (driver_id, name, email, phone, license_number, available) 
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (driver_id, driver_data["name"], driver_data["email"], 
-                  driver_data["phone"], driver_data["license_number"], 1))
-            
-            print(f"✅ Added: {driver_data['name']} ({driver_id})")
-            added_drivers.append({"name": driver_data["name"], "driver_id": driver_id})
-            
-        except sqlite3.IntegrityError as e:
+    for driver_data, result in zip(sample_drivers, results):
+        if result["status"] == "created":
+            print(f"✅ Added: {driver_data['name']} ({result['driver_id']})")
+            added_drivers.append({"name": driver_data["name"], "driver_id": result["driver_id"]})
+        else:
             print(f"⚠️  {driver_data['name']} already exists or email conflict")
     
-    conn.commit()
-    
     # Show all drivers
     print("\n📋 All Drivers in Database:")
     print("-" * 40)
@@ -123,7 +72,7 @@ def add_sample_drivers():
         print(f"   Available: {'Yes' if driver[3] else 'No'}")
         print()
     
-    conn.close()
+    db_conf.close_connection()
     
     print("=" * 50)
     print(f"🎉 Database ready with {len(all_drivers)} driver(s)!")
@@ -1,15 +1,9 @@
 # simple_tcp_server.py
-import socket
+# Kept as the entry point used by the start scripts; the protocol server is
+# now the multi-subscriber broker in event_broker.py.
+import asyncio
 
-server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-server.bind(("127.0.0.1", 9000))
-server.listen(1)
-print("TCP Server listening on 127.0.0.1:9000")
+from event_broker import EventBroker
 
-conn, addr = server.accept()
-print("Connected by", addr)
-while True:
-    data = conn.recv(1024)
-    if not data:
-        break
-    print("Received:", data.decode())
+if __name__ == "__main__":
+    asyncio.run(EventBroker(verbose=True).serve("127.0.0.1", 9000))
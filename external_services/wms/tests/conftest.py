@@ -0,0 +1,70 @@
+"""
+Shared fixtures for the WMS tests.
+
+Run from external_services/wms:
+
+    python -m pytest tests -q
+
+Every test gets a fresh wms.db in its own temporary directory (db_conf
+opens the database relative to the working directory) and a TestClient
+that runs the app's lifespan, so migrations and the availability index
+are set up exactly as at service startup.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_conf  # noqa: E402
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db_conf.close_connection()
+    yield tmp_path
+    db_conf.close_connection()
+
+
+@pytest.fixture
+def conn(workdir):
+    """A migrated database without the app around it."""
+    import migrations
+
+    connection = db_conf.get_connection()
+    migrations.migrate(connection)
+    return connection
+
+
+@pytest.fixture
+def client(workdir):
+    from fastapi.testclient import TestClient
+
+    import app
+
+    with TestClient(app.app) as c:
+        yield c
+
+
+def add_driver(client, driver_id, capacity=None):
+    body = {"driver_id": driver_id, "name": f"Driver {driver_id}"}
+    if capacity is not None:
+        body["capacity"] = capacity
+    response = client.post("/drivers/", json=body)
+    assert response.status_code == 200, response.text
+    return driver_id
+
+
+def add_order(client, order_id, weight=1, delivery_location="1 Main Street, Colombo"):
+    response = client.post("/orders", json={
+        "order_id": order_id,
+        "client_name": "Client",
+        "pickup_location": "Warehouse A",
+        "delivery_location": delivery_location,
+        "weight": weight,
+    })
+    assert response.status_code == 200, response.text
+    return order_id
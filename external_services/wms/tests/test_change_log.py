@@ -0,0 +1,61 @@
+"""change_log triggers: row versions, tombstones and ?since= delta sync."""
+
+import change_log
+
+
+def insert_order(conn, order_id):
+    conn.execute("INSERT INTO orders (order_id, client_name, pickup_location, delivery_location, status) "
+                 "VALUES (?, 'c', 'p', 'd', 'pending')", (order_id,))
+    conn.commit()
+
+
+def version(conn, order_id):
+    return conn.execute("SELECT row_version FROM orders WHERE order_id=?", (order_id,)).fetchone()[0]
+
+
+def test_every_write_bumps_the_sequence(conn):
+    cur = conn.cursor()
+    start = change_log.current_seq(cur)
+    insert_order(conn, "O1")
+    assert version(conn, "O1") == start + 1
+    conn.execute("UPDATE orders SET status='borrowed' WHERE order_id='O1'")
+    conn.commit()
+    assert version(conn, "O1") == start + 2
+    assert change_log.current_seq(cur) == start + 2
+
+
+def test_delete_leaves_a_tombstone_and_reinsert_clears_it(conn):
+    insert_order(conn, "O1")
+    conn.execute("DELETE FROM orders WHERE order_id='O1'")
+    conn.commit()
+    seq = change_log.current_seq(conn.cursor())
+    assert conn.execute("SELECT entity, key, seq FROM tombstones").fetchall() == [("order", "O1", seq)]
+    insert_order(conn, "O1")
+    assert conn.execute("SELECT COUNT(*) FROM tombstones").fetchone()[0] == 0
+
+
+def test_read_changes_pages_in_version_order(conn):
+    for i in range(5):
+        insert_order(conn, f"O{i}")
+    select = "SELECT order_id, row_version FROM orders"
+    page = change_log.read_changes(conn, select, "row_version", ("order",), 0, 3)
+    assert [r[0] for r in page["rows"]] == ["O0", "O1", "O2"]
+    assert page["has_more"] and page["seq"] == page["rows"][-1][-1]
+    rest = change_log.read_changes(conn, select, "row_version", ("order",), page["seq"], 3)
+    assert [r[0] for r in rest["rows"]] == ["O3", "O4"]
+    assert not rest["has_more"]
+
+
+def test_orders_delta_and_etag_over_http(client):
+    client.post("/deliveries/", json={"order_id": "O1", "address": "A"})
+    full = client.get("/orders")
+    seq, etag = int(full.headers["x-change-seq"]), full.headers["etag"]
+    assert client.get("/orders", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/orders/O1/borrow")
+    assert client.get("/orders", headers={"If-None-Match": etag}).status_code == 200
+    delta = client.get(f"/orders?since={seq}").json()
+    assert [o["order_id"] for o in delta["changes"]] == ["O1"]
+    assert delta["changes"][0]["status"] == "borrowed"
+    assert delta["seq"] > seq
+    assert client.get(f"/orders?since={delta['seq']}").json()["changes"] == []
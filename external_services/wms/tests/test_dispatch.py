@@ -0,0 +1,95 @@
+"""Load planning (dispatch.plan_loads) and the capacity rules of the dispatch policies."""
+
+import pytest
+
+import dispatch
+from dispatch import AvailableDriver, PendingOrder
+
+
+def order(n, weight=1, area="Colombo"):
+    return PendingOrder(n, f"O{n}", f"{n} Main Street, {area}", f"2025-01-01 00:00:{n:02d}", weight)
+
+
+def driver(n, capacity):
+    return AvailableDriver(n, f"D{n}", capacity)
+
+
+def test_loads_respect_capacity_and_max_orders():
+    orders = [order(i, weight=3) for i in range(10)]
+    loads, unplaceable = dispatch.plan_loads(orders, [driver(1, 10), driver(2, 100)], max_orders=4)
+    assert unplaceable == []
+    for load in loads:
+        assert load.weight <= load.driver.capacity
+        assert len(load.orders) <= 4
+    assert sum(len(load.orders) for load in loads) == 7  # 4 on the big van, 3 (weight 9) on the small one
+
+
+def test_loads_group_by_area():
+    orders = [order(1, area="Kandy"), order(2, area="Galle"), order(3, area="kandy ")]
+    loads, _ = dispatch.plan_loads(orders, [driver(1, 10), driver(2, 10)])
+    assert sorted(sorted(o.order_id for o in load.orders) for load in loads) == [["O1", "O3"], ["O2"]]
+    assert {load.area for load in loads} == {"kandy", "galle"}
+
+
+def test_oldest_area_is_served_first_with_the_smallest_fitting_vehicle():
+    orders = [order(5, weight=2, area="Galle"), order(1, weight=2, area="Kandy")]
+    loads, _ = dispatch.plan_loads(orders, [driver(1, 100), driver(2, 5)])
+    assert loads[0].area == "kandy"
+    assert loads[0].driver.driver_id == "D2"
+
+
+def test_orders_heavier_than_every_vehicle_are_unplaceable():
+    loads, unplaceable = dispatch.plan_loads([order(1, weight=50), order(2)], [driver(1, 10)])
+    assert [o.order_id for o in unplaceable] == ["O1"]
+    assert [o.order_id for load in loads for o in load.orders] == ["O2"]
+
+
+def test_no_free_drivers_reports_nothing_unplaceable():
+    assert dispatch.plan_loads([order(1, weight=50)], []) == ([], [])
+
+
+@pytest.mark.parametrize("policy", sorted(dispatch.POLICIES))
+def test_policies_never_overload_a_vehicle(policy):
+    orders = [order(1, weight=40), order(2, weight=60), order(3, weight=3)]
+    drivers = [driver(1, 5), driver(2, 50)]
+    positions = {"orders": {"O1": (0, 0), "O3": (0, 0)}, "drivers": {"D1": (0, 0), "D2": (1, 1)}}
+    pairs = dispatch.POLICIES[policy](orders, drivers, positions)
+    assert all(o.weight <= d.capacity for o, d in pairs)
+    assert sorted((o.order_id, d.driver_id) for o, d in pairs) == [("O1", "D2"), ("O3", "D1")]
+
+
+def test_load_driver_stays_busy_until_the_whole_load_is_done(client):
+    from conftest import add_driver, add_order
+
+    add_driver(client, "D1", capacity=10)
+    for order_id in ("O1", "O2"):
+        add_order(client, order_id, weight=4)
+    result = client.post("/dispatch/loads", json={}).json()
+    assert [load["order_ids"] for load in result["loads"]] == [["O1", "O2"]]
+    load_id = result["loads"][0]["load_id"]
+    assert client.get(f"/loads/{load_id}").status_code == 200
+
+    client.post("/orders/O1/delivered")
+    assert client.get("/drivers/D1").json()["available"] is False
+    client.post("/orders/O2/return")
+    assert client.get("/drivers/D1").json()["available"] is True
+
+
+def test_dispatch_finds_drivers_the_availability_index_missed(client):
+    import app
+    import db_conf
+    from conftest import add_order
+
+    add_order(client, "O1")
+    # made available behind the service's back, so the index never saw them
+    conn = db_conf.get_connection()
+    conn.executemany("INSERT INTO drivers (driver_id, name, available) VALUES (?, ?, 1)",
+                     [("D1", "Driver D1"), ("D2", "Driver D2")])
+    conn.commit()
+    assert "D1" not in app.availability_index
+
+    result = client.post("/dispatch/run", json={}).json()
+    assert result["available_drivers"] == 2
+    assert result["assignments"] == [{"order_id": "O1", "driver_id": "D1"}]
+    # the dispatch resynced the index with the table
+    assert app.availability_index.snapshot() == ["D2"]
@@ -0,0 +1,43 @@
+import pytest
+
+CSV_HEADER = "name,email,phone,license_number,capacity\r\n"
+
+
+def post_csv(client, body: bytes):
+    return client.post("/drivers/bulk", content=body, headers={"Content-Type": "text/csv"})
+
+
+def test_csv_rows_are_created_or_reported(client):
+    body = (CSV_HEADER
+            + "Ann,ann@example.com,0771,L1,50\r\n"
+            + "Ann Again,ann@example.com,0772,L2,\r\n"
+            + "No Licence,bob@example.com,0773,,\r\n").encode("utf-8-sig")
+    response = post_csv(client, body)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["created"], result["conflicts"], result["invalid"]) == (1, 1, 1)
+    driver_id = result["results"][0]["driver_id"]
+    assert client.get(f"/drivers/{driver_id}").json()["capacity"] == 50
+
+
+@pytest.mark.parametrize("body, detail", [
+    # a cp1252 Excel export
+    ((CSV_HEADER + "Zoë Perera,zoe@example.com,0771,L1,\r\n").encode("cp1252"), "CSV must be UTF-8 encoded"),
+    # one field past the csv module's field size limit
+    ((CSV_HEADER + "Ann," + "x" * 200_000 + ",0771,L1,\r\n").encode(), "Malformed CSV"),
+])
+def test_unreadable_csv_is_a_bad_request(client, body, detail):
+    response = post_csv(client, body)
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(detail)
+
+
+def test_bulk_import_event_carries_the_committed_seq(client, monkeypatch):
+    import app
+
+    published = []
+    monkeypatch.setattr(app.publisher, "publish", lambda message, topic, **data: published.append(data))
+    response = post_csv(client, (CSV_HEADER + "Ann,ann@example.com,0771,L1,\r\n").encode())
+    assert response.json()["created"] == 1
+    seq = int(client.get("/drivers/").headers["X-Change-Seq"])
+    assert [(e["type"], e["version"]) for e in published] == [("driver.bulk_created", seq)]
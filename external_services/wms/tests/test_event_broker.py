@@ -0,0 +1,37 @@
+import asyncio
+import json
+
+import event_broker
+from events import encode_frame
+
+
+async def relay_one_event():
+    broker = event_broker.EventBroker()
+    server = await asyncio.start_server(broker.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    connected = asyncio.Event()
+    received = []
+
+    async def consume():
+        async for event in event_broker.subscribe("127.0.0.1", port, on_connect=connected.set):
+            received.append(event)
+            return
+
+    consumer = asyncio.create_task(consume())
+    # the callback fires on connect, before the broker has anything to deliver
+    await asyncio.wait_for(connected.wait(), 5)
+    assert received == []
+
+    while not broker.subscribers:
+        await asyncio.sleep(0.01)
+    _, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(encode_frame(json.dumps({"topic": "order", "type": "order.created"}).encode()))
+    await writer.drain()
+    await asyncio.wait_for(consumer, 5)
+    writer.close()
+    server.close()
+    return received
+
+
+def test_subscribe_reports_the_connection_before_the_first_event():
+    assert asyncio.run(relay_one_event()) == [{"topic": "order", "type": "order.created"}]
@@ -0,0 +1,89 @@
+"""Rejection paths of the order state machine (order_state.py), over HTTP and in batches."""
+
+from conftest import add_driver, add_order
+
+
+def test_borrow_twice_is_rejected(client):
+    add_order(client, "O1")
+    assert client.post("/orders/O1/borrow").status_code == 200
+    response = client.post("/orders/O1/borrow")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Order is not available for borrowing"
+
+
+def test_unknown_order_is_404(client):
+    for action in ("borrow", "return", "delivered"):
+        assert client.post(f"/orders/NOPE/{action}").status_code == 404
+    add_driver(client, "D1")
+    assert client.post("/orders/NOPE/assign", json={"driver_id": "D1"}).status_code == 404
+
+
+def test_assign_requires_a_borrowed_order(client):
+    add_order(client, "O1")
+    add_driver(client, "D1")
+    response = client.post("/orders/O1/assign", json={"driver_id": "D1"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Order is not borrowed"
+    # the rejected assignment left the driver free
+    assert client.get("/drivers/D1").json()["available"] is True
+
+
+def test_assign_unknown_driver_is_404_and_rolled_back(client):
+    add_order(client, "O1")
+    client.post("/orders/O1/borrow")
+    response = client.post("/orders/O1/assign", json={"driver_id": "NOPE"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Driver not found"
+    # the order half of the transition was undone with it
+    assert client.get("/orders?status=borrowed").json()[0]["driver_id"] is None
+
+
+def test_busy_driver_cannot_be_assigned_again(client):
+    add_driver(client, "D1")
+    for order_id in ("O1", "O2"):
+        add_order(client, order_id)
+        client.post(f"/orders/{order_id}/borrow")
+    assert client.post("/orders/O1/assign", json={"driver_id": "D1"}).status_code == 200
+    response = client.post("/orders/O2/assign", json={"driver_id": "D1"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Driver is not available"
+    statuses = {o["order_id"]: o["status"] for o in client.get("/orders").json()}
+    assert statuses == {"O1": "assigned", "O2": "borrowed"}
+
+
+def test_deliver_and_return_need_the_right_state(client):
+    add_order(client, "O1")
+    assert client.post("/orders/O1/delivered").status_code == 400
+    assert client.post("/orders/O1/return").status_code == 400
+
+
+def test_delivering_frees_the_driver(client):
+    add_driver(client, "D1")
+    add_order(client, "O1")
+    client.post("/orders/O1/borrow")
+    client.post("/orders/O1/assign", json={"driver_id": "D1"})
+    assert client.get("/drivers/D1").json()["available"] is False
+    assert client.post("/orders/O1/delivered").status_code == 200
+    assert client.get("/drivers/D1").json()["available"] is True
+    assert client.post("/orders/O1/delivered").status_code == 400
+
+
+def test_batch_rejections_are_isolated(client):
+    add_driver(client, "D1")
+    add_order(client, "O1")
+    add_order(client, "O2")
+    response = client.post("/orders/transitions", json={"transitions": [
+        {"action": "borrow", "order_id": "O1"},
+        {"action": "borrow", "order_id": "O1"},
+        {"action": "fly", "order_id": "O2"},
+        {"action": "assign", "order_id": "O1"},
+        {"action": "assign", "order_id": "O1", "driver_id": "D1"},
+        {"action": "borrow", "order_id": "NOPE"},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["ok"] for r in body["results"]] == [True, False, False, False, True, False]
+    assert [r.get("status_code") for r in body["results"]] == [None, 400, 400, 400, None, 404]
+    assert body["applied"] == 2 and body["rejected"] == 4
+    statuses = {o["order_id"]: o["status"] for o in client.get("/orders").json()}
+    assert statuses == {"O1": "assigned", "O2": "pending"}
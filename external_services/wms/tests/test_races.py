@@ -0,0 +1,58 @@
+"""
+Racing transitions: every race must have exactly one winner.
+
+Requests go through one TestClient from many threads; the handlers run on
+the db_executor pools, so the transactions really do overlap. The same
+checks against a live server (any write mode) are in the repository's
+root test_order_concurrency.py.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import add_driver, add_order
+
+RACERS = 12
+
+
+def race(client, calls):
+    with ThreadPoolExecutor(len(calls)) as pool:
+        return list(pool.map(lambda call: client.post(call[0], json=call[1]), calls))
+
+
+def test_one_order_borrowed_by_many(client):
+    add_order(client, "O1")
+    codes = [r.status_code for r in race(client, [("/orders/O1/borrow", None)] * RACERS)]
+    assert sorted(codes) == [200] + [400] * (RACERS - 1)
+
+
+def test_many_orders_assigned_to_one_driver(client):
+    add_driver(client, "D1")
+    orders = [add_order(client, f"O{i}") for i in range(RACERS)]
+    for order_id in orders:
+        client.post(f"/orders/{order_id}/borrow")
+    responses = race(client, [(f"/orders/{o}/assign", {"driver_id": "D1"}) for o in orders])
+    assert sum(r.status_code == 200 for r in responses) == 1
+    statuses = sorted(o["status"] for o in client.get("/orders").json())
+    assert statuses == ["assigned"] + ["borrowed"] * (RACERS - 1)
+
+
+def test_one_order_assigned_to_many_drivers(client):
+    add_order(client, "O1")
+    client.post("/orders/O1/borrow")
+    drivers = [add_driver(client, f"D{i}") for i in range(RACERS)]
+    responses = race(client, [("/orders/O1/assign", {"driver_id": d}) for d in drivers])
+    winners = [d for d, r in zip(drivers, responses) if r.status_code == 200]
+    assert len(winners) == 1
+    busy = [d for d in drivers if not client.get(f"/drivers/{d}").json()["available"]]
+    assert busy == winners
+
+
+def test_racing_batches(client):
+    orders = [add_order(client, f"O{i}") for i in range(4)]
+    drivers = [add_driver(client, f"D{i}") for i in range(RACERS)]
+    batches = [{"transitions": [{"action": "borrow", "order_id": o} for o in orders]
+                + [{"action": "assign", "order_id": orders[0], "driver_id": d}]} for d in drivers]
+    results = [r.json()["results"] for r in race(client, [("/orders/transitions", b) for b in batches])]
+    for i in range(len(orders)):
+        assert sum(batch[i]["ok"] for batch in results) == 1
+    assert sum(batch[-1]["ok"] for batch in results) == 1
@@ -0,0 +1,146 @@
+"""
+Optional group commit for WMS mutations.
+
+Normally every mutation runs its own BEGIN IMMEDIATE ... COMMIT, paying a
+lock round-trip and a commit (an fsync with synchronous=FULL, or a WAL
+write and checkpoint pressure with NORMAL) per request. With
+WMS_GROUP_COMMIT=1 mutations are instead queued to a single writer thread
+that applies them in batches: a batch is committed once it holds
+MAX_OPS operations or MAX_DELAY_MS has passed since its first one.
+
+A mutation is a function op(cur) that issues its statements on the given
+cursor and returns a result; it must not commit. Each op runs inside its
+own SAVEPOINT, so an op that raises is undone on its own and its caller
+gets that exception, while the rest of the batch commits. Callers only get
+their result after the batch has committed, so the per-request semantics
+(read-your-writes, durability on return) are the same as before. If the
+commit itself fails, every caller in the batch gets the error.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import db_conf
+
+ENABLED = os.environ.get("WMS_GROUP_COMMIT", "0") == "1"
+MAX_OPS = int(os.environ.get("WMS_GROUP_COMMIT_MAX_OPS", "64"))
+MAX_DELAY_MS = float(os.environ.get("WMS_GROUP_COMMIT_MAX_MS", "5"))
+
+
+def apply_one(conn, op):
+    """Run op in its own write transaction (the path used without group commit)."""
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        result = op(cur)
+        conn.commit()
+        return result
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+class GroupCommitWriter:
+    def __init__(self, max_ops: int = MAX_OPS, max_delay_ms: float = MAX_DELAY_MS):
+        self.max_ops = max_ops
+        self.max_delay = max_delay_ms / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.ops = 0
+        self.failed_commits = 0
+
+    def submit(self, op) -> Future:
+        future = Future()
+        self._queue.put((op, future))
+        return future
+
+    def apply(self, op):
+        """Queue op and wait until its batch has committed."""
+        return self.submit(op).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "ops": self.ops,
+                "avg_batch": round(self.ops / self.batches, 2) if self.batches else 0.0,
+                "failed_commits": self.failed_commits,
+                "queued": self._queue.qsize(),
+            }
+
+    # -------------------- writer thread --------------------
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="wms-group-commit", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _next_batch(self) -> list:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_ops:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = db_conf.get_connection()
+        # drain what is already queued before honouring stop()
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._commit_batch(conn, batch)
+        db_conf.close_connection()
+
+    def _commit_batch(self, conn, batch: list):
+        outcomes = []
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            for op, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cur.execute("SAVEPOINT op")
+                try:
+                    outcomes.append((future, op(cur), None))
+                except Exception as e:
+                    cur.execute("ROLLBACK TO op")
+                    outcomes.append((future, None, e))
+                cur.execute("RELEASE op")
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self.failed_commits += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.ops += len(batch)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -75,7 +75,8 @@ app.post('/api/cms/orders', async (req, res) => {
         client_name: response.data.client_name || `Client-${response.data.client_id}`,
         pickup_location: response.data.pickup_location || "Pickup Location", 
         delivery_location: response.data.location,
-        package_info: response.data.description || "Standard Package"
+        package_info: response.data.description || "Standard Package",
+        weight: response.data.weight
       };
       logActivity('WMS', 'POST', '/orders', orderData, null);
       const wmsOrderResponse = await axios.post(`${WMS_BASE_URL}/orders`, orderData);
@@ -280,6 +281,25 @@ app.post('/api/wms/drivers/signup', async (req, res) => {
   }
 });
 
+// Bulk driver import endpoint (JSON, or a CSV upload sent as text/csv)
+app.post('/api/wms/drivers/bulk', express.text({ type: 'text/csv', limit: '5mb' }), async (req, res) => {
+  try {
+    const contentType = req.get('Content-Type') || 'application/json';
+    const isCsv = typeof req.body === 'string';
+    logActivity('WMS', 'POST', '/drivers/bulk', isCsv ? { csvBytes: req.body.length } : req.body, null);
+    const response = await axios.post(`${WMS_BASE_URL}/drivers/bulk`, req.body, {
+      headers: { 'Content-Type': contentType }
+    });
+    logActivity('WMS', 'POST', '/drivers/bulk', null, response.data);
+    res.json(response.data);
+  } catch (error) {
+    res.status(error.response?.status || 500).json({
+      error: error.message,
+      detail: error.response?.data?.detail || 'Bulk driver import failed'
+    });
+  }
+});
+
 // Health check endpoint
 // Warehouse Management Endpoints
 app.get('/api/wms/orders', async (req, res) => {
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Concurrency regression test for the WMS order state machine
+Fires racing borrow / assign requests at a running WMS and checks that
+every race has exactly one winner:
+
+- the same order borrowed by many operators at once
+- different orders assigned to the same driver at once
+- the same order assigned to different drivers at once
+- racing /orders/transitions batches (one SAVEPOINT per item)
+
+Run it against each write path the service offers:
+
+    python -m uvicorn app:app --port 8002                      # default
+    WMS_GROUP_COMMIT=1 python -m uvicorn app:app --port 8002   # group commit
+    WMS_MULTIPROCESS=1 python -m uvicorn app:app --port 8002 --workers 4
+
+    python test_order_concurrency.py
+
+It is a script for checking a deployed service, not a pytest module; the
+same races run under pytest against an in-process app in
+external_services/wms/tests/test_races.py.
+"""
+
+import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Configuration
+WMS_BASE_URL = os.environ.get("WMS_BASE_URL", "http://localhost:8002")
+RACERS = 16
+
+RUN = uuid.uuid4().hex[:6].upper()
+
+
+def race(requests_to_send):
+    """Send all (method, path, json) requests at once; returns the responses in order."""
+    with ThreadPoolExecutor(len(requests_to_send)) as pool:
+        futures = [pool.submit(requests.request, method, f"{WMS_BASE_URL}{path}", json=body, timeout=30)
+                   for method, path, body in requests_to_send]
+        return [f.result() for f in futures]
+
+
+def create_order(name):
+    order_id = f"RACE-{RUN}-{name}"
+    response = requests.post(f"{WMS_BASE_URL}/orders", json={
+        "order_id": order_id,
+        "client_name": "Race Test",
+        "pickup_location": "Warehouse A",
+        "delivery_location": "1 Test Street, Colombo",
+    })
+    response.raise_for_status()
+    return order_id
+
+
+def create_driver(name):
+    driver_id = f"RACE-{RUN}-{name}"
+    response = requests.post(f"{WMS_BASE_URL}/drivers/", json={"driver_id": driver_id, "name": f"Race {name}"})
+    response.raise_for_status()
+    return driver_id
+
+
+def order_status(order_id):
+    response = requests.get(f"{WMS_BASE_URL}/deliveries/{order_id}")
+    return response.json() if response.status_code == 200 else None
+
+
+def check(label, count, expected=1):
+    if count == expected:
+        print(f"✅ {label}: {count}")
+        return True
+    print(f"❌ {label}: expected {expected}, got {count}")
+    return False
+
+
+def race_double_borrow():
+    """Many operators borrow the same pending order at once"""
+    print("\n🧪 Racing borrows of one order...")
+    order_id = create_order("BORROW")
+    responses = race([("POST", f"/orders/{order_id}/borrow", None)] * RACERS)
+    ok = check("borrows that succeeded", sum(r.status_code == 200 for r in responses))
+    return ok and check("borrows rejected with 400",
+                        sum(r.status_code == 400 for r in responses), RACERS - 1)
+
+
+def race_double_assign_driver():
+    """Different borrowed orders assigned to the same driver at once"""
+    print("\n🧪 Racing assignments to one driver...")
+    driver_id = create_driver("DRIVER")
+    orders = [create_order(f"DRV-{i}") for i in range(RACERS)]
+    for order_id in orders:
+        requests.post(f"{WMS_BASE_URL}/orders/{order_id}/borrow").raise_for_status()
+    responses = race([("POST", f"/orders/{o}/assign", {"driver_id": driver_id}) for o in orders])
+    winners = [o for o, r in zip(orders, responses) if r.status_code == 200]
+    ok = check("assignments the driver accepted", len(winners))
+
+    # the losing orders must not have been left half-assigned
+    driver = requests.get(f"{WMS_BASE_URL}/drivers/{driver_id}").json()
+    if driver["available"]:
+        print("❌ driver still shows as available after being assigned")
+        ok = False
+    stuck = [o for o in orders if o not in winners and (order_status(o) or {}).get("driver_id")]
+    if stuck:
+        print(f"❌ losing orders still carry a driver: {stuck}")
+        ok = False
+    return ok
+
+
+def race_double_assign_order():
+    """One borrowed order assigned to many different drivers at once"""
+    print("\n🧪 Racing assignments of one order...")
+    order_id = create_order("ORDER")
+    requests.post(f"{WMS_BASE_URL}/orders/{order_id}/borrow").raise_for_status()
+    drivers = [create_driver(f"ORD-{i}") for i in range(RACERS)]
+    responses = race([("POST", f"/orders/{order_id}/assign", {"driver_id": d}) for d in drivers])
+    winners = [d for d, r in zip(drivers, responses) if r.status_code == 200]
+    ok = check("drivers the order was assigned to", len(winners))
+
+    # only the winner may have been taken off the available list
+    busy = [d for d in drivers if not requests.get(f"{WMS_BASE_URL}/drivers/{d}").json()["available"]]
+    if busy != winners:
+        print(f"❌ drivers marked busy {busy}, winner {winners}")
+        ok = False
+    return ok
+
+
+def race_transition_batches():
+    """/orders/transitions batches that borrow and assign the same orders"""
+    print("\n🧪 Racing transition batches...")
+    orders = [create_order(f"BATCH-{i}") for i in range(4)]
+    drivers = [create_driver(f"BATCH-{i}") for i in range(RACERS)]
+    # every batch borrows all the orders, borrows the first one again and
+    # assigns it to its own driver; the duplicate borrow must fail on its own
+    # SAVEPOINT without undoing the rest of the batch
+    batches = [{"transitions": [{"action": "borrow", "order_id": o} for o in orders]
+                + [{"action": "borrow", "order_id": orders[0]}]
+                + [{"action": "assign", "order_id": orders[0], "driver_id": d}]}
+               for d in drivers]
+    responses = race([("POST", "/orders/transitions", b) for b in batches])
+    if any(r.status_code != 200 for r in responses):
+        print(f"❌ batch failed outright: {[r.status_code for r in responses]}")
+        return False
+
+    results = [r.json()["results"] for r in responses]
+    ok = True
+    for i, order_id in enumerate(orders):
+        ok &= check(f"batches that borrowed {order_id}", sum(batch[i]["ok"] for batch in results))
+    ok &= check("duplicate borrows inside a batch that succeeded", sum(batch[len(orders)]["ok"] for batch in results), 0)
+    # only the batch that borrowed orders[0] can assign it
+    ok &= check("batches that assigned the order", sum(batch[-1]["ok"] for batch in results))
+    return ok
+
+
+def main():
+    print("🚀 WMS Order Concurrency Test")
+    print("=" * 50)
+    try:
+        stats = requests.get(f"{WMS_BASE_URL}/events/stats").json()
+    except requests.exceptions.ConnectionError:
+        print("❌ Could not connect to WMS service")
+        print("   Make sure WMS is running: cd external_services/wms && python -m uvicorn app:app --port 8002")
+        return 1
+    print(f"Write path: {'group commit' if stats.get('group_commit') else 'one transaction per request'}")
+
+    results = [
+        race_double_borrow(),
+        race_double_assign_driver(),
+        race_double_assign_order(),
+        race_transition_batches(),
+    ]
+    print("\n" + "=" * 50)
+    if all(results):
+        print("🎉 No race produced more than one winner")
+        return 0
+    print(f"⚠️ {results.count(False)} of {len(results)} race test(s) failed")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())